@@ -26,9 +26,12 @@ export const useTaskPolling = (interval = 3000) => {
         try {
           console.log('🔄 正在轮询任务：', task.id)
           const res = await get_task_status(task.id)
-          const { status } = res
+          const { status, partial_markdown } = res
 
-          if (status && status !== task.status) {
+          if (status && status === task.status && partial_markdown && partial_markdown !== task.partialMarkdown) {
+            // 总结阶段：同步流式生成中的笔记内容
+            updateTaskContent(task.id, { partialMarkdown: partial_markdown })
+          } else if (status && status !== task.status) {
             if (status === 'SUCCESS') {
               const { markdown, transcript, audio_meta } = res.result
               toast.success('笔记生成成功')
@@ -37,12 +40,13 @@ export const useTaskPolling = (interval = 3000) => {
                 markdown,
                 transcript,
                 audioMeta: audio_meta,
+                partialMarkdown: undefined,
               })
             } else if (status === 'FAILED') {
               updateTaskContent(task.id, { status })
               console.warn(`⚠️ 任务 ${task.id} 失败`)
             } else {
-              updateTaskContent(task.id, { status })
+              updateTaskContent(task.id, { status, partialMarkdown: partial_markdown })
             }
           }
         } catch (e) {
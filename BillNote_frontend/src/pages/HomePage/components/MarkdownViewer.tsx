@@ -142,6 +142,25 @@ const MarkdownViewer: FC<MarkdownViewerProps> = ({ status }) => {
     document.body.removeChild(link)
   }
 
+  if (status === 'loading' && currentTask?.partialMarkdown) {
+    // 总结阶段：实时渲染已生成的部分笔记
+    return (
+      <div className="flex h-screen w-full flex-col overflow-hidden">
+        <div className="flex flex-col items-center space-y-2 py-4 text-neutral-500">
+          <StepBar steps={steps} currentStep={taskStatus} />
+          <p className="text-xs">笔记生成中，内容实时更新…</p>
+        </div>
+        <ScrollArea className="w-full flex-1 bg-white">
+          <div className={'markdown-body w-full px-2'}>
+            <ReactMarkdown remarkPlugins={[gfm, remarkMath]} rehypePlugins={[rehypeKatex]}>
+              {currentTask.partialMarkdown}
+            </ReactMarkdown>
+          </div>
+        </ScrollArea>
+      </div>
+    )
+  }
+
   if (status === 'loading') {
     return (
       <div className="flex h-screen w-full flex-col items-center justify-center space-y-4 text-neutral-500">
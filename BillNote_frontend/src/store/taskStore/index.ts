@@ -40,6 +40,7 @@ export interface Markdown {
 export interface Task {
   id: string
   markdown: string|Markdown [] //为了兼容之前的笔记
+  partialMarkdown?: string // 总结阶段流式生成中的笔记
   transcript: Transcript
   status: TaskStatus
   audioMeta: AudioMeta
@@ -0,0 +1,99 @@
+import threading
+from typing import List, Optional
+
+from app.db.models.batch_items import BatchItem
+from app.db.engine import get_db
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 已结束的状态，用于计算批次进度
+FINISHED_STATUSES = {"SUCCESS", "FAILED"}
+
+# 本进程内尚未结束的批次任务；只有这些任务的状态变更需要同步到数据库，单个任务不访问数据库
+_active_task_ids = set()
+_active_lock = threading.Lock()
+
+
+def is_batch_task(task_id: str) -> bool:
+    with _active_lock:
+        return task_id in _active_task_ids
+
+
+# 批量插入批次条目
+def insert_batch_items(batch_id: str, user_id: str, priority: int, items: List[dict]):
+    """
+    :param items: [{"task_id", "video_url", "platform"}]，按批次内顺序排列
+    """
+    db = next(get_db())
+    try:
+        db.add_all([
+            BatchItem(batch_id=batch_id, task_id=item["task_id"], position=position, user_id=user_id,
+                      priority=priority, video_url=item["video_url"], platform=item["platform"])
+            for position, item in enumerate(items)
+        ])
+        db.commit()
+        with _active_lock:
+            _active_task_ids.update(item["task_id"] for item in items)
+        logger.info(f"Batch items inserted successfully. batch_id: {batch_id}, count: {len(items)}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to insert batch items: {e}")
+        raise
+    finally:
+        db.close()
+
+
+# 更新条目状态，任务结束后不再视为批次中的进行中任务
+def update_batch_item_status(task_id: str, status: str, message: Optional[str] = None):
+    if status in FINISHED_STATUSES:
+        with _active_lock:
+            _active_task_ids.discard(task_id)
+    db = next(get_db())
+    try:
+        db.query(BatchItem).filter_by(task_id=task_id).update(
+            {BatchItem.status: status, BatchItem.message: message},
+            synchronize_session=False,
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to update batch item status: {e}")
+    finally:
+        db.close()
+
+
+# 查询批次报告：一次查询取出全部条目，进度在内存里汇总
+def get_batch_report(batch_id: str) -> Optional[dict]:
+    db = next(get_db())
+    try:
+        rows = (
+            db.query(BatchItem.task_id, BatchItem.position, BatchItem.video_url, BatchItem.platform,
+                     BatchItem.status, BatchItem.message)
+            .filter_by(batch_id=batch_id)
+            .order_by(BatchItem.position)
+            .all()
+        )
+        if not rows:
+            return None
+        counts: dict = {}
+        for row in rows:
+            counts[row.status] = counts.get(row.status, 0) + 1
+        finished = sum(counts.get(status, 0) for status in FINISHED_STATUSES)
+        return {
+            "batch_id": batch_id,
+            "total": len(rows),
+            "finished": finished,
+            "progress": round(finished / len(rows), 4),
+            "counts": counts,
+            "items": [
+                {"index": row.position, "task_id": row.task_id, "video_url": row.video_url,
+                 "platform": row.platform, "status": row.status, "message": row.message}
+                for row in rows
+            ],
+        }
+    except Exception as e:
+        logger.error(f"Failed to get batch report: {e}")
+        return None
+    finally:
+        db.close()
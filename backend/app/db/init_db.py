@@ -1,9 +1,33 @@
 from app.db.models.models import Model
 from app.db.models.providers import Provider
 from app.db.models.video_tasks import VideoTask
+from app.db.models.batch_items import BatchItem
 from app.db.engine import get_engine, Base
+from sqlalchemy import inspect, text
+
+# create_all 不会给已存在的表补列，新增列在这里登记，启动时自动 ALTER TABLE
+ADDED_COLUMNS = {
+    "providers": {
+        "rpm": "INTEGER",
+        "tpm": "INTEGER",
+    },
+}
+
+
+def _ensure_columns(engine):
+    inspector = inspect(engine)
+    for table, columns in ADDED_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        with engine.begin() as conn:
+            for name, ddl in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
 
 def init_db():
     engine = get_engine()
 
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _ensure_columns(engine)
\ No newline at end of file
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func
+
+from app.db.engine import Base
+
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+    # 批次报告按 batch_id 过滤、按 position 排序，一个联合索引覆盖
+    __table_args__ = (Index("ix_batch_items_batch_position", "batch_id", "position"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(String, nullable=False)
+    task_id = Column(String, unique=True, nullable=False)
+    position = Column(Integer, nullable=False)         # 在批次中的顺序（去重后）
+    user_id = Column(String, nullable=False)
+    priority = Column(Integer, nullable=False, default=0)
+    video_url = Column(String, nullable=False)
+    platform = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="PENDING")
+    message = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
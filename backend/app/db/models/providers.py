@@ -14,4 +14,6 @@ class Provider(Base):
     api_key = Column(String, nullable=False)
     base_url = Column(String, nullable=False)
     enabled = Column(Integer, default=1)
+    rpm = Column(Integer, nullable=True)  # 每分钟请求数上限，为空表示不限制
+    tpm = Column(Integer, nullable=True)  # 每分钟 token 上限，为空表示不限制
     created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
@@ -1,9 +1,11 @@
 import enum
+import shutil
 
 from abc import ABC, abstractmethod
 from typing import Optional, Union
 
 from app.enmus.note_enums import DownloadQuality
+from app.models.audio_model import PlaylistInfo
 from app.models.notes_model import AudioDownloadResult
 from app.models.transcriber_model import TranscriptResult
 from os import getenv
@@ -13,6 +15,49 @@ QUALITY_MAP = {
     "slow": "128"
 }
 
+# 下载的视频只用于抽帧拼图（单格 960x540）和截图，限制分辨率并优先码率最低的视频轨；0 表示不限制
+VIDEO_ANALYSIS_MAX_HEIGHT = int(getenv("VIDEO_ANALYSIS_MAX_HEIGHT", "720"))
+
+
+def analysis_format_sort() -> list:
+    """
+    yt-dlp format_sort：不超过 VIDEO_ANALYSIS_MAX_HEIGHT 的最高分辨率里选视频码率最低的格式。
+    只按 vbr 排序，音轨仍按默认规则选最好的（音频用于语音识别），不能用 size / br，否则音轨也会选最小的
+    """
+    if VIDEO_ANALYSIS_MAX_HEIGHT <= 0:
+        return []
+    return [f"res:{VIDEO_ANALYSIS_MAX_HEIGHT}", "+vbr"]
+
+
+# yt-dlp 下载并发。concurrent_fragment_downloads 只对切片格式（HLS、分片 DASH）生效；
+# B 站等 DASH 音视频轨是单个文件，yt-dlp 自带下载器只用一个连接，
+# 多连接加速必须借助 aria2c（Docker 镜像已安装，本地运行需自行安装并加入 PATH）。
+# YTDLP_EXTERNAL_DOWNLOADER 置空可关闭 aria2c
+YTDLP_CONCURRENT_FRAGMENTS = int(getenv("YTDLP_CONCURRENT_FRAGMENTS", "4"))
+YTDLP_EXTERNAL_DOWNLOADER = getenv("YTDLP_EXTERNAL_DOWNLOADER", "aria2c").strip()
+YTDLP_DOWNLOAD_CONNECTIONS = int(getenv("YTDLP_DOWNLOAD_CONNECTIONS", "8"))
+
+
+def download_concurrency_opts(connections: Optional[int] = None,
+                              external_downloader: Optional[str] = None) -> dict:
+    """
+    yt-dlp 多连接下载参数，合并进下载用的 ydl_opts；aria2c 不在 PATH 中时退回 yt-dlp 自带下载（单文件单连接）
+
+    :param connections: 连接数，默认 YTDLP_DOWNLOAD_CONNECTIONS
+    :param external_downloader: 外部下载器，默认 YTDLP_EXTERNAL_DOWNLOADER，空字符串表示不用
+    """
+    connections = max(1, connections or YTDLP_DOWNLOAD_CONNECTIONS)
+    if external_downloader is None:
+        external_downloader = YTDLP_EXTERNAL_DOWNLOADER
+    opts = {"concurrent_fragment_downloads": max(1, YTDLP_CONCURRENT_FRAGMENTS)}
+    if external_downloader == "aria2c" and shutil.which("aria2c"):
+        # 只接管单文件直链，切片格式仍走 yt-dlp 的分片并发
+        opts["external_downloader"] = {"http": "aria2c"}
+        opts["external_downloader_args"] = {
+            "aria2c": ["-x", str(connections), "-s", str(connections), "-k", "1M", "--file-allocation=none"],
+        }
+    return opts
+
 
 class Downloader(ABC):
     def __init__(self):
@@ -38,6 +83,35 @@ class Downloader(ABC):
                        output_dir: Union[str, None] = None) -> str:
         pass
 
+    def fetch_metadata(self, video_url: str) -> Optional[AudioDownloadResult]:
+        '''
+        只获取视频元信息（标题、时长、封面等），不下载任何媒体文件；
+        已有平台字幕时用它代替音频下载的返回值
+
+        :param video_url: 视频链接
+        :return: file_path 为空的 AudioDownloadResult，平台不支持时返回 None
+        '''
+        return None
+
+    def resolve_stream_url(self, video_url: str, max_height: Optional[int] = None) -> Optional[dict]:
+        '''
+        解析视频流的直链，供 ffmpeg 直接按时间点拉取少量数据截图，不下载整个视频
+
+        :param video_url: 视频链接
+        :param max_height: 分辨率上限，None 表示最高画质
+        :return: {"url": 直链, "headers": 请求头}，平台不支持时返回 None
+        '''
+        return None
+
+    def expand_playlist(self, video_url: str) -> Optional[PlaylistInfo]:
+        '''
+        展开分P视频、合集或播放列表，只解析子视频链接和标题，不解析每个子视频的格式
+
+        :param video_url: 合集 / 播放列表 / 分P视频链接
+        :return: PlaylistInfo，不是合集或平台不支持时返回 None
+        '''
+        return None
+
     def download_subtitles(self, video_url: str, output_dir: str = None,
                            langs: list = None) -> Optional[TranscriptResult]:
         '''
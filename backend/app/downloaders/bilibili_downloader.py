@@ -4,10 +4,13 @@ import logging
 from abc import ABC
 from typing import Union, Optional, List
 from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 import yt_dlp
 
-from app.downloaders.base import Downloader, DownloadQuality, QUALITY_MAP
+from app.downloaders.ytdlp_info_cache import extract_info, flat_playlist, resolve_stream
+from app.downloaders.base import Downloader, DownloadQuality, analysis_format_sort, download_concurrency_opts, QUALITY_MAP
+from app.models.audio_model import PlaylistEntry, PlaylistInfo
 from app.models.notes_model import AudioDownloadResult
 from app.models.transcriber_model import TranscriptResult, TranscriptSegment
 from app.utils.path_helper import get_data_dir
@@ -19,6 +22,24 @@ logger = logging.getLogger(__name__)
 BILIBILI_COOKIES_FILE = os.getenv("BILIBILI_COOKIES_FILE", "cookies.txt")
 
 
+def _get_cookies_path() -> Path:
+    cookies_path = Path(BILIBILI_COOKIES_FILE)
+    if not cookies_path.is_absolute():
+        # 相对于 backend 目录
+        cookies_path = Path(__file__).parent.parent.parent / BILIBILI_COOKIES_FILE
+    return cookies_path
+
+
+def _apply_cookies(ydl_opts: dict) -> dict:
+    """
+    所有步骤使用相同的 cookies，yt-dlp 解析结果才能在元信息、字幕、音视频下载之间共享
+    """
+    cookies_path = _get_cookies_path()
+    if cookies_path.exists():
+        ydl_opts['cookiefile'] = str(cookies_path)
+    return ydl_opts
+
+
 class BilibiliDownloader(Downloader, ABC):
     def __init__(self):
         super().__init__()
@@ -41,6 +62,7 @@ class BilibiliDownloader(Downloader, ABC):
         ydl_opts = {
             'format': 'bestaudio[ext=m4a]/bestaudio/best',
             'outtmpl': output_path,
+            **download_concurrency_opts(),
             'postprocessors': [
                 {
                     'key': 'FFmpegExtractAudio',
@@ -52,8 +74,8 @@ class BilibiliDownloader(Downloader, ABC):
             'quiet': False,
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+        with yt_dlp.YoutubeDL(_apply_cookies(ydl_opts)) as ydl:
+            info = extract_info(ydl, video_url, download=True)
             video_id = info.get("id")
             title = info.get("title")
             duration = info.get("duration", 0)
@@ -71,6 +93,72 @@ class BilibiliDownloader(Downloader, ABC):
             video_path=None  # ❗音频下载不包含视频路径
         )
 
+    def fetch_metadata(self, video_url: str) -> Optional[AudioDownloadResult]:
+        """
+        只解析视频信息，不下载音视频
+        """
+        ydl_opts = {
+            'noplaylist': True,
+            'quiet': True,
+            'skip_download': True,
+        }
+
+        with yt_dlp.YoutubeDL(_apply_cookies(ydl_opts)) as ydl:
+            info = extract_info(ydl, video_url, download=False)
+
+        return AudioDownloadResult(
+            file_path="",
+            title=info.get("title"),
+            duration=info.get("duration", 0),
+            cover_url=info.get("thumbnail"),
+            platform="bilibili",
+            video_id=info.get("id"),
+            raw_info=info,
+            video_path=None
+        )
+
+    def resolve_stream_url(self, video_url: str, max_height: Optional[int] = None) -> Optional[dict]:
+        """
+        解析视频流直链（只取视频轨），用于远程截图
+        """
+        ydl_opts = {
+            'format': 'bv*[ext=mp4]/bv*/best',
+            'noplaylist': True,
+            'quiet': True,
+            'skip_download': True,
+        }
+        if max_height:
+            ydl_opts['format_sort'] = [f'res:{max_height}']
+
+        with yt_dlp.YoutubeDL(_apply_cookies(ydl_opts)) as ydl:
+            return resolve_stream(ydl, video_url)
+
+    def expand_playlist(self, video_url: str) -> Optional[PlaylistInfo]:
+        """
+        展开分P视频或合集；链接里的 ?p= 会被去掉，从任意一P都能展开整个分P列表
+        """
+        parsed = urlparse(video_url)
+        query = [(k, v) for k, v in parse_qsl(parsed.query) if k != 'p']
+        playlist_url = urlunparse(parsed._replace(query=urlencode(query)))
+        ydl_opts = {
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'quiet': True,
+            'skip_download': True,
+        }
+
+        with yt_dlp.YoutubeDL(_apply_cookies(ydl_opts)) as ydl:
+            playlist = flat_playlist(ydl, playlist_url)
+        if not playlist or not playlist["entries"]:
+            return None
+        return PlaylistInfo(
+            title=playlist["title"],
+            entries=[
+                PlaylistEntry(url=e["url"], title=e["title"], index=i, duration=e["duration"])
+                for i, e in enumerate(playlist["entries"], start=1)
+            ],
+        )
+
     def download_video(
         self,
         video_url: str,
@@ -95,15 +183,19 @@ class BilibiliDownloader(Downloader, ABC):
         output_path = os.path.join(output_dir, "%(id)s.%(ext)s")
 
         ydl_opts = {
-            'format': 'bv*[ext=mp4]/bestvideo+bestaudio/best',
+            # 带上音轨，后续直接从本地视频提取音频，不再单独下载一次
+            'format': 'bv*[ext=mp4]+ba[ext=m4a]/bv*+ba/best',
             'outtmpl': output_path,
             'noplaylist': True,
             'quiet': False,
             'merge_output_format': 'mp4',  # 确保合并成 mp4
+            # 视频只用于抽帧和截图，不需要高清原画
+            'format_sort': analysis_format_sort(),
+            **download_concurrency_opts(),
         }
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+        with yt_dlp.YoutubeDL(_apply_cookies(ydl_opts)) as ydl:
+            info = extract_info(ydl, video_url, download=True)
             video_id = info.get("id")
             video_path = os.path.join(output_dir, f"{video_id}.mp4")
 
@@ -150,24 +242,20 @@ class BilibiliDownloader(Downloader, ABC):
             'subtitlesformat': 'srt/json3/best',  # 支持多种格式
             'skip_download': True,
             'outtmpl': os.path.join(output_dir, f'{video_id}.%(ext)s'),
+            'noplaylist': True,
             'quiet': True,
         }
 
         # 添加 cookies 支持
-        cookies_path = Path(BILIBILI_COOKIES_FILE)
-        if not cookies_path.is_absolute():
-            # 相对于 backend 目录
-            cookies_path = Path(__file__).parent.parent.parent / BILIBILI_COOKIES_FILE
-
-        if cookies_path.exists():
-            ydl_opts['cookiefile'] = str(cookies_path)
-            logger.info(f"使用 cookies 文件: {cookies_path}")
+        _apply_cookies(ydl_opts)
+        if 'cookiefile' in ydl_opts:
+            logger.info(f"使用 cookies 文件: {ydl_opts['cookiefile']}")
         else:
-            logger.warning(f"B站 cookies 文件不存在: {cookies_path}，字幕获取可能失败")
+            logger.warning(f"B站 cookies 文件不存在: {_get_cookies_path()}，字幕获取可能失败")
 
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
+                info = extract_info(ydl, video_url, download=True)
 
                 # 查找下载的字幕文件
                 subtitles = info.get('requested_subtitles') or {}
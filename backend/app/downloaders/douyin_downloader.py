@@ -14,6 +14,7 @@ from app.downloaders.douyin_helper.abogus import ABogus
 from app.enmus.note_enums import DownloadQuality
 from app.models.audio_model import AudioDownloadResult
 from app.services.cookie_manager import CookieConfigManager
+from app.utils.http_download import download_file
 from app.utils.path_helper import get_data_dir
 from dotenv import load_dotenv
 
@@ -233,9 +234,7 @@ class DouyinDownloader(Downloader):
             }
             url = video_data['aweme_detail']['music']['play_url']['uri']
             # 下载音频
-            audio_data = requests.get(url)
-            with open(output_path, 'wb') as f:
-                f.write(audio_data.content)
+            download_file(url, output_path)
             print(url)
             tags = []
             for tag in video_data['aweme_detail']['video_tag']:
@@ -283,10 +282,7 @@ class DouyinDownloader(Downloader):
             }
 
             url=video_data['aweme_detail']['video']['download_addr']['url_list'][0]
-            _data = requests.get(url,allow_redirects=True,headers=self.headers_config)
-
-            with open(output_path, 'wb') as f:
-                f.write(_data.content)
+            download_file(url, output_path, headers=self.headers_config)
 
             return output_path
         except Exception as e:
@@ -3,12 +3,11 @@ import subprocess
 from abc import ABC
 from typing import Union, Optional
 
-import requests
-
 from app.downloaders.base import Downloader
 from app.downloaders.kuaishou_helper.kuaishou import KuaiShou
 from app.enmus.note_enums import DownloadQuality
 from app.models.audio_model import AudioDownloadResult
+from app.utils.http_download import download_file
 from app.utils.path_helper import get_data_dir
 
 
@@ -54,13 +53,10 @@ class KuaiShouDownloader(Downloader, ABC):
             )
 
         # 下载 mp4 视频
-        resp = requests.get(photo_info['photoUrl'], stream=True)
-        if resp.status_code == 200:
-            with open(mp4_path, "wb") as f:
-                for chunk in resp.iter_content(1024 * 1024):
-                    f.write(chunk)
-        else:
-            raise Exception(f"视频下载失败: {resp.status_code}")
+        try:
+            download_file(photo_info['photoUrl'], mp4_path)
+        except Exception as e:
+            raise Exception(f"视频下载失败: {e}")
 
         # 使用 ffmpeg 转换为 mp3
         try:
@@ -6,7 +6,9 @@ from typing import Union, Optional, List
 
 import yt_dlp
 
-from app.downloaders.base import Downloader, DownloadQuality
+from app.downloaders.ytdlp_info_cache import extract_info, flat_playlist, resolve_stream
+from app.downloaders.base import Downloader, DownloadQuality, analysis_format_sort, download_concurrency_opts
+from app.models.audio_model import PlaylistEntry, PlaylistInfo
 from app.models.notes_model import AudioDownloadResult
 from app.models.transcriber_model import TranscriptResult, TranscriptSegment
 from app.utils.path_helper import get_data_dir
@@ -38,12 +40,13 @@ class YoutubeDownloader(Downloader, ABC):
         ydl_opts = {
             'format': 'bestaudio[ext=m4a]/bestaudio/best',
             'outtmpl': output_path,
+            **download_concurrency_opts(),
             'noplaylist': True,
             'quiet': False,
         }
 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+            info = extract_info(ydl, video_url, download=True)
             video_id = info.get("id")
             title = info.get("title")
             duration = info.get("duration", 0)
@@ -63,6 +66,69 @@ class YoutubeDownloader(Downloader, ABC):
             video_path=None  # ❗音频下载不包含视频路径
         )
 
+    def fetch_metadata(self, video_url: str) -> Optional[AudioDownloadResult]:
+        """
+        只解析视频信息，不下载音视频
+        """
+        ydl_opts = {
+            'noplaylist': True,
+            'quiet': True,
+            'skip_download': True,
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = extract_info(ydl, video_url, download=False)
+
+        return AudioDownloadResult(
+            file_path="",
+            title=info.get("title"),
+            duration=info.get("duration", 0),
+            cover_url=info.get("thumbnail"),
+            platform="youtube",
+            video_id=info.get("id"),
+            raw_info={'tags': info.get('tags')},
+            video_path=None
+        )
+
+    def resolve_stream_url(self, video_url: str, max_height: Optional[int] = None) -> Optional[dict]:
+        """
+        解析视频流直链（只取视频轨），用于远程截图
+        """
+        ydl_opts = {
+            'format': 'bv*[ext=mp4]/bv*/best',
+            'noplaylist': True,
+            'quiet': True,
+            'skip_download': True,
+        }
+        if max_height:
+            ydl_opts['format_sort'] = [f'res:{max_height}']
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return resolve_stream(ydl, video_url)
+
+    def expand_playlist(self, video_url: str) -> Optional[PlaylistInfo]:
+        """
+        展开播放列表（playlist?list= 或带 list 参数的视频链接）
+        """
+        ydl_opts = {
+            'noplaylist': False,
+            'extract_flat': 'in_playlist',
+            'quiet': True,
+            'skip_download': True,
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            playlist = flat_playlist(ydl, video_url)
+        if not playlist or not playlist["entries"]:
+            return None
+        return PlaylistInfo(
+            title=playlist["title"],
+            entries=[
+                PlaylistEntry(url=e["url"], title=e["title"], index=i, duration=e["duration"])
+                for i, e in enumerate(playlist["entries"], start=1)
+            ],
+        )
+
     def download_video(
         self,
         video_url: str,
@@ -86,10 +152,13 @@ class YoutubeDownloader(Downloader, ABC):
             'noplaylist': True,
             'quiet': False,
             'merge_output_format': 'mp4',  # 确保合并成 mp4
+            # 视频只用于抽帧和截图，不需要高清原画
+            'format_sort': analysis_format_sort(),
+            **download_concurrency_opts(),
         }
 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+            info = extract_info(ydl, video_url, download=True)
             video_id = info.get("id")
             video_path = os.path.join(output_dir, f"{video_id}.mp4")
 
@@ -126,12 +195,13 @@ class YoutubeDownloader(Downloader, ABC):
             'subtitlesformat': 'json3',
             'skip_download': True,
             'outtmpl': os.path.join(output_dir, f'{video_id}.%(ext)s'),
+            'noplaylist': True,
             'quiet': True,
         }
 
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
+                info = extract_info(ydl, video_url, download=True)
 
                 # 查找下载的字幕文件
                 subtitles = info.get('requested_subtitles') or {}
@@ -0,0 +1,116 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class YtdlpInfoCache:
+    """
+    缓存 yt-dlp 未经格式处理的解析结果（process=False），同一链接的元信息、字幕、音频、视频
+    各步骤共享一次解析，各自只在本地重新做格式选择。
+    媒体直链带有时效签名，所以只缓存较短时间
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._key_locks: dict = {}
+
+    def get(self, key: tuple, extract: Callable[[], dict]) -> dict:
+        """
+        返回解析结果的副本；同一 key 并发请求时只有一个线程真正解析，其余等待复用
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and self.clock() - entry[0] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    info = entry[1]
+                else:
+                    info = None
+            if info is None:
+                info = extract()
+                with self._lock:
+                    self._entries[key] = (self.clock(), info)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        old_key, _ = self._entries.popitem(last=False)
+                        self._key_locks.pop(old_key, None)
+            else:
+                logger.info(f"复用 yt-dlp 解析结果: {key[0]}")
+        # process_ie_result 会原地修改字典，每次返回独立副本
+        return copy.deepcopy(info)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+
+
+ytdlp_info_cache = YtdlpInfoCache(
+    ttl_seconds=float(os.getenv("YTDLP_INFO_CACHE_TTL_SECONDS", "600")),
+    max_entries=int(os.getenv("YTDLP_INFO_CACHE_MAX_ENTRIES", "32")),
+)
+
+
+def extract_info(ydl, video_url: str, download: bool = True) -> dict:
+    """
+    代替 ydl.extract_info：解析结果从共享缓存获取，再按当前 ydl 的参数（格式、字幕、输出模板）处理和下载
+
+    :param ydl: yt_dlp.YoutubeDL 实例
+    :param video_url: 视频链接
+    :param download: 是否下载
+    :return: 处理后的 info 字典
+    """
+    cookiefile: Optional[str] = ydl.params.get("cookiefile")
+    # noplaylist 决定分P视频 / 带 list 的链接解析成单个视频还是整个列表，必须参与缓存 key
+    noplaylist = bool(ydl.params.get("noplaylist"))
+    info = ytdlp_info_cache.get(
+        (video_url, cookiefile, noplaylist),
+        lambda: ydl.extract_info(video_url, download=False, process=False),
+    )
+    return ydl.process_ie_result(info, download=download)
+
+
+def resolve_stream(ydl, video_url: str) -> Optional[dict]:
+    """
+    按 ydl 的格式参数选出视频流，返回直链和访问它所需的请求头（如 B 站的 Referer）
+    """
+    info = extract_info(ydl, video_url, download=False)
+    formats = info.get("requested_formats") or [info]
+    video = next((f for f in formats if f.get("vcodec") not in (None, "none")), formats[0])
+    if not video.get("url"):
+        return None
+    return {"url": video["url"], "headers": video.get("http_headers") or info.get("http_headers") or {}}
+
+
+def flat_playlist(ydl, video_url: str) -> Optional[dict]:
+    """
+    平铺解析合集 / 播放列表（ydl 需设置 extract_flat），不逐个解析子视频。
+    解析结果取决于 noplaylist 参数，所以不走共享缓存
+
+    :return: {"title", "entries": [{"url", "title", "duration"}]}，不是合集时返回 None
+    """
+    info = ydl.extract_info(video_url, download=False)
+    if not info or info.get("_type") not in ("playlist", "multi_video"):
+        return None
+    entries = []
+    for entry in info.get("entries") or []:
+        if not entry:
+            continue
+        url = entry.get("webpage_url") or entry.get("url")
+        if url:
+            entries.append({"url": url, "title": entry.get("title") or "", "duration": entry.get("duration")})
+    return {"title": info.get("title") or "", "entries": entries}
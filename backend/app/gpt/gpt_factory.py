@@ -1,13 +1,27 @@
+import os
+
 from openai import OpenAI
 
 from app.gpt.base import GPT
-from app.gpt.provider.OpenAI_compatible_provider import OpenAICompatibleProvider
+from app.gpt.provider.OpenAI_compatible_provider import get_cached_provider
 from app.gpt.universal_gpt import UniversalGPT
 from app.models.model_config import ModelConfig
 
 
 class GPTFactory:
     @staticmethod
-    def from_config(config: ModelConfig) -> GPT:
-        client = OpenAICompatibleProvider(api_key=config.api_key, base_url=config.base_url).get_client
-        return UniversalGPT(client=client, model=config.model_name)
\ No newline at end of file
+    def from_config(config: ModelConfig, hedge: GPT | None = None) -> GPT:
+        provider = get_cached_provider(config.api_key, config.base_url, config.provider_id)
+        async_client = None
+        if os.getenv("OPENAI_ASYNC_ENABLED", "true").lower() == "true":
+            async_client = provider.get_async_client
+        return UniversalGPT(
+            client=provider.get_client,
+            model=config.model_name,
+            # 限流、并发和延迟统计都按供应商区分，多个供应商共用同一 base_url 时互不影响
+            provider_key=config.provider_id or config.base_url,
+            async_client=async_client,
+            rpm=config.rpm,
+            tpm=config.tpm,
+            hedge=hedge,
+        )
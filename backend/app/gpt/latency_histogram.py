@@ -0,0 +1,51 @@
+import bisect
+import threading
+from typing import Optional
+
+# 桶上界（秒），按约 1.5 倍递增覆盖 0.25s ~ 10min，最后一个桶收纳更慢的请求
+BUCKET_BOUNDS = [0.25 * (1.5 ** i) for i in range(20)]
+
+
+class LatencyHistogram:
+    """
+    固定分桶的延迟直方图，线程安全，内存占用与请求量无关
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+
+    def record(self, seconds: float) -> None:
+        idx = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.counts[idx] += 1
+            self.total += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        返回第 q 分位所在桶的上界，没有样本时返回 None
+        """
+        with self._lock:
+            if self.total == 0:
+                return None
+            target = q * self.total
+            seen = 0
+            for idx, count in enumerate(self.counts):
+                seen += count
+                if seen >= target:
+                    return BUCKET_BOUNDS[min(idx, len(BUCKET_BOUNDS) - 1)]
+            return BUCKET_BOUNDS[-1]
+
+
+_histograms: dict = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(key: str) -> LatencyHistogram:
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            _histograms[key] = histogram
+        return histogram
@@ -1,18 +1,21 @@
-BASE_PROMPT = '''
+# 笔记 prompt 由以下公共片段拼成，legacy 与前缀缓存两种布局共用，修改说明时只需改一处
+NOTE_INTRO_PROMPT = '''
 你是一个专业的笔记助手，擅长将视频转录内容整理成清晰、有条理且信息丰富的笔记。
 
 语言要求：
 - 笔记必须使用 **中文** 撰写。
 - 专有名词、技术术语、品牌名称和人名应适当保留 **英文**。
+'''
 
+VIDEO_INFO_PROMPT = '''
 视频标题：
 {video_title}
 
 视频标签：
 {tags}
+'''
 
-
-
+OUTPUT_RULES_PROMPT = '''
 输出说明：
 - 仅返回最终的 **Markdown 内容**。
 - **不要**将输出包裹在代码块中（例如：```` ```markdown ````，```` ``` ````）。
@@ -24,15 +27,17 @@ BASE_PROMPT = '''
 请确保以下格式 **不会出现误渲染**：
  `1. **xxx**`
  `1\\. **xxx**` 或 `## 1. xxx`
+'''
 
+SEGMENTS_PROMPT = '''
 视频分段（格式：开始时间 - 内容）：
 
 ---
 {segment_text}
 ---
+'''
 
-你的任务：
-根据上面的分段转录内容，生成结构化的笔记，遵循以下原则：
+NOTE_RULES_PROMPT = '''，生成结构化的笔记，遵循以下原则：
 
 1. **完整信息**：记录尽可能多的相关细节，确保内容全面。
 2. **去除无关内容**：省略广告、填充词、问候语和不相关的言论。
@@ -47,6 +52,28 @@ BASE_PROMPT = '''
 
 '''
 
+BASE_PROMPT = (
+    NOTE_INTRO_PROMPT
+    + VIDEO_INFO_PROMPT
+    + "\n\n"
+    + OUTPUT_RULES_PROMPT
+    + SEGMENTS_PROMPT
+    + "\n你的任务：\n根据上面的分段转录内容"
+    + NOTE_RULES_PROMPT
+)
+
+
+# 前缀缓存友好的布局：不随分片变化的说明放在 system 消息最前面，转写内容放在最后的 user 消息里
+CACHE_SYSTEM_PROMPT = (
+    NOTE_INTRO_PROMPT
+    + OUTPUT_RULES_PROMPT
+    + "\n你的任务：\n根据用户发送的视频分段转录内容（格式：开始时间 - 内容）"
+    + NOTE_RULES_PROMPT
+)
+
+CACHE_VIDEO_INFO_PROMPT = "\n" + VIDEO_INFO_PROMPT
+
+CACHE_USER_PROMPT = SEGMENTS_PROMPT.lstrip("\n")
 
 LINK='''
 9. **Add time markers**: THIS IS IMPORTANT For every main heading (`##`), append the starting time of that segment using the format ,start with *Content ,eg: `*Content-[mm:ss]`.
@@ -76,3 +103,10 @@ MERGE_PROMPT = '''
 - 保持中文输出，专有名词保留英文
 - 不要使用代码块包裹输出
 '''
+
+CONTINUE_PROMPT = '''
+上一条回复在输出过程中被中断，请从中断的位置继续输出：
+- 不要重复已经输出的内容
+- 不要添加任何解释或说明
+- 保持相同的 Markdown 结构
+'''
@@ -1,4 +1,4 @@
-from app.gpt.prompt import BASE_PROMPT
+from app.gpt.prompt import BASE_PROMPT, CACHE_SYSTEM_PROMPT, CACHE_VIDEO_INFO_PROMPT, CACHE_USER_PROMPT
 
 note_formats = [
     {'label': '目录', 'value': 'toc'},
@@ -43,6 +43,27 @@ def generate_base_prompt(title, segment_text, tags, _format=None, style=None, ex
     return prompt
 
 
+# 生成前缀缓存友好的 prompt：返回 (system, user) 两部分
+# 同一视频的所有分片请求共享完全相同的 system 前缀，供应商侧的 prompt cache 可以命中
+def generate_prompt_parts(title, segment_text, tags, _format=None, style=None, extras=None):
+    system_prompt = CACHE_SYSTEM_PROMPT
+
+    if _format:
+        system_prompt += "\n" + "\n".join([get_format_function(f) for f in _format])
+
+    if style:
+        system_prompt += "\n" + get_style_format(style)
+
+    if extras:
+        system_prompt += f"\n{extras}"
+
+    # 标题与标签只在同一视频内不变，放在静态说明之后
+    system_prompt += CACHE_VIDEO_INFO_PROMPT.format(video_title=title, tags=tags)
+
+    user_prompt = CACHE_USER_PROMPT.format(segment_text=segment_text)
+    return system_prompt, user_prompt
+
+
 # 获取格式函数
 def get_format_function(format_type):
     format_map = {
@@ -1,19 +1,70 @@
+import hashlib
+import importlib.util
+import os
+import threading
+import weakref
 from typing import Optional, Union
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 
 from app.utils.logger import get_logger
 
 logging= get_logger(__name__)
+
+# 安装了 h2 时启用 HTTP/2，同一连接上多路复用并发请求
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+
+
+def _build_limits() -> httpx.Limits:
+    max_connections = int(os.getenv("OPENAI_ASYNC_MAX_CONNECTIONS", "32"))
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=60,
+    )
+
+
+# 每个 base_url 共享一个异步连接池，避免每次请求重新建立 TLS 连接
+_async_http_clients: dict = {}
+_async_http_clients_lock = threading.Lock()
+
+
+def get_shared_async_http_client(base_url: str) -> httpx.AsyncClient:
+    with _async_http_clients_lock:
+        client = _async_http_clients.get(base_url)
+        if client is None:
+            client = DefaultAsyncHttpxClient(limits=_build_limits(), http2=HTTP2_ENABLED)
+            _async_http_clients[base_url] = client
+            logging.info(f"创建异步连接池：{base_url}")
+        return client
+
+
 class OpenAICompatibleProvider:
     def __init__(self, api_key: str, base_url: str, model: Union[str, None]=None):
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        http_client = DefaultHttpxClient(limits=_build_limits(), http2=HTTP2_ENABLED)
+        self.client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        # 客户端被注册表摘除后，等最后一个持有它的任务释放引用时再关闭连接池
+        weakref.finalize(self.client, http_client.close)
+        self.api_key = api_key
+        self.base_url = base_url
         self.model = model
+        self._async_client: Optional[AsyncOpenAI] = None
 
     @property
     def get_client(self):
         return self.client
 
+    @property
+    def get_async_client(self) -> AsyncOpenAI:
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=get_shared_async_http_client(self.base_url),
+            )
+        return self._async_client
+
     @staticmethod
     def test_connection(api_key: str, base_url: str) -> bool:
         try:
@@ -28,4 +79,41 @@ class OpenAICompatibleProvider:
             logging.info(f"连通性测试失败：{e}")
 
             # print(f"Error connecting to OpenAI API: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+# 供应商客户端注册表：同一供应商配置复用同一个 OpenAI 客户端及其 keep-alive 连接
+_providers: dict = {}
+_providers_lock = threading.Lock()
+
+
+def _registry_key(provider_id: Optional[str], base_url: str, api_key: str) -> tuple:
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    return provider_id, base_url, key_hash
+
+
+def get_cached_provider(api_key: str, base_url: str, provider_id: Optional[str] = None) -> OpenAICompatibleProvider:
+    """
+    按 (provider_id, base_url, api_key 哈希) 获取复用的客户端，配置变化时自然落到新的 key 上
+    """
+    key = _registry_key(provider_id, base_url, api_key)
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = OpenAICompatibleProvider(api_key=api_key, base_url=base_url)
+            _providers[key] = provider
+            logging.info(f"创建模型客户端：provider_id={provider_id}, base_url={base_url}")
+        return provider
+
+
+def invalidate_provider_clients(provider_id: str) -> None:
+    """
+    供应商被修改或删除后丢弃其缓存的客户端，下次使用时按新配置重建
+    """
+    # 只从注册表摘除而不立即 close：正在执行的任务还持有旧客户端，引用全部释放后由 finalize 关闭连接池
+    with _providers_lock:
+        stale_keys = [key for key in _providers if key[0] == provider_id]
+        for key in stale_keys:
+            _providers.pop(key)
+    if stale_keys:
+        logging.info(f"已清除模型客户端缓存：provider_id={provider_id}")
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """供应商熔断中，请求直接失败而不再发出"""
+
+    def __init__(self, provider_key: str, retry_in: float):
+        super().__init__(f"LLM 供应商 {provider_key} 熔断中，{retry_in:.1f} 秒后重试")
+        self.provider_key = provider_key
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为每分钟配额，按秒匀速补充。
+    reserve 不阻塞，只返回需要等待的秒数，同步和异步调用方各自 sleep
+    """
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.per_minute = 0
+        self.tokens = 0.0
+        self.updated_at = clock()
+        self.set_rate(per_minute)
+
+    def set_rate(self, per_minute: int) -> None:
+        with self._lock:
+            if per_minute == self.per_minute:
+                return
+            # 调整配额时不回填令牌，避免每次改配置都放出一波突发请求；从不限流切到限流时才从满桶开始
+            if self.per_minute <= 0:
+                self.tokens = float(per_minute)
+            else:
+                self.tokens = min(self.tokens, float(per_minute))
+            self.per_minute = per_minute
+            self.updated_at = self.clock()
+
+    def reserve(self, amount: float = 1) -> float:
+        with self._lock:
+            if self.per_minute <= 0:
+                return 0.0
+            now = self.clock()
+            rate = self.per_minute / 60.0
+            self.tokens = min(float(self.per_minute), self.tokens + (now - self.updated_at) * rate)
+            self.updated_at = now
+            # 单次请求超过桶容量时按容量计，否则永远等不到
+            self.tokens -= min(amount, self.per_minute)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / rate
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后熔断，冷却期过后进入半开状态放行一个探测请求，
+    探测成功则恢复，失败则重新熔断
+    """
+
+    def __init__(self, failure_threshold: int, recovery_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.probe_started_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if self.clock() - self.opened_at >= self.recovery_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> float:
+        """返回 0 表示可以发请求，否则返回距离下次探测的秒数"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            now = self.clock()
+            remaining = self.recovery_seconds - (now - self.opened_at)
+            if remaining > 0:
+                return remaining
+            if self.probing:
+                # 探测请求迟迟没有结果（例如被取消后没能释放）时，超过冷却时间就放行新的探测
+                probe_remaining = self.recovery_seconds - (now - self.probe_started_at)
+                if probe_remaining > 0:
+                    return probe_remaining
+            self.probing = True
+            self.probe_started_at = now
+            return 0.0
+
+    def release_probe(self) -> None:
+        """探测请求被取消、既没有成功也没有失败时调用，让下一个请求可以重新探测"""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回本次是否触发了熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self.probing = False
+                return True
+            return False
+
+
+class ProviderLimiter:
+    """
+    单个供应商的限流状态：RPM/TPM 令牌桶 + Retry-After 冷却 + 熔断器，跨任务共享
+    """
+
+    def __init__(self, provider_key: str, rpm: int = 0, tpm: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.provider_key = provider_key
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.breaker = CircuitBreaker(
+            failure_threshold=max(1, int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))),
+            recovery_seconds=float(os.getenv("LLM_CIRCUIT_RECOVERY_SECONDS", "30")),
+            clock=clock,
+        )
+        self._lock = threading.Lock()
+        self.blocked_until = 0.0
+
+    def configure(self, rpm: int, tpm: int) -> None:
+        self.requests.set_rate(rpm)
+        self.tokens.set_rate(tpm)
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        申请一次请求的额度，返回发请求前需要等待的秒数；熔断中直接抛出 CircuitOpenError
+        """
+        retry_in = self.breaker.allow()
+        if retry_in > 0:
+            raise CircuitOpenError(self.provider_key, retry_in)
+
+        with self._lock:
+            cooldown = max(0.0, self.blocked_until - self.clock())
+        return max(cooldown, self.requests.reserve(1), self.tokens.reserve(tokens))
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+
+    def release_probe(self) -> None:
+        self.breaker.release_probe()
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        if retry_after:
+            with self._lock:
+                self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+        if self.breaker.record_failure():
+            logger.warning(f"LLM 供应商 {self.provider_key} 连续失败，熔断 {self.breaker.recovery_seconds} 秒")
+
+
+_limiters: dict = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider_key: str, rpm: Optional[int] = None, tpm: Optional[int] = None) -> ProviderLimiter:
+    """
+    按 provider_key 获取共享的限流器。
+    rpm/tpm 都为 None 表示调用方不关心配额（如拉取模型列表），沿用现有配置；传 0 表示不限制
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider_key)
+        if limiter is None:
+            limiter = ProviderLimiter(provider_key)
+            _limiters[provider_key] = limiter
+    if rpm is not None or tpm is not None:
+        limiter.configure(rpm or 0, tpm or 0)
+    return limiter
+
+
+def get_status_code(exc: Exception) -> Optional[int]:
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_after(exc: Exception) -> Optional[float]:
+    """
+    从异常附带的响应头解析 Retry-After（支持 retry-after-ms、秒数和 HTTP 日期），没有则返回 None
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
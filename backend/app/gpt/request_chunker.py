@@ -1,5 +1,6 @@
+import json
 from dataclasses import dataclass
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
 
 
 @dataclass
@@ -9,21 +10,55 @@ class ChunkPayload:
 
 
 class RequestChunker:
-    def __init__(self, message_builder: Callable, max_bytes: int, size_estimator: Optional[Callable] = None):
+    def __init__(self, message_builder: Callable, max_bytes: int, size_estimator: Optional[Callable] = None,
+                 token_budget: Optional[int] = None, token_estimator: Optional[Callable[[str], int]] = None,
+                 image_token_cost: int = 0, segment_formatter: Optional[Callable] = None):
         self.message_builder = message_builder
         self.max_bytes = max_bytes
         self.size_estimator = size_estimator
+        self.token_budget = token_budget
+        self.token_estimator = token_estimator or (lambda text: len(text))
+        self.image_token_cost = image_token_cost
+        # 分段在 prompt 中的单行文本，提供时直接按这一行估算增量，不必为每个分段重建整个 prompt
+        self.segment_formatter = segment_formatter
 
     def estimate(self, messages) -> int:
         if self.size_estimator:
             return self.size_estimator(messages)
-        import json
         return len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
 
+    def estimate_tokens(self, messages) -> int:
+        if self.token_budget is None:
+            return 0
+        tokens = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                tokens += self.token_estimator(content)
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    tokens += self.token_estimator(part.get("text", ""))
+                else:
+                    tokens += self.image_token_cost
+        return tokens
+
     def _messages_size(self, segments, image_urls, **kwargs) -> int:
         messages = self.message_builder(segments, image_urls, **kwargs)
         return self.estimate(messages)
 
+    def _messages_cost(self, segments, image_urls, **kwargs) -> Tuple[int, int]:
+        messages = self.message_builder(segments, image_urls, **kwargs)
+        return self.estimate(messages), self.estimate_tokens(messages)
+
+    def _within_budget(self, size: int, tokens: int) -> bool:
+        if size > self.max_bytes:
+            return False
+        return self.token_budget is None or tokens <= self.token_budget
+
+    def _fits(self, segments, image_urls, **kwargs) -> bool:
+        return self._within_budget(*self._messages_cost(segments, image_urls, **kwargs))
+
     def _get_text(self, segment) -> str:
         if isinstance(segment, dict):
             return segment.get("text", "")
@@ -49,8 +84,7 @@ class RequestChunker:
         while lo <= hi:
             mid = (lo + hi) // 2
             candidate = self._make_segment(segment, text[:mid])
-            size = self._messages_size([candidate], [], **kwargs)
-            if size <= self.max_bytes:
+            if self._fits([candidate], [], **kwargs):
                 best = mid
                 lo = mid + 1
             else:
@@ -61,35 +95,69 @@ class RequestChunker:
         tail = self._make_segment(segment, text[best:])
         return head, tail
 
+    def _segment_cost(self, segment, base_size: int, base_tokens: int, **kwargs) -> Tuple[int, int]:
+        if self.segment_formatter is None:
+            seg_size, seg_tokens = self._messages_cost([segment], [], **kwargs)
+            return seg_size - base_size, seg_tokens - base_tokens
+        line = self.segment_formatter(segment)
+        # JSON 转义后的字节数：去掉两侧引号的 2 字节，正好补上分隔换行符转义后的 "\n"
+        size = len(json.dumps(line, ensure_ascii=False).encode("utf-8"))
+        tokens = self.token_estimator(line) + 1 if self.token_budget is not None else 0
+        return size, tokens
+
+    def _plan_segment_batches(self, segments: list, **kwargs) -> List[list]:
+        """
+        线性时间规划分片：固定的 prompt 开销只计算一次，每个分段的增量字节数 / token 数
+        也只计算一次，然后按预算顺序装箱。
+        """
+        base_size, base_tokens = self._messages_cost([], [], **kwargs)
+        batches: List[list] = []
+        batch: list = []
+        batch_size, batch_tokens = base_size, base_tokens
+
+        seg_idx = 0
+        while seg_idx < len(segments):
+            seg_size, seg_tokens = self._segment_cost(segments[seg_idx], base_size, base_tokens, **kwargs)
+            if self._within_budget(batch_size + seg_size, batch_tokens + seg_tokens):
+                batch.append(segments[seg_idx])
+                batch_size += seg_size
+                batch_tokens += seg_tokens
+                seg_idx += 1
+                continue
+            if not batch:
+                head, tail = self._split_segment_to_fit(segments[seg_idx], **kwargs)
+                segments[seg_idx] = head
+                segments.insert(seg_idx + 1, tail)
+                continue
+            batches.append(batch)
+            batch = []
+            batch_size, batch_tokens = base_size, base_tokens
+
+        if batch:
+            batches.append(batch)
+
+        # 增量估算在分隔符、转义等处可能略有偏差，按实际请求体复核一次
+        verified: List[list] = []
+        for batch in batches:
+            verified.extend(self._split_batch_to_fit(batch, **kwargs))
+        return verified
+
+    def _split_batch_to_fit(self, batch: list, **kwargs) -> List[list]:
+        if len(batch) <= 1 or self._fits(batch, [], **kwargs):
+            return [batch]
+        mid = len(batch) // 2
+        return self._split_batch_to_fit(batch[:mid], **kwargs) + self._split_batch_to_fit(batch[mid:], **kwargs)
+
     def chunk(self, segments: list, image_urls: list, **kwargs) -> List[ChunkPayload]:
         segments = list(segments or [])
         image_urls = list(image_urls or [])
         if not segments and not image_urls:
             return []
 
-        chunks: List[ChunkPayload] = []
-        seg_idx = 0
-
-        while seg_idx < len(segments):
-            batch_segments = []
-            while seg_idx < len(segments):
-                candidate = batch_segments + [segments[seg_idx]]
-                size = self._messages_size(candidate, [], **kwargs)
-                if size <= self.max_bytes:
-                    batch_segments = candidate
-                    seg_idx += 1
-                    continue
-                if not batch_segments:
-                    head, tail = self._split_segment_to_fit(segments[seg_idx], **kwargs)
-                    segments[seg_idx] = head
-                    segments.insert(seg_idx + 1, tail)
-                    continue
-                break
-
-            if not batch_segments:
-                raise ValueError("unable to fit any content into chunk")
-
-            chunks.append(ChunkPayload(segments=batch_segments, image_urls=[]))
+        chunks: List[ChunkPayload] = [
+            ChunkPayload(segments=batch, image_urls=[])
+            for batch in self._plan_segment_batches(segments, **kwargs)
+        ]
 
         if not image_urls:
             return chunks
@@ -102,7 +170,7 @@ class RequestChunker:
                 appended = False
                 for chunk in chunks[-1:]:
                     candidate_images = chunk.image_urls + [image]
-                    if self._messages_size(chunk.segments, candidate_images, **kwargs) <= self.max_bytes:
+                    if self._fits(chunk.segments, candidate_images, **kwargs):
                         chunk.image_urls = candidate_images
                         appended = True
                         break
@@ -110,7 +178,7 @@ class RequestChunker:
                 if appended:
                     continue
 
-                if self._messages_size([], [image], **kwargs) > self.max_bytes:
+                if not self._fits([], [image], **kwargs):
                     raise ValueError("single image payload exceeds max_bytes")
                 chunks.append(ChunkPayload(segments=[], image_urls=[image]))
             return chunks
@@ -124,7 +192,7 @@ class RequestChunker:
             for chunk_idx in range(preferred_idx, len(chunks)):
                 chunk = chunks[chunk_idx]
                 candidate_images = chunk.image_urls + [image]
-                if self._messages_size(chunk.segments, candidate_images, **kwargs) <= self.max_bytes:
+                if self._fits(chunk.segments, candidate_images, **kwargs):
                     chunk.image_urls = candidate_images
                     placed = True
                     break
@@ -132,7 +200,7 @@ class RequestChunker:
             if placed:
                 continue
 
-            if self._messages_size([], [image], **kwargs) > self.max_bytes:
+            if not self._fits([], [image], **kwargs):
                 raise ValueError("single image payload exceeds max_bytes")
             chunks.append(ChunkPayload(segments=[], image_urls=[image]))
 
@@ -149,8 +217,7 @@ class RequestChunker:
                     messages = build_messages(candidate, [], **kwargs)
                 except TypeError:
                     messages = build_messages(candidate, **kwargs)
-                size = self.estimate(messages)
-                if size <= self.max_bytes:
+                if self._within_budget(self.estimate(messages), self.estimate_tokens(messages)):
                     group = candidate
                     idx += 1
                     continue
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _json_default(obj) -> str:
+    # 图片引用（ImageRef）按内容摘要参与 key，不必为了算 key 去读取并编码图片
+    digest = getattr(obj, "digest", None)
+    if digest is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return f"sha256:{digest}"
+
+
+class ResponseCache:
+    """
+    LLM 响应的磁盘缓存：key 为 (model, temperature, messages) 的哈希，
+    每条记录一个文件，按 mtime 做 LRU 淘汰，并支持按条目过期
+    """
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int, max_entries: int, ttl_seconds: float):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 估算的缓存占用，只有超限时才扫描目录，避免每次写入都遍历全部文件
+        self._approx_entries: Optional[int] = None
+        self._approx_bytes = 0
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: list) -> str:
+        raw = json.dumps(
+            {"model": model, "temperature": temperature, "messages": messages},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=_json_default,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            hits, misses = self.hits, self.misses
+        logger.info(f"LLM 响应缓存{'命中' if hit else '未命中'}（累计 命中 {hits} / 未命中 {misses}）")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._record(hit=False)
+            return None
+
+        if self.ttl_seconds > 0 and time.time() - data.get("created_at", 0) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            self._record(hit=False)
+            return None
+
+        try:
+            # 刷新 mtime，作为 LRU 的访问时间
+            os.utime(path)
+        except OSError:
+            pass
+        self._record(hit=True)
+        return data.get("text")
+
+    def set(self, key: str, text: str) -> None:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp_path.write_text(
+                json.dumps({"created_at": time.time(), "text": text}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp_path.replace(path)
+            size = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"写入 LLM 响应缓存失败: {e}")
+            return
+        self._evict(size)
+
+    def _entries(self) -> list:
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self, added_bytes: int) -> None:
+        with self._lock:
+            if self._approx_entries is not None:
+                self._approx_entries += 1
+                self._approx_bytes += added_bytes
+                if self._approx_entries <= self.max_entries and self._approx_bytes <= self.max_bytes:
+                    return
+
+            entries = self._entries()
+            total_bytes = sum(size for _, size, _ in entries)
+
+            entries.sort(key=lambda item: item[0])
+            for _, size, path in entries:
+                if len(entries) <= self.max_entries and total_bytes <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                entries = entries[1:]
+                total_bytes -= size
+            self._approx_entries = len(entries)
+            self._approx_bytes = total_bytes
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+            self._approx_entries = 0
+            self._approx_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._entries()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    返回进程内共享的响应缓存，LLM_CACHE_ENABLED=false 时返回 None
+    """
+    global _response_cache
+    if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            default_dir = Path(os.getenv("NOTE_OUTPUT_DIR", "note_results")) / "llm_cache"
+            _response_cache = ResponseCache(
+                cache_dir=os.getenv("LLM_CACHE_DIR", str(default_dir)),
+                max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            )
+        return _response_cache
@@ -0,0 +1,68 @@
+import math
+import os
+import re
+
+# 中日韩字符基本是 1 字 ≈ 1 token，其余字符按 4 字符 ≈ 1 token 粗略估算
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]")
+
+# 常见模型的上下文窗口（token），按模型名最长前缀匹配
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+    "deepseek": 64000,
+    "qwen": 32768,
+    "qwen-long": 1000000,
+    "qwen-plus": 131072,
+    "qwen-max": 32768,
+    "qwen-turbo": 1000000,
+    "glm-4": 128000,
+    "moonshot-v1-8k": 8192,
+    "moonshot-v1-32k": 32768,
+    "moonshot-v1-128k": 131072,
+    "claude": 200000,
+    "gemini": 1048576,
+}
+
+DEFAULT_CONTEXT_TOKENS = 128000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    快速估算文本 token 数，不依赖具体模型的 tokenizer
+
+    :param text: 待估算文本
+    :return: 估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def get_context_tokens(model: str) -> int:
+    """
+    获取模型上下文窗口大小，可通过 OPENAI_CONTEXT_TOKENS 强制指定
+    """
+    override = os.getenv("OPENAI_CONTEXT_TOKENS")
+    if override:
+        return int(override)
+    name = (model or "").lower().split("/")[-1]
+    matched = [prefix for prefix in MODEL_CONTEXT_TOKENS if name.startswith(prefix)]
+    if not matched:
+        return DEFAULT_CONTEXT_TOKENS
+    return MODEL_CONTEXT_TOKENS[max(matched, key=len)]
+
+
+def get_prompt_token_budget(model: str) -> int:
+    """
+    单次请求可用于输入的 token 预算：上下文窗口扣除输出预留，并留出估算误差余量
+    """
+    reserved_output = int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "8192"))
+    budget = int((get_context_tokens(model) - reserved_output) * 0.9)
+    return max(1024, budget)
@@ -1,47 +1,98 @@
 from app.gpt.base import GPT
-from app.gpt.prompt_builder import generate_base_prompt
+from app.gpt.prompt_builder import generate_base_prompt, generate_prompt_parts
 from app.models.gpt_model import GPTSource
+import asyncio
 import os
 import hashlib
 import json
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from pathlib import Path
 
-from app.gpt.prompt import BASE_PROMPT, AI_SUM, SCREENSHOT, LINK, MERGE_PROMPT
+from app.gpt.prompt import BASE_PROMPT, AI_SUM, SCREENSHOT, LINK, MERGE_PROMPT, CONTINUE_PROMPT
 from app.gpt.utils import fix_markdown
 from app.gpt.request_chunker import RequestChunker
+from app.gpt.response_cache import get_response_cache
+from app.gpt.latency_histogram import get_latency_histogram
+from app.gpt.rate_limiter import CircuitOpenError, get_provider_limiter, get_retry_after, get_status_code
+from app.gpt.token_counter import estimate_tokens, get_prompt_token_budget
+from app.models.image_model import ImageRef
 from app.models.transcriber_model import TranscriptSegment
+from app.utils.async_runner import run_coroutine, submit_coroutine
+from app.utils.logger import get_logger
 from datetime import timedelta
 from typing import List
 
+logger = get_logger(__name__)
+
+# 同一供应商（按 provider_key 区分）的并发请求上限，跨任务共享
+_provider_semaphores: dict = {}
+_provider_semaphores_lock = threading.Lock()
+
+
+def _get_provider_semaphore(provider_key: str) -> threading.BoundedSemaphore:
+    with _provider_semaphores_lock:
+        semaphore = _provider_semaphores.get(provider_key)
+        if semaphore is None:
+            limit = max(1, int(os.getenv("OPENAI_PROVIDER_MAX_CONCURRENCY", "4")))
+            semaphore = threading.BoundedSemaphore(limit)
+            _provider_semaphores[provider_key] = semaphore
+        return semaphore
+
+
+# 异步路径使用的信号量，只会在后台事件循环线程中创建和使用
+_provider_async_semaphores: dict = {}
+
+
+def _get_provider_async_semaphore(provider_key: str) -> asyncio.Semaphore:
+    semaphore = _provider_async_semaphores.get(provider_key)
+    if semaphore is None:
+        limit = max(1, int(os.getenv("OPENAI_PROVIDER_MAX_CONCURRENCY", "4")))
+        semaphore = asyncio.Semaphore(limit)
+        _provider_async_semaphores[provider_key] = semaphore
+    return semaphore
+
 
 class UniversalGPT(GPT):
-    def __init__(self, client, model: str, temperature: float = 0.7):
+    def __init__(self, client, model: str, temperature: float = 0.7, provider_key: str | None = None,
+                 async_client=None, rpm: int | None = None, tpm: int | None = None, hedge=None):
         self.client = client
+        self.async_client = async_client
         self.model = model
         self.temperature = temperature
+        self.provider_key = provider_key or str(getattr(client, "base_url", "") or "default")
+        self.rate_limiter = get_provider_limiter(self.provider_key, rpm, tpm)
+        self.latency = get_latency_histogram(f"{self.provider_key}|{model}")
+        # 备用供应商/模型（UniversalGPT），请求超过主供应商 p90 延迟仍未返回时并发补发一份
+        self.hedge = hedge
         self.screenshot = False
         self.link = False
         self.max_request_bytes = int(os.getenv("OPENAI_MAX_REQUEST_BYTES", str(45 * 1024 * 1024)))
+        self.max_prompt_tokens = get_prompt_token_budget(model)
+        self.image_token_cost = int(os.getenv("OPENAI_IMAGE_TOKENS", "1105"))
+        self.map_concurrency = max(1, int(os.getenv("OPENAI_MAP_CONCURRENCY", "4")))
+        # legacy：转写内容嵌在 prompt 中间；prefix_cache：静态说明放 system，转写内容放最后的 user 消息
+        self.prompt_layout = os.getenv("PROMPT_LAYOUT", "legacy").lower()
+        self.response_cache = get_response_cache()
+        # 目录在第一次写 checkpoint 时才创建，构造实例不触碰文件系统
         self.checkpoint_dir = Path(os.getenv("NOTE_OUTPUT_DIR", "note_results"))
-        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
 
     def _format_time(self, seconds: float) -> str:
         return str(timedelta(seconds=int(seconds)))[2:]
 
+    def _format_segment_line(self, seg: TranscriptSegment) -> str:
+        return f"{self._format_time(seg.start)} - {seg.text.strip()}"
+
     def _build_segment_text(self, segments: List[TranscriptSegment]) -> str:
-        return "\n".join(
-            f"{self._format_time(seg.start)} - {seg.text.strip()}"
-            for seg in segments
-        )
+        return "\n".join(self._format_segment_line(seg) for seg in segments)
 
     def ensure_segments_type(self, segments) -> List[TranscriptSegment]:
         return [TranscriptSegment(**seg) if isinstance(seg, dict) else seg for seg in segments]
 
     def create_messages(self, segments: List[TranscriptSegment], **kwargs):
-
-        content_text = generate_base_prompt(
+        prompt_kwargs = dict(
             title=kwargs.get('title'),
             segment_text=self._build_segment_text(segments),
             tags=kwargs.get('tags'),
@@ -50,6 +101,12 @@ class UniversalGPT(GPT):
             extras=kwargs.get('extras'),
         )
 
+        system_text = None
+        if self.prompt_layout == "prefix_cache":
+            system_text, content_text = generate_prompt_parts(**prompt_kwargs)
+        else:
+            content_text = generate_base_prompt(**prompt_kwargs)
+
         # ⛳ 组装 content 数组，支持 text + image_url 混合
         content: List[dict] = [{"type": "text", "text": content_text}]
         video_img_urls = kwargs.get('video_img_urls', [])
@@ -68,6 +125,8 @@ class UniversalGPT(GPT):
             "role": "user",
             "content": content
         }]
+        if system_text is not None:
+            messages.insert(0, {"role": "system", "content": system_text})
 
         return messages
 
@@ -75,10 +134,43 @@ class UniversalGPT(GPT):
         return self.client.models.list()
 
     def _estimate_messages_bytes(self, messages: list) -> int:
-        import json
-        return len(json.dumps(messages, ensure_ascii=False).encode("utf-8"))
+        images: List[ImageRef] = []
+
+        def _collect_image(obj):
+            # 图片引用按编码后的 data URL 长度计入，估算时不读取也不编码图片
+            if isinstance(obj, ImageRef):
+                images.append(obj)
+                return ""
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+        size = len(json.dumps(messages, ensure_ascii=False, default=_collect_image).encode("utf-8"))
+        return size + sum(image.data_url_size for image in images)
+
+    @staticmethod
+    def _materialize_images(messages: list) -> list:
+        """把消息中的 ImageRef 编码为 data URL，只在调用 SDK 前执行，其余环节都只传引用"""
+        materialized = []
+        for message in messages:
+            content = message.get("content")
+            if not isinstance(content, list) or not any(
+                    isinstance(part.get("image_url", {}).get("url"), ImageRef) for part in content):
+                materialized.append(message)
+                continue
+            parts = []
+            for part in content:
+                url = part.get("image_url", {}).get("url")
+                if isinstance(url, ImageRef):
+                    part = {**part, "image_url": {**part["image_url"], "url": url.to_data_url()}}
+                parts.append(part)
+            materialized.append({**message, "content": parts})
+        return materialized
 
     def _build_merge_messages(self, partials: list) -> list:
+        if self.prompt_layout == "prefix_cache":
+            return [
+                {"role": "system", "content": MERGE_PROMPT},
+                {"role": "user", "content": [{"type": "text", "text": "\n\n---\n\n".join(partials)}]},
+            ]
         merge_text = MERGE_PROMPT + "\n\n" + "\n\n---\n\n".join(partials)
         return [{
             "role": "user",
@@ -90,27 +182,45 @@ class UniversalGPT(GPT):
         return self.checkpoint_dir / f"{safe_key}.gpt.checkpoint.json"
 
     def _build_source_signature(self, source: GPTSource) -> str:
-        payload = {
+        """
+        增量计算签名：逐段喂给 sha256，不再把全部分段和 base64 图片拼成一个大 JSON 字符串。
+        图片使用 ImageRef 生成时算好的摘要，不读取图片内容
+        """
+        sha = hashlib.sha256()
+        header = {
             "model": self.model,
             "temperature": self.temperature,
             "max_request_bytes": self.max_request_bytes,
+            # 分片边界取决于 token 预算，预算变化后旧的 partials 不能再按新分片复用
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "image_token_cost": self.image_token_cost,
+            "prompt_layout": self.prompt_layout,
             "title": source.title,
             "tags": source.tags,
             "format": source._format,
             "style": source.style,
             "extras": source.extras,
-            "video_img_urls": source.video_img_urls or [],
-            "segments": [
-                {
-                    "start": getattr(seg, "start", None),
-                    "end": getattr(seg, "end", None),
-                    "text": getattr(seg, "text", "")
-                }
-                for seg in source.segment
-            ],
         }
-        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
-        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        sha.update(json.dumps(header, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+
+        image_urls = source.video_img_urls or []
+        sha.update(f"\nimages:{len(image_urls)}\n".encode("utf-8"))
+        for image in image_urls:
+            # ImageRef 自带生成时算好的摘要，普通 URL 才需要逐个哈希
+            digest = getattr(image, "digest", None) or hashlib.sha256(str(image).encode("utf-8")).hexdigest()
+            sha.update(f"{digest}\n".encode("utf-8"))
+
+        sha.update(b"segments\n")
+        for seg in source.segment:
+            line = json.dumps(
+                [getattr(seg, "start", None), getattr(seg, "end", None), getattr(seg, "text", "")],
+                ensure_ascii=False,
+            )
+            sha.update(line.encode("utf-8") + b"\n")
+        return sha.hexdigest()
+
+    def _merge_journal_path(self, checkpoint_key: str) -> Path:
+        return self._checkpoint_path(checkpoint_key).with_suffix(".merge.jsonl")
 
     def _load_checkpoint(self, checkpoint_key: str, source_signature: str) -> dict | None:
         path = self._checkpoint_path(checkpoint_key)
@@ -119,14 +229,15 @@ class UniversalGPT(GPT):
         try:
             data = json.loads(path.read_text(encoding="utf-8"))
             if data.get("source_signature") != source_signature:
-                path.unlink(missing_ok=True)
+                self._clear_checkpoint(checkpoint_key)
                 return None
             return data
         except Exception:
-            path.unlink(missing_ok=True)
+            self._clear_checkpoint(checkpoint_key)
             return None
 
-    def _save_checkpoint(self, checkpoint_key: str, source_signature: str, partials: list, phase: str) -> None:
+    def _save_checkpoint(self, checkpoint_key: str, source_signature: str, partials: list, phase: str,
+                         pending: dict | None = None, streaming: dict | None = None) -> None:
         path = self._checkpoint_path(checkpoint_key)
         data = {
             "version": 1,
@@ -135,12 +246,42 @@ class UniversalGPT(GPT):
             "partials": partials,
             "updated_at": datetime.now(timezone.utc).isoformat(),
         }
+        # 并行 map 阶段中乱序完成的分片，key 为分片下标
+        if pending:
+            data["pending"] = {str(idx): text for idx, text in pending.items()}
+        # 流式输出中途保存的半成品文本，恢复时从这里继续生成
+        if streaming:
+            data["streaming"] = streaming
+        path.parent.mkdir(parents=True, exist_ok=True)
         tmp_path = path.with_suffix(".tmp")
-        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
         tmp_path.replace(path)
 
+    def _append_merge_journal(self, checkpoint_key: str, source_signature: str, level_key: str,
+                              group_idx: int, text: str) -> None:
+        # 合并结果逐条追加，不再每完成一组就重写整个 checkpoint
+        record = {"source_signature": source_signature, "level": level_key, "group": group_idx, "text": text}
+        with self._merge_journal_path(checkpoint_key).open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _load_merge_journal(self, checkpoint_key: str, source_signature: str, level_key: str) -> dict:
+        path = self._merge_journal_path(checkpoint_key)
+        if not path.exists():
+            return {}
+        done = {}
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 进程中断时最后一行可能只写了一半
+                continue
+            if record.get("source_signature") == source_signature and record.get("level") == level_key:
+                done[int(record["group"])] = record["text"]
+        return done
+
     def _clear_checkpoint(self, checkpoint_key: str) -> None:
         self._checkpoint_path(checkpoint_key).unlink(missing_ok=True)
+        self._merge_journal_path(checkpoint_key).unlink(missing_ok=True)
 
     @staticmethod
     def _is_insufficient_quota_error(exc: Exception) -> bool:
@@ -153,6 +294,11 @@ class UniversalGPT(GPT):
 
     @staticmethod
     def _is_retryable_error(exc: Exception) -> bool:
+        # 优先按 HTTP 状态码判断，拿不到状态码（连接错误、部分兼容网关）时再匹配异常文本
+        status = get_status_code(exc)
+        if status is not None:
+            return status in {408, 409, 429, 500, 502, 503, 504, 524}
+
         raw = str(exc).lower()
         retryable_tokens = (
             "error code: 524",
@@ -169,27 +315,64 @@ class UniversalGPT(GPT):
             "connection error",
             "service unavailable",
         )
-        if any(token in raw for token in retryable_tokens):
-            return True
-
-        status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
-        return status in {408, 409, 429, 500, 502, 503, 504, 524}
+        return any(token in raw for token in retryable_tokens)
+
+    def _estimate_request_tokens(self, messages: list) -> int:
+        total = 0
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                total += estimate_tokens(content)
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    total += estimate_tokens(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    total += self.image_token_cost
+        return total
+
+    def _reserve_request(self, messages: list) -> float:
+        """向供应商限流器申请额度，返回需要等待的秒数；熔断中抛出 CircuitOpenError"""
+        return self.rate_limiter.reserve(self._estimate_request_tokens(messages))
+
+    def _record_request_error(self, exc: Exception) -> bool:
+        """记录失败并返回是否可重试；不可重试的错误说明供应商本身可用，不计入熔断"""
+        if not self._is_retryable_error(exc):
+            self.rate_limiter.record_success()
+            return False
+        retry_after = get_retry_after(exc)
+        if retry_after is not None:
+            retry_after = min(retry_after, float(os.getenv("OPENAI_RETRY_AFTER_MAX_SECONDS", "60")))
+        self.rate_limiter.record_failure(retry_after)
+        return True
 
     def _chat_completion_create(self, messages: list):
+        messages = self._materialize_images(messages)
         max_attempts = max(1, int(os.getenv("OPENAI_RETRY_ATTEMPTS", "3")))
         base_backoff = float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "1.5"))
 
         last_exc = None
         for attempt in range(max_attempts):
             try:
-                return self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=self.temperature
-                )
+                # Retry-After 冷却和 RPM/TPM 配额都体现在等待时间里，跨任务共享
+                wait_seconds = self._reserve_request(messages)
+                if wait_seconds > 0:
+                    time.sleep(wait_seconds)
+                with _get_provider_semaphore(self.provider_key):
+                    started_at = time.monotonic()
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature
+                    )
+                    self.latency.record(time.monotonic() - started_at)
+                self.rate_limiter.record_success()
+                return response
+            except CircuitOpenError:
+                raise
             except Exception as exc:
                 last_exc = exc
-                if attempt == max_attempts - 1 or not self._is_retryable_error(exc):
+                if not self._record_request_error(exc) or attempt == max_attempts - 1:
                     raise
                 sleep_seconds = base_backoff * (2 ** attempt)
                 time.sleep(sleep_seconds)
@@ -198,41 +381,414 @@ class UniversalGPT(GPT):
             raise last_exc
         raise RuntimeError("chat completion failed without exception")
 
-    def _merge_partials(self, partials: list, checkpoint_key: str | None, source_signature: str | None) -> str:
+    async def _achat_completion_create(self, messages: list):
+        messages = await asyncio.to_thread(self._materialize_images, messages)
+        max_attempts = max(1, int(os.getenv("OPENAI_RETRY_ATTEMPTS", "3")))
+        base_backoff = float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "1.5"))
+
+        for attempt in range(max_attempts):
+            try:
+                wait_seconds = self._reserve_request(messages)
+                if wait_seconds > 0:
+                    await asyncio.sleep(wait_seconds)
+                async with _get_provider_async_semaphore(self.provider_key):
+                    started_at = time.monotonic()
+                    response = await self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        temperature=self.temperature
+                    )
+                    self.latency.record(time.monotonic() - started_at)
+                self.rate_limiter.record_success()
+                return response
+            except CircuitOpenError:
+                raise
+            except asyncio.CancelledError:
+                # 对冲或批量失败时请求会被取消，若它正是半开状态的探测请求需要释放
+                self.rate_limiter.release_probe()
+                raise
+            except Exception as exc:
+                if not self._record_request_error(exc) or attempt == max_attempts - 1:
+                    raise
+                await asyncio.sleep(base_backoff * (2 ** attempt))
+
+        raise RuntimeError("chat completion failed without exception")
+
+    def _response_cache_key(self, messages: list) -> str | None:
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(self.model, self.temperature, messages)
+
+    def _store_response(self, cache_key: str | None, text: str) -> None:
+        if cache_key and text:
+            self.response_cache.set(cache_key, text)
+
+    async def _arequest_text(self, messages: list) -> str:
+        response = await self._achat_completion_create(messages)
+        return response.choices[0].message.content.strip()
+
+    def _hedge_delay(self) -> float:
+        """主供应商样本足够时取其延迟分位数，否则使用固定的兜底阈值"""
+        min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        if self.latency.total >= min_samples:
+            return self.latency.quantile(float(os.getenv("LLM_HEDGE_QUANTILE", "0.9")))
+        return float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "30"))
+
+    async def _ahedged_request_text(self, messages: list) -> str:
+        """
+        对冲请求：主请求超过阈值仍未返回时向备用供应商补发一份，先成功的结果胜出，另一个被取消。
+        只在异步客户端下启用，同步线程中的请求无法中途取消
+        """
+        primary = asyncio.ensure_future(self._arequest_text(messages))
+        done, _ = await asyncio.wait({primary}, timeout=self._hedge_delay())
+        if done:
+            return primary.result()
+
+        logger.info(f"请求超过对冲阈值，补发到备用模型 {self.hedge.model}")
+        secondary = asyncio.ensure_future(self.hedge._arequest_text(messages))
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            logger.info(f"备用模型 {self.hedge.model} 先返回结果")
+                        return task.result()
+                # 先结束的一方失败时继续等另一方；两边都失败则抛出主请求的异常
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _acomplete_text(self, messages: list) -> str:
+        cache_key = self._response_cache_key(messages)
+        if cache_key:
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        if self.hedge is not None and self.hedge.async_client is not None:
+            text = await self._ahedged_request_text(messages)
+        else:
+            text = await self._arequest_text(messages)
+        await asyncio.to_thread(self._store_response, cache_key, text)
+        return text
+
+    def _complete_text(self, messages: list) -> str:
+        if self.async_client is not None:
+            return run_coroutine(self._acomplete_text(messages))
+
+        cache_key = self._response_cache_key(messages)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        response = self._chat_completion_create(messages)
+        text = response.choices[0].message.content.strip()
+        self._store_response(cache_key, text)
+        return text
+
+    @staticmethod
+    def _stream_delta(chunk) -> str:
+        if not getattr(chunk, "choices", None):
+            return ""
+        return chunk.choices[0].delta.content or ""
+
+    @staticmethod
+    def _build_continue_messages(messages: list, text: str) -> list:
+        return messages + [
+            {"role": "assistant", "content": text},
+            {"role": "user", "content": CONTINUE_PROMPT},
+        ]
+
+    def _stream_text(self, messages: list, on_text, prefix: str = "") -> str:
+        messages = self._materialize_images(messages)
+        max_attempts = max(1, int(os.getenv("OPENAI_RETRY_ATTEMPTS", "3")))
+        base_backoff = float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "1.5"))
+
+        text = prefix
+        for attempt in range(max_attempts):
+            # 已有部分输出时让模型接着写，而不是从头重新生成
+            request_messages = self._build_continue_messages(messages, text) if text else messages
+            try:
+                wait_seconds = self._reserve_request(request_messages)
+                if wait_seconds > 0:
+                    time.sleep(wait_seconds)
+                with _get_provider_semaphore(self.provider_key):
+                    stream = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=request_messages,
+                        temperature=self.temperature,
+                        stream=True
+                    )
+                    for chunk in stream:
+                        delta = self._stream_delta(chunk)
+                        if delta:
+                            text += delta
+                            on_text(text)
+                self.rate_limiter.record_success()
+                return text.strip()
+            except CircuitOpenError:
+                raise
+            except Exception as exc:
+                if not self._record_request_error(exc) or attempt == max_attempts - 1:
+                    raise
+                time.sleep(base_backoff * (2 ** attempt))
+
+        raise RuntimeError("chat completion stream failed without exception")
+
+    async def _astream_text(self, messages: list, on_text, prefix: str = "") -> str:
+        messages = await asyncio.to_thread(self._materialize_images, messages)
+        max_attempts = max(1, int(os.getenv("OPENAI_RETRY_ATTEMPTS", "3")))
+        base_backoff = float(os.getenv("OPENAI_RETRY_BACKOFF_SECONDS", "1.5"))
+
+        text = prefix
+        for attempt in range(max_attempts):
+            request_messages = self._build_continue_messages(messages, text) if text else messages
+            try:
+                wait_seconds = self._reserve_request(request_messages)
+                if wait_seconds > 0:
+                    await asyncio.sleep(wait_seconds)
+                async with _get_provider_async_semaphore(self.provider_key):
+                    stream = await self.async_client.chat.completions.create(
+                        model=self.model,
+                        messages=request_messages,
+                        temperature=self.temperature,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        delta = self._stream_delta(chunk)
+                        if delta:
+                            text += delta
+                            on_text(text)
+                self.rate_limiter.record_success()
+                return text.strip()
+            except CircuitOpenError:
+                raise
+            except asyncio.CancelledError:
+                # 对冲或批量失败时请求会被取消，若它正是半开状态的探测请求需要释放
+                self.rate_limiter.release_probe()
+                raise
+            except Exception as exc:
+                if not self._record_request_error(exc) or attempt == max_attempts - 1:
+                    raise
+                await asyncio.sleep(base_backoff * (2 ** attempt))
+
+        raise RuntimeError("chat completion stream failed without exception")
+
+    def _run_async_stream(self, messages: list, on_text, prefix: str) -> str:
+        """
+        在共享事件循环上跑流式请求，但事件循环里只记录最新文本；
+        on_text（写 partial 文件、checkpoint）在调用方线程执行，避免阻塞其他任务的 LLM 请求
+        """
+        latest = {"text": None}
+        updated = threading.Event()
+
+        def push(text: str) -> None:
+            latest["text"] = text
+            updated.set()
+
+        future = submit_coroutine(self._astream_text(messages, push, prefix))
+        future.add_done_callback(lambda _: updated.set())
+        flushed = None
+        while True:
+            updated.wait()
+            updated.clear()
+            text = latest["text"]
+            if text is not None and text != flushed:
+                on_text(text)
+                flushed = text
+            if future.done():
+                return future.result()
+
+    def _stream_with_checkpoint(self, messages: list, stream_key: str, on_progress, resume_stream: dict | None,
+                                checkpoint_key: str | None, source_signature: str | None,
+                                partials: list, phase: str) -> str:
+        """
+        流式生成最终笔记：增量文本通过 on_progress 推送，并定期写入 checkpoint，
+        连接中断后可以从已生成的部分继续。
+        """
+        cache_key = self._response_cache_key(messages)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                on_progress(cached)
+                return cached
+
+        prefix = ""
+        if resume_stream and resume_stream.get("key") == stream_key:
+            prefix = resume_stream.get("text") or ""
+
+        interval = float(os.getenv("OPENAI_STREAM_CHECKPOINT_SECONDS", "5"))
+        state = {"text": prefix, "saved_at": time.monotonic()}
+
+        def save_stream() -> None:
+            if checkpoint_key and source_signature and state["text"]:
+                self._save_checkpoint(checkpoint_key, source_signature, partials, phase,
+                                      streaming={"key": stream_key, "text": state["text"]})
+            state["saved_at"] = time.monotonic()
+
+        def on_text(text: str) -> None:
+            state["text"] = text
+            on_progress(text)
+            if time.monotonic() - state["saved_at"] >= interval:
+                save_stream()
+
+        try:
+            if self.async_client is not None:
+                text = self._run_async_stream(messages, on_text, prefix)
+            else:
+                text = self._stream_text(messages, on_text, prefix)
+        except Exception:
+            save_stream()
+            raise
+
+        self._store_response(cache_key, text)
+        return text
+
+    def _plan_merge_groups(self, partials: list, merge_chunker: RequestChunker, build_messages) -> List[list]:
+        fan_in = max(2, int(os.getenv("OPENAI_MERGE_FAN_IN", "4")))
+        groups = []
+        for group in merge_chunker.group_texts_by_budget(partials, build_messages):
+            groups.extend(group[start:start + fan_in] for start in range(0, len(group), fan_in))
+        return groups
+
+    def _merge_partials(self, partials: list, checkpoint_key: str | None, source_signature: str | None,
+                        on_progress=None, resume_stream: dict | None = None) -> str:
+        """
+        树形归并：每一层把中间结果按 fan-in 分组，组与组之间并发合并，
+        n 个分片只需 O(log n) 轮请求。每层开始时记录该层输入，组结果追加写入 merge 日志。
+        """
         def build_messages(texts, *_args, **_kwargs):
             return self._build_merge_messages(texts)
 
         merge_chunker = RequestChunker(
             lambda *_args, **_kwargs: [],
             self.max_request_bytes,
-            self._estimate_messages_bytes
+            self._estimate_messages_bytes,
+            token_budget=self.max_prompt_tokens,
+            token_estimator=estimate_tokens,
         )
+        checkpointing = bool(checkpoint_key and source_signature)
 
         current_partials = list(partials)
         while len(current_partials) > 1:
-            groups = merge_chunker.group_texts_by_budget(current_partials, build_messages)
-            new_partials = []
-            for group_idx, group in enumerate(groups):
-                messages = build_messages(group)
+            groups = self._plan_merge_groups(current_partials, merge_chunker, build_messages)
+            level_key = hashlib.sha256("\n\0".join(current_partials).encode("utf-8")).hexdigest()[:16]
+            done = {}
+            if checkpointing:
+                self._save_checkpoint(checkpoint_key, source_signature, current_partials, "merge")
+                done = self._load_merge_journal(checkpoint_key, source_signature, level_key)
+            if any(len(group) > 1 for group in groups):
+                # 单独成组的结果直接进入下一层，不必再请求一次；全是单组时仍需请求以压缩长度
+                done.update({idx: group[0] for idx, group in enumerate(groups) if len(group) == 1})
+
+            def on_result(group_idx: int, text: str) -> None:
+                done[group_idx] = text
+                if checkpointing:
+                    self._append_merge_journal(checkpoint_key, source_signature, level_key, group_idx, text)
+
+            if on_progress is not None and len(groups) == 1 and 0 not in done:
+                # 最后一轮合并的输出就是最终笔记，开启流式推送
+                group_digest = hashlib.sha256("\n".join(groups[0]).encode("utf-8")).hexdigest()[:16]
+                on_result(0, self._stream_with_checkpoint(
+                    build_messages(groups[0]), f"merge:{group_digest}", on_progress, resume_stream,
+                    checkpoint_key, source_signature, current_partials, "merge"
+                ))
+            else:
+                self._complete_many(
+                    {idx: build_messages(group) for idx, group in enumerate(groups) if idx not in done},
+                    on_result,
+                )
+
+            current_partials = [done[idx] for idx in range(len(groups))]
+
+        return current_partials[0]
+
+    def _complete_many(self, requests: dict, on_result) -> None:
+        """
+        以 map_concurrency 为上限并发执行多个请求，每完成一个调用 on_result(idx, text)；
+        任一请求失败时取消尚未开始的请求并抛出第一个异常
+        """
+        if not requests:
+            return
+
+        if self.async_client is not None:
+            run_coroutine(self._acomplete_many(requests, on_result))
+            return
+
+        first_exc = None
+        with ThreadPoolExecutor(max_workers=min(self.map_concurrency, len(requests))) as executor:
+            futures = {executor.submit(self._complete_text, messages): idx for idx, messages in requests.items()}
+            for future in as_completed(futures):
                 try:
-                    response = self._chat_completion_create(messages)
+                    text = future.result()
                 except Exception as exc:
-                    if checkpoint_key and source_signature:
-                        self._save_checkpoint(checkpoint_key, source_signature, current_partials, "merge")
-                    raise
+                    if first_exc is None:
+                        first_exc = exc
+                        for pending_future in futures:
+                            pending_future.cancel()
+                    continue
+                on_result(futures[future], text)
 
-                new_partials.append(response.choices[0].message.content.strip())
+        if first_exc is not None:
+            raise first_exc
 
-                if checkpoint_key and source_signature:
-                    remaining_partials = []
-                    for remaining_group in groups[group_idx + 1:]:
-                        remaining_partials.extend(remaining_group)
-                    resumable_partials = new_partials + remaining_partials
-                    self._save_checkpoint(checkpoint_key, source_signature, resumable_partials, "merge")
+    async def _acomplete_many(self, requests: dict, on_result) -> None:
+        limiter = asyncio.Semaphore(self.map_concurrency)
 
-            current_partials = new_partials
+        async def run(idx, messages):
+            async with limiter:
+                return idx, await self._acomplete_text(messages)
 
-        return current_partials[0]
+        tasks = [asyncio.ensure_future(run(idx, messages)) for idx, messages in requests.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                idx, text = await next_done
+                await asyncio.to_thread(on_result, idx, text)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def _build_chunk_messages(self, chunk, source: GPTSource) -> list:
+        return self.create_messages(
+            chunk.segments,
+            title=source.title,
+            tags=source.tags,
+            video_img_urls=chunk.image_urls,
+            _format=source._format,
+            style=source.style,
+            extras=source.extras
+        )
+
+    def _save_map_checkpoint(self, checkpoint_key: str | None, source_signature: str | None, done: dict) -> None:
+        if not (checkpoint_key and source_signature):
+            return
+        # partials 只保存从 0 开始连续完成的前缀，保持与旧版 checkpoint 兼容
+        prefix = []
+        while len(prefix) in done:
+            prefix.append(done[len(prefix)])
+        pending = {idx: text for idx, text in done.items() if idx >= len(prefix)}
+        self._save_checkpoint(checkpoint_key, source_signature, prefix, "summarize", pending=pending)
+
+    def _map_chunks(self, chunks: list, done: dict, source: GPTSource,
+                    checkpoint_key: str | None, source_signature: str | None) -> None:
+        todo = [idx for idx in range(len(chunks)) if idx not in done]
+        if not todo:
+            return
+
+        def on_result(idx: int, text: str) -> None:
+            done[idx] = text
+            self._save_map_checkpoint(checkpoint_key, source_signature, done)
+
+        try:
+            self._complete_many({idx: self._build_chunk_messages(chunks[idx], source) for idx in todo}, on_result)
+        except Exception:
+            self._save_map_checkpoint(checkpoint_key, source_signature, done)
+            raise
 
     def summarize(self, source: GPTSource) -> str:
         self.screenshot = source.screenshot
@@ -244,7 +800,15 @@ class UniversalGPT(GPT):
         def message_builder(segments, image_urls, **kwargs):
             return self.create_messages(segments, video_img_urls=image_urls, **kwargs)
 
-        chunker = RequestChunker(message_builder, self.max_request_bytes, self._estimate_messages_bytes)
+        chunker = RequestChunker(
+            message_builder,
+            self.max_request_bytes,
+            self._estimate_messages_bytes,
+            token_budget=self.max_prompt_tokens,
+            token_estimator=estimate_tokens,
+            image_token_cost=self.image_token_cost,
+            segment_formatter=self._format_segment_line,
+        )
 
         try:
             chunks = chunker.chunk(
@@ -267,41 +831,42 @@ class UniversalGPT(GPT):
                 extras=source.extras
             )
 
-        partials = []
+        checkpoint = None
         if checkpoint_key and source_signature:
             checkpoint = self._load_checkpoint(checkpoint_key, source_signature)
-            if checkpoint and isinstance(checkpoint.get("partials"), list):
-                partials = checkpoint["partials"]
-
-        if len(partials) > len(chunks):
-            partials = []
+        resume_stream = (checkpoint or {}).get("streaming")
 
-        for chunk in chunks[len(partials):]:
-            messages = self.create_messages(
-                chunk.segments,
-                title=source.title,
-                tags=source.tags,
-                video_img_urls=chunk.image_urls,
-                _format=source._format,
-                style=source.style,
-                extras=source.extras
+        if checkpoint and checkpoint.get("phase") == "merge" and isinstance(checkpoint.get("partials"), list):
+            # 合并阶段中断过：所有分片早已完成，直接从保存的中间结果继续合并
+            merged = self._merge_partials(checkpoint["partials"], checkpoint_key, source_signature,
+                                          source.on_progress, resume_stream)
+            self._clear_checkpoint(checkpoint_key)
+            return merged
+
+        done: dict = {}
+        if checkpoint and isinstance(checkpoint.get("partials"), list):
+            done = dict(enumerate(checkpoint["partials"]))
+            for idx, text in (checkpoint.get("pending") or {}).items():
+                done[int(idx)] = text
+
+        if any(idx >= len(chunks) for idx in done):
+            done = {}
+
+        if source.on_progress and len(chunks) == 1 and 0 not in done:
+            # 只有一个分片时，它的输出就是最终笔记，直接流式生成
+            done[0] = self._stream_with_checkpoint(
+                self._build_chunk_messages(chunks[0], source), "map:0", source.on_progress, resume_stream,
+                checkpoint_key, source_signature, [], "summarize"
             )
-            try:
-                response = self._chat_completion_create(messages)
-            except Exception as exc:
-                if checkpoint_key and source_signature:
-                    self._save_checkpoint(checkpoint_key, source_signature, partials, "summarize")
-                raise
 
-            partials.append(response.choices[0].message.content.strip())
-            if checkpoint_key and source_signature:
-                self._save_checkpoint(checkpoint_key, source_signature, partials, "summarize")
+        self._map_chunks(chunks, done, source, checkpoint_key, source_signature)
+        partials = [done[idx] for idx in range(len(chunks))]
 
         if len(partials) == 1:
             if checkpoint_key:
                 self._clear_checkpoint(checkpoint_key)
             return partials[0]
-        merged = self._merge_partials(partials, checkpoint_key, source_signature)
+        merged = self._merge_partials(partials, checkpoint_key, source_signature, source.on_progress, resume_stream)
         if checkpoint_key:
             self._clear_checkpoint(checkpoint_key)
         return merged
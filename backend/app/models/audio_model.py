@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional
 
 
 @dataclass
@@ -13,3 +13,16 @@ class AudioDownloadResult:
     raw_info: dict               # yt-dlp 的原始 info 字典
     video_path: Optional[str] = None  #  新增字段：可选视频文件路径
 
+
+@dataclass
+class PlaylistEntry:
+    url: str                          # 子视频链接（分P 为带 ?p= 的链接）
+    title: str                        # 子视频标题
+    index: int                        # 在合集中的序号，从 1 开始
+    duration: Optional[float] = None  # 时长（秒），平铺解析时可能缺失
+
+
+@dataclass
+class PlaylistInfo:
+    title: str                        # 合集 / 播放列表标题
+    entries: List[PlaylistEntry]      # 按原顺序排列的子视频
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Union, Optional
+from typing import Callable, List, Union, Optional
 
 from app.models.transcriber_model import TranscriptSegment
 
@@ -14,6 +14,7 @@ class GPTSource:
     style: Optional[str] = None
     extras: Optional[str] = None
     _format: Optional[list] = None
-    video_img_urls:  Optional[list] = None
+    video_img_urls:  Optional[list] = None  # ImageRef 或图片 URL，ImageRef 在发送请求前才编码为 base64
     checkpoint_key: Optional[str] = None
+    on_progress: Optional[Callable[[str], None]] = None  # 流式输出回调，参数为当前已生成的完整文本
 
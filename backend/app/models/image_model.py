@@ -0,0 +1,38 @@
+import base64
+import hashlib
+import math
+from dataclasses import dataclass
+
+# 每次读取的字节数，需为 3 的倍数，保证分块编码的 base64 拼接后与整体编码一致
+_ENCODE_CHUNK_BYTES = 3 * 64 * 1024
+
+
+@dataclass(frozen=True)
+class ImageRef:
+    path: str                    # 本地图片路径
+    size: int                    # 文件字节数
+    digest: str                  # 文件内容 sha256
+    mime: str = "image/jpeg"     # 图片 MIME 类型
+
+    @classmethod
+    def from_file(cls, path: str, mime: str = "image/jpeg") -> "ImageRef":
+        sha = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_ENCODE_CHUNK_BYTES), b""):
+                sha.update(chunk)
+                size += len(chunk)
+        return cls(path=str(path), size=size, digest=sha.hexdigest(), mime=mime)
+
+    @property
+    def data_url_size(self) -> int:
+        """生成的 data URL 字节数，无需读取文件即可用于请求体大小估算"""
+        return len(f"data:{self.mime};base64,") + 4 * math.ceil(self.size / 3)
+
+    def to_data_url(self) -> str:
+        """读取文件并分块编码为 data URL，只在真正发送请求前调用"""
+        parts = [f"data:{self.mime};base64,"]
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(_ENCODE_CHUNK_BYTES), b""):
+                parts.append(base64.b64encode(chunk).decode("ascii"))
+        return "".join(parts)
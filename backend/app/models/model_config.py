@@ -13,4 +13,7 @@ class ModelConfig:
     api_key: str                # 调用该模型使用的 API Key
     base_url: str               # 模型 API 接口地址（OpenAI SDK兼容）
     model_name: str             # 实际请求用的模型名称，如 "gpt-4-turbo"
-    created_at: Optional[datetime] = None  # 可选：创建时间（从 SQLite 自动生成）
\ No newline at end of file
+    created_at: Optional[datetime] = None  # 可选：创建时间（从 SQLite 自动生成）
+    provider_id: Optional[str] = None  # 供应商 ID，用于复用客户端连接
+    rpm: Optional[int] = None   # 供应商每分钟请求数上限，为空表示不限制
+    tpm: Optional[int] = None   # 供应商每分钟 token 上限，为空表示不限制
\ No newline at end of file
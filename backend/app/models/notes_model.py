@@ -1,7 +1,9 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
 
 from app.models.audio_model import AudioDownloadResult
+from app.models.image_model import ImageRef
 from app.models.transcriber_model import TranscriptResult
 
 
@@ -9,4 +11,16 @@ from app.models.transcriber_model import TranscriptResult
 class NoteResult:
     markdown: str                  # GPT 总结的 Markdown 内容
     transcript: TranscriptResult                # Whisper 转写结果
-    audio_meta: AudioDownloadResult  # 音频下载的元信息（title、duration、封面等）
\ No newline at end of file
+    audio_meta: AudioDownloadResult  # 音频下载的元信息（title、duration、封面等）
+
+
+@dataclass
+class NoteRunContext:
+    """单次笔记生成任务在各步骤之间传递的状态，每个任务一份，不在 NoteGenerator 实例上共享"""
+    task_id: str
+    video_url: str = ""                                            # 视频链接
+    video_path: Optional[Path] = None                              # 本地视频路径（需要截图或视频理解时才有）
+    video_img_urls: List[ImageRef] = field(default_factory=list)   # 视频拼图引用
+    subtitles: Optional[TranscriptResult] = None                   # 预检阶段获取到的平台字幕
+    subtitles_checked: bool = False                                # 预检阶段是否已经查询过平台字幕
+    metadata: Optional[AudioDownloadResult] = None                 # 预检阶段获取的元信息（不含音频文件）
@@ -4,6 +4,7 @@ from typing import Optional
 from app.utils.response import ResponseWrapper as R
 
 from app.services.cookie_manager import CookieConfigManager
+from app.gpt.response_cache import get_response_cache
 from ffmpeg_helper import ensure_ffmpeg_or_raise
 
 router = APIRouter()
@@ -42,4 +43,12 @@ async def sys_health():
 
 @router.get("/sys_check")
 async def sys_check():
-    return R.success()
\ No newline at end of file
+    return R.success()
+
+
+@router.get("/llm_cache_stats")
+def llm_cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return R.success(data={"enabled": False})
+    return R.success(data={"enabled": True, **cache.stats()})
@@ -3,22 +3,35 @@ import json
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
 from pydantic import BaseModel, validator, field_validator
 from dataclasses import asdict
 
+from app.db.batch_item_dao import get_batch_report, insert_batch_items
 from app.db.video_task_dao import get_task_by_video
 from app.enmus.exception import NoteErrorEnum
 from app.enmus.note_enums import DownloadQuality
 from app.exceptions.note import NoteError
 from app.services.note import NoteGenerator, logger
-from app.services.task_serial_executor import task_serial_executor
+from app.services.note_batch import (
+    NOTE_BULK_MAX_ITEMS,
+    NOTE_BULK_WORKERS,
+    BatchChild,
+    BatchDispatcher,
+    BatchJob,
+    build_index_note,
+    dedupe_items,
+    expand_playlist,
+    run_children,
+)
+from app.services.constant import SUPPORT_PLATFORM_MAP
+from app.services.task_scheduler import LANE_BATCH, LANE_INTERACTIVE, task_scheduler
 from app.utils.response import ResponseWrapper as R
 from app.utils.url_parser import extract_video_id
-from app.validators.video_url_validator import is_supported_video_url
+from app.validators.video_url_validator import is_supported_playlist_url, is_supported_video_url
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import StreamingResponse
 import httpx
@@ -64,6 +77,29 @@ class VideoRequest(BaseModel):
         return v
 
 
+class PlaylistRequest(VideoRequest):
+    @field_validator("video_url")
+    def validate_supported_url(cls, v):
+        url = str(v)
+        if not is_supported_playlist_url(url):
+            raise NoteError(code=NoteErrorEnum.PLATFORM_NOT_SUPPORTED.code,
+                            message=NoteErrorEnum.PLATFORM_NOT_SUPPORTED.message)
+        return v
+
+
+class BatchNoteRequest(BaseModel):
+    items: List[VideoRequest]
+    priority: int = 0               # 越大越先执行
+
+    @field_validator("items")
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError("items 不能为空")
+        if len(v) > NOTE_BULK_MAX_ITEMS:
+            raise ValueError(f"单次最多提交 {NOTE_BULK_MAX_ITEMS} 个视频")
+        return v
+
+
 NOTE_OUTPUT_DIR = os.getenv("NOTE_OUTPUT_DIR", "note_results")
 UPLOAD_DIR = "uploads"
 
@@ -74,10 +110,32 @@ def save_note_to_file(task_id: str, note):
         json.dump(asdict(note), f, ensure_ascii=False, indent=2)
 
 
+def _client_user(request: Request) -> str:
+    """调度用的用户标识，由服务端按客户端 IP 区分；不接受请求体里的标识，避免客户端换 ID 绕过轮转"""
+    return request.client.host if request.client else "anonymous"
+
+
+def _probe_duration(video_url: str, platform: str) -> Optional[float]:
+    """
+    解析视频时长，用于判断能否走快速通道（由 task_scheduler.classify 限时调用）；
+    yt-dlp 的解析结果有共享缓存，任务开始后的预检会直接复用
+    """
+    downloader = SUPPORT_PLATFORM_MAP.get(platform)
+    if not downloader:
+        return None
+    try:
+        metadata = downloader.fetch_metadata(video_url)
+    except Exception as e:
+        logger.warning(f"解析视频时长失败，按普通任务调度：{e}")
+        return None
+    return metadata.duration if metadata else None
+
+
 def run_note_task(task_id: str, video_url: str, platform: str, quality: DownloadQuality,
                   link: bool = False, screenshot: bool = False, model_name: str = None, provider_id: str = None,
                   _format: list = None, style: str = None, extras: str = None, video_understanding: bool = False,
-                  video_interval=0, grid_size=[]
+                  video_interval=0, grid_size=[], lane: str = LANE_INTERACTIVE, user: str = None,
+                  priority: int = 0, duration: float = None
                   ):
 
     if not model_name or not provider_id:
@@ -101,15 +159,56 @@ def run_note_task(task_id: str, video_url: str, platform: str, quality: Download
             grid_size=grid_size,
         )
 
-    logger.info(f"任务进入串行队列，等待执行 (task_id={task_id})")
-    note = task_serial_executor.run(_execute_note_task)
+    if duration is None:
+        # 在后台任务里限时解析时长，超时按交互通道调度，不阻塞排队
+        lane, duration = task_scheduler.classify(lane, lambda: _probe_duration(video_url, platform))
+    else:
+        lane = task_scheduler.lane_for(lane, duration)
+    logger.info(f"任务进入调度队列，等待执行 (task_id={task_id}, lane={lane}, user={user})")
+    note = task_scheduler.run(_execute_note_task, lane=lane, user=user, priority=priority, duration=duration)
     logger.info(f"Note generated: {task_id}")
     if not note or not note.markdown:
         logger.warning(f"任务 {task_id} 执行失败，跳过保存")
-        return
+        return None
     save_note_to_file(task_id, note)
+    return note
+
+
+def run_playlist_task(batch_id: str, title: str, children: list, data: PlaylistRequest, user: str = None):
+    """
+    以有限并发执行合集的子任务，全部结束后生成汇总目录笔记，保存为 batch_id 的结果
+    """
+    generator = NoteGenerator()
+
+    def _run_child(child: BatchChild):
+        return run_note_task(child.task_id, child.entry.url, data.platform, data.quality, data.link,
+                             data.screenshot, data.model_name, data.provider_id, data.format, data.style,
+                             data.extras, data.video_understanding, data.video_interval, data.grid_size,
+                             lane=LANE_BATCH, user=user, duration=child.entry.duration)
+
+    def _on_progress(done: int, total: int):
+        generator._update_status(batch_id, TaskStatus.SUMMARIZING, f"已完成 {done}/{total}")
+
+    run_children(children, _run_child, on_progress=_on_progress)
+    save_note_to_file(batch_id, build_index_note(batch_id, title, data.platform, children))
+    generator._update_status(batch_id, TaskStatus.SUCCESS)
+    logger.info(f"合集笔记完成: {batch_id}")
+
+
+
+def _bulk_dedupe_key(item: VideoRequest) -> str:
+    """同一视频、同样的生成参数只生成一次"""
+    params = item.model_dump(exclude={"video_url", "task_id"})
+    params["video"] = extract_video_id(item.video_url, item.platform) or item.video_url
+    return json.dumps(params, sort_keys=True, default=str, ensure_ascii=False)
 
 
+def _mark_bulk_failed(job: BatchJob, exc: Exception):
+    NoteGenerator()._update_status(job.task_id, TaskStatus.FAILED, str(exc))
+
+
+bulk_dispatcher = BatchDispatcher(NOTE_BULK_WORKERS, on_error=_mark_bulk_failed)
+
 
 @router.post('/delete_task')
 def delete_task(data: RecordRequest):
@@ -134,7 +233,7 @@ async def upload(file: UploadFile = File(...)):
 
 
 @router.post("/generate_note")
-def generate_note(data: VideoRequest, background_tasks: BackgroundTasks):
+def generate_note(data: VideoRequest, background_tasks: BackgroundTasks, request: Request):
     try:
 
         video_id = extract_video_id(data.video_url, data.platform)
@@ -159,12 +258,89 @@ def generate_note(data: VideoRequest, background_tasks: BackgroundTasks):
 
         background_tasks.add_task(run_note_task, task_id, data.video_url, data.platform, data.quality, data.link,
                                   data.screenshot, data.model_name, data.provider_id, data.format, data.style,
-                                  data.extras, data.video_understanding, data.video_interval, data.grid_size)
+                                  data.extras, data.video_understanding, data.video_interval, data.grid_size,
+                                  lane=LANE_INTERACTIVE, user=_client_user(request))
         return R.success({"task_id": task_id})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate_playlist_notes")
+def generate_playlist_notes(data: PlaylistRequest, background_tasks: BackgroundTasks, request: Request):
+    """
+    展开分P视频、合集或播放列表，每个子视频生成一条笔记任务，最后生成链接各子笔记的汇总目录
+    """
+    try:
+        playlist = expand_playlist(data.video_url, data.platform)
+        batch_id = str(uuid.uuid4())
+        children = [BatchChild(task_id=str(uuid.uuid4()), entry=entry) for entry in playlist.entries]
+
+        generator = NoteGenerator()
+        generator._update_status(batch_id, TaskStatus.PENDING, f"已完成 0/{len(children)}")
+        for child in children:
+            generator._update_status(child.task_id, TaskStatus.PENDING)
+
+        background_tasks.add_task(run_playlist_task, batch_id, playlist.title, children, data,
+                                  _client_user(request))
+        return R.success({
+            "batch_id": batch_id,
+            "title": playlist.title,
+            "tasks": [{"task_id": child.task_id, "index": child.entry.index, "title": child.entry.title,
+                       "video_url": child.entry.url} for child in children],
+        })
+    except NoteError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/generate_notes_batch")
+def generate_notes_batch(data: BatchNoteRequest, request: Request):
+    """
+    批量提交笔记任务：重复条目合并为一个任务，按优先级和用户轮转调度，返回批次 ID 和各条目的任务 ID
+    """
+    try:
+        batch_id = str(uuid.uuid4())
+        user_id = _client_user(request)
+        unique_items, mapping = dedupe_items(data.items, _bulk_dedupe_key)
+        task_ids = [str(uuid.uuid4()) for _ in unique_items]
+
+        insert_batch_items(batch_id, user_id, data.priority, [
+            {"task_id": task_id, "video_url": item.video_url, "platform": item.platform}
+            for task_id, item in zip(task_ids, unique_items)
+        ])
+        generator = NoteGenerator()
+        for task_id in task_ids:
+            generator._update_status(task_id, TaskStatus.PENDING)
+
+        def _job(task_id: str, item: VideoRequest) -> BatchJob:
+            return BatchJob(batch_id=batch_id, task_id=task_id, run=lambda: run_note_task(
+                task_id, item.video_url, item.platform, item.quality, item.link, item.screenshot,
+                item.model_name, item.provider_id, item.format, item.style, item.extras,
+                item.video_understanding, item.video_interval, item.grid_size,
+                lane=LANE_BATCH, user=user_id, priority=data.priority))
+
+        bulk_dispatcher.submit([_job(task_id, item) for task_id, item in zip(task_ids, unique_items)],
+                               user=user_id, priority=data.priority)
+        logger.info(f"批量任务已提交 (batch_id={batch_id}, user={user_id})：{len(data.items)} 条，去重后 {len(unique_items)} 条")
+        return R.success({
+            "batch_id": batch_id,
+            "total": len(unique_items),
+            "tasks": [{"index": i, "video_url": item.video_url, "task_id": task_ids[mapping[i]]}
+                      for i, item in enumerate(data.items)],
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batch_status/{batch_id}")
+def get_batch_status(batch_id: str):
+    report = get_batch_report(batch_id)
+    if report is None:
+        return R.error("批次不存在", code=404)
+    return R.success(report)
+
+
 @router.get("/task_status/{task_id}")
 def get_task_status(task_id: str):
     status_path = os.path.join(NOTE_OUTPUT_DIR, f"{task_id}.status.json")
@@ -200,12 +376,17 @@ def get_task_status(task_id: str):
         if status == TaskStatus.FAILED.value:
             return R.error(message or "任务失败", code=500)
 
-        # 处理中状态
-        return R.success({
+        # 处理中状态，总结阶段附带已流式生成的部分笔记
+        data = {
             "status": status,
             "message": message,
             "task_id": task_id
-        })
+        }
+        partial_path = os.path.join(NOTE_OUTPUT_DIR, f"{task_id}.partial.md")
+        if os.path.exists(partial_path):
+            with open(partial_path, "r", encoding="utf-8") as pf:
+                data["partial_markdown"] = pf.read()
+        return R.success(data)
 
     # 没有状态文件，但有结果
     if os.path.exists(result_path):
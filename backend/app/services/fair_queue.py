@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional
+
+
+class FairQueue:
+    """
+    线程安全的阻塞队列：先取优先级最高的一档；同一优先级内按用户轮流取，
+    每个用户自己的任务先进先出，避免一个用户的大批量任务把其他用户饿死
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # priority -> {user: deque[item]}，OrderedDict 的顺序即轮转顺序
+        self._levels: Dict[int, "OrderedDict[Hashable, deque]"] = {}
+        self._size = 0
+
+    def put(self, item: Any, user: Hashable = None, priority: int = 0) -> None:
+        with self._cond:
+            users = self._levels.setdefault(priority, OrderedDict())
+            users.setdefault(user, deque()).append(item)
+            self._size += 1
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        取出下一个任务；队列为空时阻塞，超时抛 TimeoutError
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size > 0, timeout):
+                raise TimeoutError("队列为空")
+            return self._pop()
+
+    def get_nowait(self) -> Any:
+        with self._cond:
+            if not self._size:
+                raise IndexError("队列为空")
+            return self._pop()
+
+    def _pop(self) -> Any:
+        priority = max(self._levels)
+        users = self._levels[priority]
+        user, items = next(iter(users.items()))
+        item = items.popleft()
+        if items:
+            # 该用户还有任务，排到本优先级的队尾
+            users.move_to_end(user)
+        else:
+            del users[user]
+        if not users:
+            del self._levels[priority]
+        self._size -= 1
+        return item
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._size
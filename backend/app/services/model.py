@@ -21,6 +21,7 @@ class ModelService:
             provider=provider["name"],
             model_name='',
             name=provider["name"],
+            provider_id=provider["id"],
         )
 
     @staticmethod
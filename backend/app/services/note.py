@@ -1,7 +1,9 @@
 import json
 import logging
 import os
-from dataclasses import asdict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
 from pathlib import Path
 from typing import List, Optional, Tuple, Union, Any
 
@@ -14,6 +16,7 @@ from app.downloaders.bilibili_downloader import BilibiliDownloader
 from app.downloaders.douyin_downloader import DouyinDownloader
 from app.downloaders.local_downloader import LocalDownloader
 from app.downloaders.youtube_downloader import YoutubeDownloader
+from app.db.batch_item_dao import is_batch_task, update_batch_item_status
 from app.db.video_task_dao import delete_task_by_video, insert_video_task
 from app.enmus.exception import NoteErrorEnum, ProviderErrorEnum
 from app.enmus.task_status_enums import TaskStatus
@@ -22,19 +25,23 @@ from app.exceptions.note import NoteError
 from app.exceptions.provider import ProviderError
 from app.gpt.base import GPT
 from app.gpt.gpt_factory import GPTFactory
+from app.gpt.token_counter import estimate_tokens
 from app.models.audio_model import AudioDownloadResult
 from app.models.gpt_model import GPTSource
 from app.models.model_config import ModelConfig
-from app.models.notes_model import AudioDownloadResult, NoteResult
+from app.models.notes_model import AudioDownloadResult, NoteResult, NoteRunContext
 from app.models.transcriber_model import TranscriptResult, TranscriptSegment
 from app.services.constant import SUPPORT_PLATFORM_MAP
 from app.services.provider import ProviderService
 from app.transcriber.base import Transcriber
-from app.transcriber.transcriber_provider import get_transcriber, _transcribers
+from app.transcriber.transcriber_provider import get_transcriber, get_transcriber_lock, _transcribers
+from app.utils.path_helper import get_app_dir
 from app.utils.note_helper import replace_content_markers, prepend_source_link
 from app.utils.screenshot_marker import extract_screenshot_timestamps
+from app.utils.extractive_summarizer import extract_key_segments
 from app.utils.status_code import StatusCode
-from app.utils.video_helper import generate_screenshot
+from app.utils.transcript_compactor import compact_segments, is_platform_subtitle
+from app.utils.video_helper import extract_audio_from_video, generate_screenshot
 from app.utils.video_reader import VideoReader
 
 # ------------------ 环境变量与全局配置 ------------------
@@ -53,6 +60,17 @@ NOTE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 IMAGE_OUTPUT_DIR = os.getenv("OUT_DIR", "./static/screenshots")
 # 图片基础 URL（用于生成 Markdown 中的图片链接，需前端静态目录对应）
 IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL", "/static/screenshots")
+# 发给 LLM 前是否压缩平台字幕分段（合并短句、去掉滚动字幕重复）；语音识别结果不压缩
+TRANSCRIPT_COMPACT_ENABLED = os.getenv("TRANSCRIPT_COMPACT_ENABLED", "true").lower() == "true"
+# 超长转写先在本地做抽取式摘录，使 LLM 尽量一次请求完成；预算为 0 时取模型输入预算的 70%
+EXTRACTIVE_SUMMARY_ENABLED = os.getenv("EXTRACTIVE_SUMMARY_ENABLED", "false").lower() == "true"
+EXTRACTIVE_SUMMARY_TOKENS = int(os.getenv("EXTRACTIVE_SUMMARY_TOKENS", "0"))
+# 本地视频只下载了低分辨率版本（VIDEO_ANALYSIS_MAX_HEIGHT），默认最终截图从原画视频流按时间点远程截取，
+# 解析视频流失败时退回本地视频；设为 false 则始终用本地视频截图
+SCREENSHOT_HIGH_RES = os.getenv("SCREENSHOT_HIGH_RES", "true").lower() == "true"
+SCREENSHOT_MAX_HEIGHT = int(os.getenv("SCREENSHOT_MAX_HEIGHT", "0"))
+# 只需要截图（不做视频理解）时不下载视频，截图由 ffmpeg 对远程视频流做 Range 跳转截取
+SCREENSHOT_REMOTE_SEEK = os.getenv("SCREENSHOT_REMOTE_SEEK", "false").lower() == "true"
 
 # 日志配置
 logger = logging.getLogger(__name__)
@@ -70,8 +88,6 @@ class NoteGenerator:
         self.device: Optional[str] = None
         self.transcriber_type: str = os.getenv("TRANSCRIBER_TYPE", "fast-whisper")
         self.transcriber: Transcriber = self._init_transcriber()
-        self.video_path: Optional[Path] = None
-        self.video_img_urls=[]
         logger.info("NoteGenerator 初始化完成")
 
 
@@ -132,8 +148,15 @@ class NoteGenerator:
             transcript_cache_file = NOTE_OUTPUT_DIR / f"{task_id}_transcript.json"
             markdown_cache_file = NOTE_OUTPUT_DIR / f"{task_id}_markdown.md"
             print(audio_cache_file)
+            # 本次任务的中间状态（视频路径、拼图等）只放在 ctx 中，同一个 NoteGenerator 可被多个任务并发使用
+            ctx = NoteRunContext(task_id=task_id, video_url=str(video_url))
+
+            # 0. 预检：并行获取平台字幕和元信息，有字幕时后面可以跳过音频下载
+            self._preflight(ctx, downloader, video_url, audio_cache_file, transcript_cache_file)
+
             # 1. 下载音频/视频
             audio_meta = self._download_media(
+                ctx=ctx,
                 downloader=downloader,
                 video_url=video_url,
                 quality=quality,
@@ -150,6 +173,7 @@ class NoteGenerator:
             # 2. 获取字幕/转写文字
             # 优先尝试获取平台字幕，没有再 fallback 到音频转写
             transcript = self._get_transcript(
+                ctx=ctx,
                 downloader=downloader,
                 video_url=video_url,
                 audio_file=audio_meta.file_path,
@@ -160,6 +184,7 @@ class NoteGenerator:
 
             # 3. GPT 总结
             markdown = self._summarize_text(
+                ctx=ctx,
                 audio_meta=audio_meta,
                 transcript=transcript,
                 gpt=gpt,
@@ -169,14 +194,14 @@ class NoteGenerator:
                 formats=_format or [],
                 style=style,
                 extras=extras,
-                video_img_urls=self.video_img_urls,
             )
 
             # 4. 截图 & 链接替换
             if _format:
                 markdown = self._post_process_markdown(
+                    ctx=ctx,
+                    downloader=downloader,
                     markdown=markdown,
-                    video_path=self.video_path,
                     formats=_format,
                     audio_meta=audio_meta,
                     platform=platform,
@@ -230,19 +255,43 @@ class NoteGenerator:
         :param provider_id: 供应商 ID
         :return: GPT 实例
         """
+        config = self._build_model_config(model_name, provider_id)
+        logger.info(f"创建 GPT 实例 {provider_id}")
+        return GPTFactory().from_config(config, hedge=self._get_hedge_gpt(model_name, provider_id))
+
+    def _build_model_config(self, model_name: Optional[str], provider_id: Optional[str]) -> ModelConfig:
         provider = ProviderService.get_provider_by_id(provider_id)
         if not provider:
             logger.error(f"[get_gpt] 未找到模型供应商: provider_id={provider_id}")
             raise ProviderError(code=ProviderErrorEnum.NOT_FOUND,message=ProviderErrorEnum.NOT_FOUND.message)
-        logger.info(f"创建 GPT 实例 {provider_id}")
-        config = ModelConfig(
+        return ModelConfig(
             api_key=provider["api_key"],
             base_url=provider["base_url"],
             model_name=model_name,
             provider=provider["type"],
             name=provider["name"],
+            provider_id=provider_id,
+            # 数据库中为空表示不限制，这里显式传 0，让限流器按最新配置生效
+            rpm=provider.get("rpm") or 0,
+            tpm=provider.get("tpm") or 0,
         )
-        return GPTFactory().from_config(config)
+
+    def _get_hedge_gpt(self, model_name: Optional[str], provider_id: Optional[str]) -> Optional[GPT]:
+        """
+        配置了 LLM_HEDGE_PROVIDER_ID 时创建备用 GPT 实例，用于对冲长尾延迟；
+        LLM_HEDGE_MODEL_NAME 为空时沿用主模型名
+        """
+        hedge_provider_id = os.getenv("LLM_HEDGE_PROVIDER_ID")
+        if not hedge_provider_id:
+            return None
+        hedge_model_name = os.getenv("LLM_HEDGE_MODEL_NAME") or model_name
+        if hedge_provider_id == provider_id and hedge_model_name == model_name:
+            return None
+        try:
+            return GPTFactory().from_config(self._build_model_config(hedge_model_name, hedge_provider_id))
+        except ProviderError:
+            logger.warning(f"备用模型供应商不存在，跳过对冲请求: provider_id={hedge_provider_id}")
+            return None
 
     def _get_downloader(self, platform: str) -> Downloader:
         """
@@ -295,6 +344,9 @@ class NoteGenerator:
 
             # Atomic rename operation
             temp_file.replace(status_file)
+            # 批量任务同步条目状态，批次报告一次查询即可拿到全部进度
+            if is_batch_task(task_id):
+                update_batch_item_status(task_id, data["status"], message)
 
             print(f"状态文件写入成功: {status_file}")
         except Exception as e:
@@ -306,6 +358,36 @@ class NoteGenerator:
             except:
                 logger.error(f"写入错误  {e}")
 
+    @staticmethod
+    def _make_progress_writer(task_id: Optional[str]):
+        """
+        生成流式输出回调：把 GPT 已生成的 Markdown 节流写入 {task_id}.partial.md，
+        前端轮询任务状态时即可实时渲染
+
+        :param task_id: 任务唯一 ID
+        :return: 回调函数，参数为当前已生成的完整文本；task_id 为空时返回 None
+        """
+        if not task_id:
+            return None
+
+        partial_file = NOTE_OUTPUT_DIR / f"{task_id}.partial.md"
+        flush_interval = float(os.getenv("NOTE_STREAM_FLUSH_SECONDS", "1"))
+        state = {"flushed_at": 0.0}
+
+        def on_progress(text: str) -> None:
+            now = time.monotonic()
+            if now - state["flushed_at"] < flush_interval:
+                return
+            state["flushed_at"] = now
+            try:
+                temp_file = partial_file.with_suffix(".tmp")
+                temp_file.write_text(text, encoding="utf-8")
+                temp_file.replace(partial_file)
+            except Exception as e:
+                logger.warning(f"写入流式笔记失败 (task_id={task_id})：{e}")
+
+        return on_progress
+
     def _handle_exception(self, task_id, exc):
         logger.error(f"任务异常 (task_id={task_id})", exc_info=True)
         error_message = getattr(exc, 'detail', str(exc))
@@ -316,8 +398,60 @@ class NoteGenerator:
                 error_message = str(error_message)
         self._update_status(task_id, TaskStatus.FAILED, message=error_message)
 
+    def _preflight(
+        self,
+        ctx: NoteRunContext,
+        downloader: Downloader,
+        video_url: Union[str, HttpUrl],
+        audio_cache_file: Path,
+        transcript_cache_file: Path,
+    ) -> None:
+        """
+        并行查询平台字幕和视频元信息（都不下载媒体文件），结果写入 ctx。
+        有缓存的部分直接跳过；任一查询失败都只记录日志，后续步骤按原流程下载和转写。
+
+        :param ctx: 本次任务的运行上下文
+        :param downloader: Downloader 实例
+        :param video_url: 视频链接
+        :param audio_cache_file: 音频缓存路径，存在时无需获取元信息
+        :param transcript_cache_file: 转写缓存路径，存在时无需查询字幕
+        """
+        if transcript_cache_file.exists():
+            return
+
+        def fetch_subtitles():
+            try:
+                return downloader.download_subtitles(str(video_url))
+            except Exception as e:
+                logger.warning(f"获取平台字幕失败: {e}，将使用音频转写")
+                return None
+
+        def fetch_metadata():
+            if audio_cache_file.exists():
+                return None
+            try:
+                return downloader.fetch_metadata(str(video_url))
+            except Exception as e:
+                logger.warning(f"获取视频元信息失败: {e}")
+                return None
+
+        logger.info("预检：并行获取平台字幕和元信息...")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            subtitles_future = pool.submit(fetch_subtitles)
+            metadata_future = pool.submit(fetch_metadata)
+            subtitles = subtitles_future.result()
+            ctx.metadata = metadata_future.result()
+
+        ctx.subtitles_checked = True
+        if subtitles and subtitles.segments:
+            ctx.subtitles = subtitles
+            logger.info(f"预检获取到平台字幕，共 {len(subtitles.segments)} 段")
+        else:
+            logger.info("平台无可用字幕，将使用音频转写")
+
     def _download_media(
         self,
+        ctx: NoteRunContext,
         downloader: Downloader,
         video_url: Union[str, HttpUrl],
         quality: DownloadQuality,
@@ -335,6 +469,7 @@ class NoteGenerator:
         2. 如果需要视频，则先下载视频并生成缩略图集，再下载音频。
         3. 返回 AudioDownloadResult
 
+        :param ctx: 本次任务的运行上下文，下载的视频路径和拼图写入其中
         :param downloader: Downloader 实例
         :param video_url: 视频/音频链接
         :param quality: 音频下载质量
@@ -355,6 +490,10 @@ class NoteGenerator:
 
         # 判断是否需要下载视频
         need_video = screenshot or video_understanding
+        if screenshot and not video_understanding and SCREENSHOT_REMOTE_SEEK:
+            # 只需要截图时不下载视频，截图阶段直接从远程视频流按时间点截取
+            logger.info("仅截图模式：跳过视频下载，截图时远程拉取")
+            need_video = False
         if screenshot and not grid_size:
             grid_size = [2, 2]
 
@@ -363,18 +502,21 @@ class NoteGenerator:
             try:
                 logger.info("开始下载视频")
                 video_path_str = downloader.download_video(video_url)
-                self.video_path = Path(video_path_str)
-                logger.info(f"视频下载完成：{self.video_path}")
+                ctx.video_path = Path(video_path_str)
+                logger.info(f"视频下载完成：{ctx.video_path}")
 
                 # 若指定了 grid_size，则生成缩略图
                 if grid_size:
-                    self.video_img_urls=VideoReader(
-                        video_path=str(self.video_path),
+                    ctx.video_img_urls = VideoReader(
+                        video_path=str(ctx.video_path),
                         grid_size=tuple(grid_size),
                         frame_interval=frame_interval,
                         unit_width=960,
                         unit_height=540,
                         save_quality=80,
+                        # 每个任务独立的帧/拼图目录：run() 会清空目录，拼图引用也要保留到请求发出
+                        frame_dir=get_app_dir(os.path.join("output_frames", ctx.task_id)),
+                        grid_dir=get_app_dir(os.path.join("grid_output", ctx.task_id)),
                     ).run()
                 else:
                     logger.info("未指定 grid_size，跳过缩略图生成")
@@ -391,6 +533,17 @@ class NoteGenerator:
                 return AudioDownloadResult(**data)
             except Exception as e:
                 logger.warning(f"读取音频缓存失败，将重新下载：{e}")
+        # 预检已拿到平台字幕和元信息，音频只用于转写，不再下载；元信息不含音频路径，因此不写入音频缓存
+        if ctx.subtitles and ctx.metadata:
+            logger.info("已获取平台字幕，跳过音频下载")
+            return ctx.metadata
+        # 已下载视频时直接从本地文件提取音轨，不再单独下载一次音频
+        if ctx.video_path:
+            audio = self._extract_audio_from_local_video(ctx, downloader, str(video_url))
+            if audio:
+                audio_cache_file.write_text(json.dumps(asdict(audio), ensure_ascii=False, indent=2), encoding="utf-8")
+                logger.info(f"从本地视频提取音频并缓存成功 ({audio_cache_file})")
+                return audio
         # 下载音频
         try:
             logger.info("开始下载音频")
@@ -410,8 +563,36 @@ class NoteGenerator:
             raise
 
 
+    def _extract_audio_from_local_video(
+        self,
+        ctx: NoteRunContext,
+        downloader: Downloader,
+        video_url: str,
+    ) -> AudioDownloadResult | None:
+        """
+        用已下载的视频文件生成音频结果：元信息来自预检（或复用 yt-dlp 解析缓存），音轨从本地提取。
+        平台不支持单独获取元信息或提取失败时返回 None，由调用方回退到下载音频
+
+        :param ctx: 本次任务的运行上下文，需已有 video_path
+        :param downloader: Downloader 实例
+        :param video_url: 视频链接
+        :return: AudioDownloadResult 或 None
+        """
+        try:
+            metadata = ctx.metadata or downloader.fetch_metadata(video_url)
+            if metadata is None:
+                return None
+            # 本地 whisper 可直接读取 m4a；云端转写服务按 mp3 上传，需要转码
+            stream_copy = self.transcriber_type in ("fast-whisper", "mlx-whisper")
+            audio_path = extract_audio_from_video(str(ctx.video_path), stream_copy=stream_copy)
+        except Exception as e:
+            logger.warning(f"从本地视频提取音频失败，将单独下载音频：{e}")
+            return None
+        return replace(metadata, file_path=audio_path, video_path=str(ctx.video_path))
+
     def _get_transcript(
         self,
+        ctx: NoteRunContext,
         downloader: Downloader,
         video_url: str,
         audio_file: str,
@@ -422,6 +603,7 @@ class NoteGenerator:
         """
         优先获取平台字幕，没有则 fallback 到音频转写
 
+        :param ctx: 本次任务的运行上下文，预检查到的字幕直接使用
         :param downloader: 下载器实例
         :param video_url: 视频链接
         :param audio_file: 音频文件路径（用于 fallback 转写）
@@ -438,14 +620,18 @@ class NoteGenerator:
             try:
                 data = json.loads(transcript_cache_file.read_text(encoding="utf-8"))
                 segments = [TranscriptSegment(**seg) for seg in data.get("segments", [])]
-                return TranscriptResult(language=data.get("language"), full_text=data["full_text"], segments=segments)
+                return TranscriptResult(language=data.get("language"), full_text=data["full_text"], segments=segments,
+                                        raw=data.get("raw"))
             except Exception as e:
                 logger.warning(f"加载转写缓存失败，将重新获取：{e}")
 
-        # 1. 先尝试获取平台字幕
-        logger.info("尝试获取平台字幕...")
+        # 1. 先尝试获取平台字幕（预检已查询过时直接使用其结果）
         try:
-            transcript = downloader.download_subtitles(video_url)
+            if ctx.subtitles_checked:
+                transcript = ctx.subtitles
+            else:
+                logger.info("尝试获取平台字幕...")
+                transcript = downloader.download_subtitles(video_url)
             if transcript and transcript.segments:
                 logger.info(f"成功获取平台字幕，共 {len(transcript.segments)} 段")
                 # 缓存结果
@@ -490,14 +676,17 @@ class NoteGenerator:
             try:
                 data = json.loads(transcript_cache_file.read_text(encoding="utf-8"))
                 segments = [TranscriptSegment(**seg) for seg in data.get("segments", [])]
-                return TranscriptResult(language=data["language"], full_text=data["full_text"], segments=segments)
+                return TranscriptResult(language=data["language"], full_text=data["full_text"], segments=segments,
+                                        raw=data.get("raw"))
             except Exception as e:
                 logger.warning(f"加载转写缓存失败，将重新转写：{e}")
 
         # 调用转写器
         try:
             logger.info("开始转写音频")
-            transcript = self.transcriber.transcript(file_path=audio_file)
+            # 本地模型实例在任务间共享且不保证线程安全，同类型转写器同一时刻只跑一个
+            with get_transcriber_lock(self.transcriber_type):
+                transcript = self.transcriber.transcript(file_path=audio_file)
             transcript_cache_file.write_text(json.dumps(asdict(transcript), ensure_ascii=False, indent=2), encoding="utf-8")
             logger.info(f"转写并缓存成功 ({transcript_cache_file})")
             return transcript
@@ -508,6 +697,7 @@ class NoteGenerator:
 
     def _summarize_text(
         self,
+        ctx: NoteRunContext,
         audio_meta: AudioDownloadResult,
         transcript: TranscriptResult,
         gpt: GPT,
@@ -517,11 +707,11 @@ class NoteGenerator:
         formats: List[str],
         style: Optional[str],
         extras: Optional[str],
-            video_img_urls: List[str],
     ) -> str | None:
         """
         调用 GPT 对转写结果进行总结，生成 Markdown 文本并缓存。
 
+        :param ctx: 本次任务的运行上下文，提供视频拼图
         :param audio_meta: AudioDownloadResult 元信息
         :param transcript: TranscriptResult 转写结果
         :param gpt: GPT 实例
@@ -533,25 +723,39 @@ class NoteGenerator:
         :param extras: GPT 额外参数
         :return: 生成的 Markdown 字符串
         """
-        task_id = markdown_cache_file.stem
+        checkpoint_key = markdown_cache_file.stem
+        task_id = checkpoint_key.split("_")[0]
         self._update_status(task_id, TaskStatus.SUMMARIZING)
 
+        segments = transcript.segments
+        if TRANSCRIPT_COMPACT_ENABLED and is_platform_subtitle(transcript):
+            segments = compact_segments(segments)
+            logger.info(f"转写分段压缩：{len(transcript.segments)} -> {len(segments)}")
+        if EXTRACTIVE_SUMMARY_ENABLED:
+            budget = EXTRACTIVE_SUMMARY_TOKENS or int(getattr(gpt, "max_prompt_tokens", 32000) * 0.7)
+            before = len(segments)
+            segments = extract_key_segments(segments, budget, estimate_tokens)
+            if len(segments) < before:
+                logger.info(f"抽取式摘录：{before} -> {len(segments)} 段（预算 {budget} tokens）")
+
         source = GPTSource(
             title=audio_meta.title,
-            segment=transcript.segments,
+            segment=segments,
             tags=audio_meta.raw_info.get("tags", []),
             screenshot=screenshot,
-            video_img_urls=video_img_urls,
+            video_img_urls=ctx.video_img_urls,
             link=link,
             _format=formats,
             style=style,
             extras=extras,
-            checkpoint_key=task_id,
+            checkpoint_key=checkpoint_key,
+            on_progress=self._make_progress_writer(task_id),
         )
 
         try:
             markdown = gpt.summarize(source)
             markdown_cache_file.write_text(markdown, encoding="utf-8")
+            (NOTE_OUTPUT_DIR / f"{task_id}.partial.md").unlink(missing_ok=True)
             logger.info(f"GPT 总结并缓存成功 ({markdown_cache_file})")
             return markdown
         except Exception as exc:
@@ -561,8 +765,9 @@ class NoteGenerator:
 
     def _post_process_markdown(
         self,
+        ctx: NoteRunContext,
+        downloader: Downloader,
         markdown: str,
-        video_path: Optional[Path],
         formats: List[str],
         audio_meta: AudioDownloadResult,
         platform: str,
@@ -571,17 +776,21 @@ class NoteGenerator:
         对生成的 Markdown 做后期处理：插入截图和/或插入链接。
 
         :param markdown: 原始 Markdown 字符串
-        :param video_path: 本地视频路径（可为 None）
+        :param ctx: 本次任务的运行上下文，提供本地视频路径（可为 None）
+        :param downloader: Downloader 实例，用于解析高清截图的视频流
         :param formats: 包含 'link' 或 'screenshot' 的列表
         :param audio_meta: AudioDownloadResult 元信息，用于链接替换
         :param platform: 平台标识，用于链接替换
         :return: 处理后的 Markdown 字符串
         """
-        if "screenshot" in formats and video_path:
-            try:
-                markdown = self._insert_screenshots(markdown, video_path)
-            except Exception as exc:
-                logger.warning("截图插入失败，跳过该步骤")
+        if "screenshot" in formats:
+            video_source, headers = self._resolve_screenshot_source(ctx, downloader)
+            if video_source:
+                try:
+                    # 远程直链可能中途过期，截图失败时保留原文而不是丢掉整篇笔记
+                    markdown = self._insert_screenshots(markdown, video_source, headers) or markdown
+                except Exception as exc:
+                    logger.warning("截图插入失败，跳过该步骤")
 
         if "link" in formats:
             try:
@@ -591,18 +800,49 @@ class NoteGenerator:
 
         return markdown
 
-    def _insert_screenshots(self, markdown: str, video_path: Path) -> str | None | Any:
+    def _resolve_screenshot_source(
+        self,
+        ctx: NoteRunContext,
+        downloader: Downloader,
+    ) -> Tuple[Optional[str], Optional[dict]]:
+        """
+        确定截图来源：开启 SCREENSHOT_HIGH_RES，或仅截图模式下没有本地视频时，使用视频流直链；
+        否则（或解析失败时）使用本地视频，仅截图模式下解析失败则补下载视频
+
+        :return: (视频路径或直链, 请求头)，都没有时返回 (None, None)
+        """
+        remote_only = SCREENSHOT_REMOTE_SEEK and not ctx.video_path
+        if SCREENSHOT_HIGH_RES or remote_only:
+            try:
+                stream = downloader.resolve_stream_url(ctx.video_url, max_height=SCREENSHOT_MAX_HEIGHT or None)
+                if stream:
+                    logger.info("截图使用远程视频流")
+                    return stream["url"], stream.get("headers")
+            except Exception as e:
+                logger.warning(f"解析视频流失败，改用本地视频截图：{e}")
+        if not ctx.video_path and remote_only:
+            try:
+                logger.info("远程截图不可用，下载视频用于截图")
+                ctx.video_path = Path(downloader.download_video(ctx.video_url))
+            except Exception as e:
+                logger.warning(f"下载视频失败，跳过截图：{e}")
+        if ctx.video_path:
+            return str(ctx.video_path), None
+        return None, None
+
+    def _insert_screenshots(self, markdown: str, video_path: str, headers: Optional[dict] = None) -> str | None | Any:
         """
         扫描 Markdown 文本中所有 Screenshot 标记，并替换为实际生成的截图链接。
 
         :param markdown: 含有 *Screenshot-mm:ss 或 Screenshot-[mm:ss] 标记的 Markdown 文本
-        :param video_path: 本地视频文件路径
+        :param video_path: 本地视频文件路径或远程视频流直链
+        :param headers: 访问远程直链所需的请求头
         :return: 替换后的 Markdown 字符串
         """
         matches: List[Tuple[str, int]] = extract_screenshot_timestamps(markdown)
         for idx, (marker, ts) in enumerate(matches):
             try:
-                img_path = generate_screenshot(str(video_path), str(IMAGE_OUTPUT_DIR), ts, idx)
+                img_path = generate_screenshot(str(video_path), str(IMAGE_OUTPUT_DIR), ts, idx, headers=headers)
                 filename = Path(img_path).name
                 # 构建前端可访问的 URL，例如 /static/screenshots/{filename}
                 img_url = f"{IMAGE_BASE_URL.rstrip('/')}/{filename}"
@@ -0,0 +1,200 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from app.enmus.exception import NoteErrorEnum
+from app.exceptions.note import NoteError
+from app.models.audio_model import AudioDownloadResult, PlaylistEntry, PlaylistInfo
+from app.models.notes_model import NoteResult
+from app.models.transcriber_model import TranscriptResult
+from app.services.constant import SUPPORT_PLATFORM_MAP
+from app.services.fair_queue import FairQueue
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 同一批次最多同时提交的子任务数；实际执行仍受全局任务并发（NOTE_TASK_CONCURRENCY）限制，
+# 这里保证一个大合集不会一次占满全局队列
+NOTE_BATCH_CONCURRENCY = int(os.getenv("NOTE_BATCH_CONCURRENCY", "2"))
+# 单个合集最多展开的视频数
+NOTE_BATCH_MAX_ITEMS = int(os.getenv("NOTE_BATCH_MAX_ITEMS", "100"))
+# 批量接口：全部批次共用的执行线程数、单次提交的最大条目数
+NOTE_BULK_WORKERS = int(os.getenv("NOTE_BULK_WORKERS", "2"))
+NOTE_BULK_MAX_ITEMS = int(os.getenv("NOTE_BULK_MAX_ITEMS", "500"))
+
+
+@dataclass
+class BatchChild:
+    task_id: str                       # 子任务 ID，与单条笔记任务一致，可用 /task_status 查询
+    entry: PlaylistEntry               # 对应的合集子视频
+    note: Optional[NoteResult] = None  # 生成成功后的笔记
+    error: Optional[str] = None        # 失败原因
+
+
+def expand_playlist(video_url: str, platform: str) -> PlaylistInfo:
+    """
+    把分P视频、合集或播放列表展开为子视频列表；不是合集时返回只含该视频本身的列表
+    """
+    downloader = SUPPORT_PLATFORM_MAP.get(platform)
+    if not downloader:
+        raise NoteError(code=NoteErrorEnum.PLATFORM_NOT_SUPPORTED.code,
+                        message=NoteErrorEnum.PLATFORM_NOT_SUPPORTED.message)
+
+    playlist = downloader.expand_playlist(video_url)
+    if not playlist:
+        return PlaylistInfo(title="", entries=[PlaylistEntry(url=video_url, title="", index=1)])
+    if len(playlist.entries) > NOTE_BATCH_MAX_ITEMS:
+        logger.warning(f"合集共 {len(playlist.entries)} 个视频，只处理前 {NOTE_BATCH_MAX_ITEMS} 个")
+        playlist.entries = playlist.entries[:NOTE_BATCH_MAX_ITEMS]
+    logger.info(f"合集《{playlist.title}》展开为 {len(playlist.entries)} 个视频")
+    return playlist
+
+
+def run_children(
+    children: List[BatchChild],
+    run_child: Callable[[BatchChild], Optional[NoteResult]],
+    max_workers: int = NOTE_BATCH_CONCURRENCY,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> List[BatchChild]:
+    """
+    以有限并发执行子任务，单个子任务失败不影响其他子任务
+
+    :param children: 子任务列表
+    :param run_child: 执行单个子任务，返回笔记，失败时返回 None 或抛异常
+    :param max_workers: 最大并发数
+    :param on_progress: 每完成一个子任务回调 (已完成数, 总数)
+    :return: 原顺序的子任务列表，note / error 已填好
+    """
+    def _run(child: BatchChild) -> BatchChild:
+        try:
+            child.note = run_child(child)
+            if child.note is None:
+                child.error = "笔记生成失败"
+        except Exception as e:
+            logger.error(f"子任务失败 (task_id={child.task_id})：{e}")
+            child.error = str(e)
+        return child
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for _ in as_completed([pool.submit(_run, child) for child in children]):
+            done += 1
+            if on_progress:
+                on_progress(done, len(children))
+    return children
+
+
+def _format_duration(seconds: Optional[float]) -> str:
+    if not seconds:
+        return "-"
+    minutes, sec = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{sec:02d}" if hours else f"{minutes}:{sec:02d}"
+
+
+def build_index_note(batch_id: str, title: str, platform: str, children: List[BatchChild]) -> NoteResult:
+    """
+    生成合集的汇总目录笔记：列出每个子视频的标题、时长、状态和子任务 ID
+    """
+    succeeded = sum(1 for child in children if child.note)
+    lines = [
+        f"# {title or '合集笔记'}",
+        "",
+        f"共 {len(children)} 个视频，成功 {succeeded} 个，失败 {len(children) - succeeded} 个。",
+        "",
+        "| # | 标题 | 时长 | 状态 | 笔记任务 |",
+        "| --- | --- | --- | --- | --- |",
+    ]
+    total_duration = 0.0
+    for child in children:
+        meta = child.note.audio_meta if child.note else None
+        child_title = (meta.title if meta else "") or child.entry.title or child.entry.url
+        duration = (meta.duration if meta else None) or child.entry.duration
+        total_duration += duration or 0
+        status = "完成" if child.note else f"失败：{child.error or '未知错误'}"
+        child_title = child_title.replace("|", "\\|")
+        status = status.replace("|", "\\|").replace("\n", " ")
+        lines.append(f"| {child.entry.index} | [{child_title}]({child.entry.url}) | "
+                     f"{_format_duration(duration)} | {status} | `{child.task_id}` |")
+
+    cover_url = next((child.note.audio_meta.cover_url for child in children if child.note), None)
+    return NoteResult(
+        markdown="\n".join(lines) + "\n",
+        transcript=TranscriptResult(language=None, full_text="", segments=[]),
+        audio_meta=AudioDownloadResult(
+            file_path="",
+            title=title,
+            duration=total_duration,
+            cover_url=cover_url,
+            platform=platform,
+            video_id=batch_id,
+            raw_info={"children": [{"task_id": child.task_id, "url": child.entry.url, "index": child.entry.index,
+                                    "success": bool(child.note)} for child in children]},
+        ),
+    )
+
+
+def dedupe_items(items: List[Any], key: Callable[[Any], Hashable]) -> Tuple[List[Any], List[int]]:
+    """
+    按 key 去重，重复条目共用第一次出现的任务
+
+    :return: (去重后的条目, 每个原始条目对应的去重后下标)
+    """
+    unique: List[Any] = []
+    positions: dict = {}
+    mapping: List[int] = []
+    for item in items:
+        k = key(item)
+        if k not in positions:
+            positions[k] = len(unique)
+            unique.append(item)
+        mapping.append(positions[k])
+    return unique, mapping
+
+
+@dataclass
+class BatchJob:
+    batch_id: str               # 所属批次
+    task_id: str                # 笔记任务 ID
+    run: Callable[[], Any]      # 执行笔记生成
+
+
+class BatchDispatcher:
+    """
+    批量接口的调度器：所有批次的条目进入同一个 FairQueue，按优先级、用户轮转取出，
+    由固定数量的工作线程执行；工作线程在第一次提交时启动
+    """
+
+    def __init__(self, workers: int, on_error: Optional[Callable[[BatchJob, Exception], None]] = None):
+        self.workers = max(1, workers)
+        self.on_error = on_error
+        self._queue = FairQueue()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, jobs: List[BatchJob], user: Hashable, priority: int = 0) -> None:
+        for job in jobs:
+            self._queue.put(job, user=user, priority=priority)
+        self._ensure_workers()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name=f"note-batch-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                job.run()
+            except Exception as e:
+                logger.error(f"批量任务失败 (batch_id={job.batch_id}, task_id={job.task_id})：{e}")
+                if self.on_error:
+                    self.on_error(job, e)
@@ -11,6 +11,7 @@ from app.db.provider_dao import (
     delete_provider, get_enabled_providers,
 )
 from app.gpt.gpt_factory import GPTFactory
+from app.gpt.provider.OpenAI_compatible_provider import invalidate_provider_clients
 from app.models.model_config import ModelConfig
 
 
@@ -29,6 +30,8 @@ class ProviderService:
             "enabled": row.get("enabled"),
             "base_url": row.get("base_url"),
             "api_key": row.get("api_key"),
+            "rpm": row.get("rpm"),
+            "tpm": row.get("tpm"),
             "created_at": jsonable_encoder(row.get("created_at")),
             # "name": row[1],
             # "logo": row[2],
@@ -52,6 +55,8 @@ class ProviderService:
             "enabled": row.get("enabled"),
             "base_url": row.get("base_url"),
             "api_key":  ProviderService.mask_key(row.get("api_key")),
+            "rpm": row.get("rpm"),
+            "tpm": row.get("tpm"),
             "created_at": jsonable_encoder(row.get("created_at")),
 
             # "id": row[0],
@@ -69,11 +74,12 @@ class ProviderService:
             return '*' * len(key)
         return key[:4] + '*' * (len(key) - 8) + key[-4:]
     @staticmethod
-    def add_provider( name: str, api_key: str, base_url: str, logo: str, type_: str, enabled: int = 1):
+    def add_provider( name: str, api_key: str, base_url: str, logo: str, type_: str, enabled: int = 1,
+                      rpm: int | None = None, tpm: int | None = None):
         try:
             id = uuid().lower()
             logo='custom'
-            return insert_provider(id, name, api_key, base_url, logo, type_, enabled)
+            return insert_provider(id, name, api_key, base_url, logo, type_, enabled, rpm=rpm, tpm=tpm)
         except Exception as  e:
             print('创建模式失败',e)
     @staticmethod
@@ -86,6 +92,8 @@ class ProviderService:
             "api_key": p.api_key,
             "base_url": p.base_url,
             "enabled": p.enabled,
+            "rpm": p.rpm,
+            "tpm": p.tpm,
             "created_at": p.created_at,
         }
     @staticmethod
@@ -123,6 +131,7 @@ class ProviderService:
             filtered_data = {k: v for k, v in data.items() if v is not None and k != 'id'}
             print('更新模型供应商',filtered_data)
             update_provider(id, **filtered_data)
+            invalidate_provider_clients(id)
             return id
 
         except Exception as e:
@@ -131,4 +140,6 @@ class ProviderService:
 
     @staticmethod
     def delete_provider(id: str):
-        return delete_provider(id)
+        result = delete_provider(id)
+        invalidate_provider_clients(id)
+        return result
@@ -0,0 +1,139 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.services.fair_queue import FairQueue
+
+LANE_FAST = "fast"                  # 已知时长较短的交互任务
+LANE_INTERACTIVE = "interactive"    # 用户在页面上单独发起的任务
+LANE_BATCH = "batch"                # 合集 / 批量接口产生的任务
+LANES = (LANE_FAST, LANE_INTERACTIVE, LANE_BATCH)
+
+# 已知时长不超过该值（秒）的交互任务进入快速通道；0 表示关闭快速通道
+NOTE_FAST_LANE_MAX_SECONDS = float(os.getenv("NOTE_FAST_LANE_MAX_SECONDS", "900"))
+# 判断快速通道时解析视频时长的最长等待（秒），超时按交互通道调度
+NOTE_FAST_LANE_PROBE_TIMEOUT = float(os.getenv("NOTE_FAST_LANE_PROBE_TIMEOUT", "5"))
+# 多个通道同时有任务排队时，按权重轮流放行；每个通道至少为 1，保证批量任务不会被饿死
+NOTE_LANE_WEIGHTS = os.getenv("NOTE_LANE_WEIGHTS", "fast:4,interactive:2,batch:1")
+
+
+def parse_lane_weights(spec: str) -> Dict[str, int]:
+    """
+    解析 "fast:4,interactive:2,batch:1"，缺失或非法的通道按 1 处理
+    """
+    weights = {lane: 1 for lane in LANES}
+    for part in spec.split(","):
+        lane, _, value = part.partition(":")
+        lane = lane.strip()
+        if lane in weights and value.strip().isdigit():
+            weights[lane] = max(1, int(value))
+    return weights
+
+
+def _build_cycle(weights: Dict[str, int]) -> List[str]:
+    """
+    平滑加权轮询（与 nginx 相同的算法），生成一轮的通道顺序，
+    如 fast:4,interactive:2,batch:1 -> fast, interactive, fast, batch, fast, interactive, fast
+    """
+    current = {lane: 0 for lane in weights}
+    total = sum(weights.values())
+    cycle = []
+    for _ in range(total):
+        for lane, weight in weights.items():
+            current[lane] += weight
+        lane = max(current, key=current.get)
+        current[lane] -= total
+        cycle.append(lane)
+    return cycle
+
+
+class TaskScheduler:
+    """
+    笔记任务调度器，代替原来的全局先进先出锁：
+    - 最多 max_workers 个任务同时执行（NOTE_TASK_CONCURRENCY，默认 1 即串行）；
+    - 任务分为快速、交互、批量三个通道，空出执行位时按通道权重轮流放行；
+    - 每个通道内先按优先级、同一优先级再按用户轮转，一个用户的大批量任务不会挡住其他用户
+    """
+
+    def __init__(self, max_workers: int = 1, weights: Optional[Dict[str, int]] = None,
+                 fast_lane_max_seconds: float = NOTE_FAST_LANE_MAX_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.fast_lane_max_seconds = fast_lane_max_seconds
+        self._lock = threading.Lock()
+        self._lanes = {lane: FairQueue() for lane in LANES}
+        self._cycle = _build_cycle(weights or parse_lane_weights(NOTE_LANE_WEIGHTS))
+        self._cursor = 0
+        self._running = 0
+        self._probe_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lane-probe")
+
+    def lane_for(self, lane: str, duration: Optional[float] = None) -> str:
+        """交互任务的时长已知且较短时改走快速通道"""
+        if lane == LANE_INTERACTIVE and duration and 0 < duration <= self.fast_lane_max_seconds:
+            return LANE_FAST
+        return lane
+
+    def classify(self, lane: str, probe: Callable[[], Optional[float]],
+                 timeout: float = NOTE_FAST_LANE_PROBE_TIMEOUT) -> Tuple[str, Optional[float]]:
+        """
+        在独立线程里调用 probe 解析视频时长，判断交互任务能否走快速通道；
+        超时或解析失败时保持原通道。超时的解析会在后台跑完，结果留在 yt-dlp 缓存里供任务预检复用
+
+        :return: (通道, 时长)
+        """
+        if lane != LANE_INTERACTIVE or self.fast_lane_max_seconds <= 0:
+            return lane, None
+        try:
+            duration = self._probe_pool.submit(probe).result(timeout=timeout)
+        except Exception:
+            return lane, None
+        return self.lane_for(lane, duration), duration
+
+    def run(self, fn: Callable[..., Any], *args: Any, lane: str = LANE_INTERACTIVE, user: Hashable = None,
+            priority: int = 0, duration: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        排队等待执行位后在当前线程执行 fn，返回其结果
+
+        :param lane: 任务类别，interactive / batch
+        :param user: 用户标识，同一通道、同一优先级内按用户轮转
+        :param priority: 通道内的优先级，越大越先执行，高优先级的任务排完才轮到低优先级
+        :param duration: 视频时长（秒），已知且较短的交互任务进入快速通道
+        """
+        lane = self.lane_for(lane, duration)
+        ticket = threading.Event()
+        with self._lock:
+            self._lanes[lane].put(ticket, user=user, priority=priority)
+            self._dispatch()
+        ticket.wait()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._dispatch()
+
+    def pending(self) -> Dict[str, int]:
+        """各通道排队中的任务数"""
+        with self._lock:
+            return {lane: len(queue) for lane, queue in self._lanes.items()}
+
+    def _dispatch(self) -> None:
+        # 调用方需持有 self._lock
+        while self._running < self.max_workers:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            self._lanes[lane].get_nowait().set()
+            self._running += 1
+
+    def _next_lane(self) -> Optional[str]:
+        for offset in range(len(self._cycle)):
+            index = (self._cursor + offset) % len(self._cycle)
+            lane = self._cycle[index]
+            if len(self._lanes[lane]):
+                self._cursor = (index + 1) % len(self._cycle)
+                return lane
+        return None
+
+
+task_scheduler = TaskScheduler(int(os.getenv("NOTE_TASK_CONCURRENCY", "1")))
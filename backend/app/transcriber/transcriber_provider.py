@@ -1,5 +1,7 @@
 import os
 import platform
+import threading
+from contextlib import nullcontext
 from enum import Enum
 
 from app.transcriber.groq import GroqTranscriber
@@ -38,16 +40,41 @@ _transcribers = {
     TranscriberType.GROQ: None,
 }
 
+# 多个任务并发时保护单例创建，避免重复加载模型
+_transcribers_lock = threading.Lock()
+
+# 本地模型转写器共享一份模型且不保证线程安全，转写时按类型串行；云端转写器可以并发调用
+_LOCAL_TRANSCRIBERS = {TranscriberType.FAST_WHISPER, TranscriberType.MLX_WHISPER}
+_transcribe_locks = {key: threading.Lock() for key in _LOCAL_TRANSCRIBERS}
+
+
+def get_transcriber_lock(transcriber_type: str):
+    """
+    返回调用该类型转写器 transcript() 时需持有的锁，云端转写器返回空上下文
+    """
+    try:
+        key = TranscriberType(transcriber_type)
+    except ValueError:
+        key = TranscriberType.FAST_WHISPER
+    if key == TranscriberType.MLX_WHISPER and not MLX_WHISPER_AVAILABLE:
+        # 与 get_transcriber 一致：MLX 不可用时实际使用的是 fast-whisper
+        key = TranscriberType.FAST_WHISPER
+    return _transcribe_locks.get(key) or nullcontext()
+
+
 # 公共实例初始化函数
 def _init_transcriber(key: TranscriberType, cls, *args, **kwargs):
-    if _transcribers[key] is None:
-        logger.info(f'创建 {cls.__name__} 实例: {key}')
-        try:
-            _transcribers[key] = cls(*args, **kwargs)
-            logger.info(f'{cls.__name__} 创建成功')
-        except Exception as e:
-            logger.error(f"{cls.__name__} 创建失败: {e}")
-            raise
+    if _transcribers[key] is not None:
+        return _transcribers[key]
+    with _transcribers_lock:
+        if _transcribers[key] is None:
+            logger.info(f'创建 {cls.__name__} 实例: {key}')
+            try:
+                _transcribers[key] = cls(*args, **kwargs)
+                logger.info(f'{cls.__name__} 创建成功')
+            except Exception as e:
+                logger.error(f"{cls.__name__} 创建失败: {e}")
+                raise
     return _transcribers[key]
 
 # 各类型获取方法
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+# 全局常驻事件循环：所有异步 LLM 请求都跑在这一个线程上，
+# 连接池（httpx.AsyncClient）因此可以在不同任务之间复用
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    返回后台事件循环，首次调用时在守护线程中启动
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-runner", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+def submit_coroutine(coro: Coroutine) -> Future:
+    """
+    把协程提交到后台事件循环，立即返回 concurrent.futures.Future，调用方可以边等待边做别的事
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run_coroutine(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """
+    在后台事件循环中执行协程，并阻塞等待结果（供同步代码调用）
+
+    :param coro: 协程对象
+    :param timeout: 等待超时时间（秒），None 表示一直等待
+    :return: 协程返回值
+    """
+    return submit_coroutine(coro).result(timeout)
@@ -0,0 +1,125 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List
+
+from app.models.transcriber_model import TranscriptSegment
+
+# 按该时长（秒）划分时间窗口，每个窗口按篇幅比例分配预算，避免摘录全部集中在某一段
+EXTRACTIVE_WINDOW_SECONDS = float(os.getenv("EXTRACTIVE_WINDOW_SECONDS", "300"))
+# 句子得分中与全文主题相似度的权重，其余为与所在窗口主题的相似度
+GLOBAL_WEIGHT = 0.3
+
+_LATIN_WORD_RE = re.compile(r"[a-z0-9']{2,}")
+_CJK_RUN_RE = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]+")
+_STOPWORDS = {
+    "the", "and", "is", "are", "to", "of", "in", "it", "that", "this", "for", "on", "you", "we",
+    "be", "so", "with", "as", "at", "or", "an", "was", "but", "have", "do", "just", "like",
+    "我们", "你们", "他们", "这个", "那个", "就是", "然后", "所以", "一个", "没有", "什么", "可以",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    轻量分词：拉丁文按单词，中日韩文本按字二元组，不依赖分词库
+    """
+    text = (text or "").lower()
+    terms = [w for w in _LATIN_WORD_RE.findall(text) if w not in _STOPWORDS]
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            continue
+        terms.extend(bigram for bigram in (run[i:i + 2] for i in range(len(run) - 1)) if bigram not in _STOPWORDS)
+    return terms
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if norm == 0:
+        return {}
+    return {term: v / norm for term, v in vector.items()}
+
+
+def _dot(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(term, 0.0) for term, v in a.items())
+
+
+def _centroid(vectors: List[Dict[str, float]]) -> Dict[str, float]:
+    total: Dict[str, float] = {}
+    for vector in vectors:
+        for term, v in vector.items():
+            total[term] = total.get(term, 0.0) + v
+    return _normalize(total)
+
+
+def score_segments(segments: List[TranscriptSegment], window_seconds: float = EXTRACTIVE_WINDOW_SECONDS) -> List[float]:
+    """
+    TF-IDF 句子打分：与所在时间窗口及全文的主题中心越相似，得分越高。
+    用质心相似度代替 TextRank 的两两相似度矩阵，长视频下也是线性复杂度
+    """
+    term_lists = [tokenize(seg.text) for seg in segments]
+    doc_freq = Counter()
+    for terms in term_lists:
+        doc_freq.update(set(terms))
+    n = len(segments)
+    idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+    vectors = [
+        _normalize({term: (1 + math.log(tf)) * idf[term] for term, tf in Counter(terms).items()})
+        for terms in term_lists
+    ]
+    global_centroid = _centroid(vectors)
+
+    windows: Dict[int, List[int]] = {}
+    for idx, seg in enumerate(segments):
+        windows.setdefault(int(seg.start // window_seconds), []).append(idx)
+
+    scores = [0.0] * n
+    for indexes in windows.values():
+        window_centroid = _centroid([vectors[i] for i in indexes])
+        for i in indexes:
+            scores[i] = (1 - GLOBAL_WEIGHT) * _dot(vectors[i], window_centroid) + GLOBAL_WEIGHT * _dot(vectors[i], global_centroid)
+    return scores
+
+
+def extract_key_segments(
+    segments: List[TranscriptSegment],
+    token_budget: int,
+    token_estimator: Callable[[str], int],
+    window_seconds: float = EXTRACTIVE_WINDOW_SECONDS,
+) -> List[TranscriptSegment]:
+    """
+    在 token 预算内按时间窗口摘录得分最高的分段，保持原有时间顺序。
+    转写本身未超出预算时原样返回。
+
+    :param segments: 转写分段（需按时间排序）
+    :param token_budget: 摘录结果的 token 上限
+    :param token_estimator: token 估算函数
+    :param window_seconds: 时间窗口长度
+    :return: 摘录后的分段列表
+    """
+    costs = [token_estimator(seg.text) + 1 for seg in segments]
+    total = sum(costs)
+    if total <= token_budget or not segments:
+        return list(segments)
+
+    scores = score_segments(segments, window_seconds)
+    windows: Dict[int, List[int]] = {}
+    for idx, seg in enumerate(segments):
+        windows.setdefault(int(seg.start // window_seconds), []).append(idx)
+
+    selected: List[int] = []
+    carry = 0.0
+    for key in sorted(windows):
+        indexes = windows[key]
+        # 按窗口篇幅占比分配预算，用不完的部分顺延给后面的窗口
+        budget = token_budget * sum(costs[i] for i in indexes) / total + carry
+        for i in sorted(indexes, key=lambda i: scores[i], reverse=True):
+            if costs[i] <= budget:
+                selected.append(i)
+                budget -= costs[i]
+        carry = budget
+
+    return [segments[i] for i in sorted(selected)]
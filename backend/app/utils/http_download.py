@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 单次读写的块大小，下载过程中内存占用与文件大小无关
+CHUNK_SIZE = 1024 * 1024
+# 连接 / 读取超时（秒）
+CONNECT_TIMEOUT = float(os.getenv("HTTP_DOWNLOAD_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("HTTP_DOWNLOAD_READ_TIMEOUT", "60"))
+# 每个请求（或分段）失败后的重试次数，重试时从已写入的位置续传
+RETRIES = int(os.getenv("HTTP_DOWNLOAD_RETRIES", "3"))
+# 服务端支持 Range 且文件不小于该大小时，拆成多段并行下载
+SEGMENTS = max(1, int(os.getenv("HTTP_DOWNLOAD_SEGMENTS", "4")))
+PARALLEL_MIN_BYTES = int(float(os.getenv("HTTP_DOWNLOAD_PARALLEL_MIN_MB", "16")) * 1024 * 1024)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class RangeNotSupportedError(RuntimeError):
+    """发送了 Range 请求但服务端返回了完整内容，重试也不会成功"""
+
+
+def get_session() -> requests.Session:
+    """
+    所有下载共用一个 Session：urllib3 连接池是线程安全的，跨文件、跨分段复用 TCP/TLS 连接
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=SEGMENTS * 4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _probe(url: str, headers: dict) -> tuple[Optional[int], bool]:
+    """
+    用 1 字节的 Range 请求探测文件大小和是否支持断点续传（部分 CDN 不支持 HEAD）
+    """
+    with get_session().get(url, headers={**headers, "Range": "bytes=0-0"}, stream=True,
+                           allow_redirects=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+        resp.raise_for_status()
+        if resp.status_code == 206:
+            content_range = resp.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            return (int(total) if total.isdigit() else None), True
+        length = resp.headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+
+
+def _download_range(url: str, headers: dict, path: str, start: int, end: Optional[int]) -> int:
+    """
+    把 [start, end] 区间写入文件对应位置，中途失败从已写入的位置续传；end 为 None 表示到文件末尾。
+    只有从头下载到末尾时才接受服务端忽略 Range 返回的完整内容，其余情况抛 RangeNotSupportedError。
+    返回写入的字节数
+    """
+    written = 0
+    for attempt in range(RETRIES + 1):
+        offset = start + written
+        if end is not None and offset > end:
+            return written
+        range_headers = dict(headers)
+        if offset > 0 or end is not None:
+            range_headers["Range"] = f"bytes={offset}-{'' if end is None else end}"
+        try:
+            with get_session().get(url, headers=range_headers, stream=True, allow_redirects=True,
+                                   timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as resp:
+                resp.raise_for_status()
+                if "Range" in range_headers and resp.status_code != 206:
+                    if start > 0 or end is not None:
+                        raise RangeNotSupportedError(f"服务端不支持 Range 请求: {resp.status_code}")
+                    # 续传时服务端忽略了 Range，只能从头写
+                    written = 0
+                    offset = 0
+                with open(path, "r+b") as f:
+                    f.seek(offset)
+                    if end is None:
+                        f.truncate(offset)
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+            return written
+        except (requests.RequestException, IOError) as e:
+            if attempt == RETRIES:
+                raise
+            logger.warning(f"下载中断（已写入 {start + written} 字节），{attempt + 1} 秒后续传：{e}")
+            time.sleep(attempt + 1)
+    return written
+
+
+def _download_segments(url: str, headers: dict, part_path: str, total: int) -> int:
+    """
+    分段并行下载：预分配文件，各段写入各自位置；分段模式不做跨进程续传，重新开始
+    """
+    with open(part_path, "wb") as f:
+        f.truncate(total)
+    step = -(-total // SEGMENTS)
+    ranges = [(start, min(start + step, total) - 1) for start in range(0, total, step)]
+    logger.info(f"分 {len(ranges)} 段并行下载 {total} 字节: {part_path}")
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(_download_range, url, headers, part_path, start, end) for start, end in ranges]
+        return sum(future.result() for future in futures)
+
+
+def download_file(url: str, output_path: str, headers: Optional[dict] = None) -> str:
+    """
+    流式下载文件：分块写盘、失败按 Range 续传、大文件按 Range 分段并行下载。
+    先写入 .part 临时文件，完成后再改名，已存在的 .part 会作为断点续传的起点
+
+    :param url: 直链
+    :param output_path: 目标文件路径
+    :param headers: 请求头（如 Referer / User-Agent）
+    :return: 目标文件路径
+    """
+    headers = dict(headers or {})
+    part_path = f"{output_path}.part"
+    total, resumable = _probe(url, headers)
+
+    written = None
+    if total is not None and resumable and total >= PARALLEL_MIN_BYTES and SEGMENTS > 1:
+        try:
+            written = _download_segments(url, headers, part_path, total)
+        except RangeNotSupportedError as e:
+            # 探测时支持 Range，实际分段请求却返回完整内容（如 CDN 节点不一致），退回单连接从头下载
+            logger.warning(f"分段下载失败，改为单连接下载：{e}")
+            os.remove(part_path)
+            resumable = False
+
+    if written is None:
+        existing = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if not resumable or (total is not None and existing > total):
+            existing = 0
+        if existing:
+            logger.info(f"从 {existing} 字节处续传: {output_path}")
+        mode = "r+b" if existing else "wb"
+        with open(part_path, mode) as f:
+            f.truncate(existing)
+        _download_range(url, headers, part_path, existing, None)
+        # 服务端可能忽略 Range 从头返回，以实际文件大小为准
+        written = os.path.getsize(part_path)
+
+    if total is not None and written != total:
+        raise IOError(f"下载不完整: {written}/{total} 字节")
+    os.replace(part_path, output_path)
+    return output_path
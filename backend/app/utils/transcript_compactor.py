@@ -0,0 +1,121 @@
+import os
+import re
+from typing import List
+
+from app.models.transcriber_model import TranscriptResult, TranscriptSegment
+
+# 每个窗口的最大时长（秒）和最大字符数，超过即切分新窗口
+TRANSCRIPT_WINDOW_SECONDS = float(os.getenv("TRANSCRIPT_WINDOW_SECONDS", "30"))
+TRANSCRIPT_WINDOW_CHARS = int(os.getenv("TRANSCRIPT_WINDOW_CHARS", "200"))
+# 窗口达到该字符数后，遇到句末标点就提前收尾，尽量让窗口按句子切分
+TRANSCRIPT_WINDOW_MIN_CHARS = int(os.getenv("TRANSCRIPT_WINDOW_MIN_CHARS", "60"))
+# 滚动字幕判定为重复所需的最少重叠字符数，太短容易误删正常内容
+MIN_OVERLAP_CHARS = 4
+
+# 平台字幕的 raw.source 形如 bilibili_subtitle / youtube_subtitle
+SUBTITLE_SOURCE_SUFFIX = "_subtitle"
+
+SENTENCE_ENDINGS = "。！？!?.…"
+CJK_PUNCTUATION = "。！？，、；：…）》」』"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# 独立出现的语气词，连同其后的标点一起去掉
+_FILLER_RE = re.compile(r"(?:^|(?<=[\s，,。.！!？?]))(?:嗯+|呃+|唔+|um+|uh+|erm|uhm)(?:[\s，,]+|$)", re.IGNORECASE)
+# 连续重复的口头禅只保留一次：“那个那个” -> “那个”
+_REPEATED_CJK_RE = re.compile(r"(那个|这个|就是|然后|所以|对吧)(?:[\s，,]*\1)+")
+_REPEATED_WORD_RE = re.compile(r"\b([A-Za-z']+)(?:\s+\1\b)+", re.IGNORECASE)
+
+
+def is_platform_subtitle(transcript: TranscriptResult) -> bool:
+    """
+    是否为平台字幕。只有平台字幕需要压缩：滚动字幕的重复、碎片化分段都出自字幕格式本身；
+    语音识别结果已按句切分，去重规则可能误删说话人真实的重复内容
+    """
+    raw = transcript.raw if isinstance(transcript.raw, dict) else {}
+    return str(raw.get("source", "")).endswith(SUBTITLE_SOURCE_SUFFIX)
+
+
+def normalize_text(text: str) -> str:
+    """
+    规整单条字幕文本：合并空白、去掉独立语气词、折叠重复的口头禅
+    """
+    text = _WHITESPACE_RE.sub(" ", text or "").strip()
+    text = _FILLER_RE.sub("", text).strip()
+    text = _REPEATED_CJK_RE.sub(r"\1", text)
+    text = _REPEATED_WORD_RE.sub(r"\1", text)
+    return text.strip(" ，,")
+
+
+def strip_rolling_overlap(previous: str, text: str) -> str:
+    """
+    去掉滚动字幕中与上一条重复的部分。
+    自动字幕（如 YouTube json3）每一条都会重复上一条的尾部，只保留新增的文字
+    """
+    if not previous or not text:
+        return text
+    if text == previous or previous.endswith(text) and len(text) >= 2:
+        return ""
+    if text.startswith(previous):
+        return text[len(previous):].strip()
+
+    for size in range(min(len(previous), len(text)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].strip()
+    return text
+
+
+def _join(left: str, right: str) -> str:
+    if not left:
+        return right
+    if left[-1] in CJK_PUNCTUATION:
+        return left + right
+    return f"{left} {right}"
+
+
+def compact_segments(
+    segments: List[TranscriptSegment],
+    max_seconds: float = TRANSCRIPT_WINDOW_SECONDS,
+    max_chars: int = TRANSCRIPT_WINDOW_CHARS,
+    min_chars: int = TRANSCRIPT_WINDOW_MIN_CHARS,
+) -> List[TranscriptSegment]:
+    """
+    把转写结果压缩成按句子/段落聚合的窗口，每个窗口只保留一个起始时间戳。
+
+    :param segments: 原始转写分段（需按时间排序）
+    :param max_seconds: 单个窗口的最大时长
+    :param max_chars: 单个窗口的最大字符数
+    :param min_chars: 窗口达到该长度且以句末标点结尾时提前收尾
+    :return: 压缩后的分段列表
+    """
+    windows: List[TranscriptSegment] = []
+    current: TranscriptSegment | None = None
+    previous_raw = ""
+
+    for seg in segments:
+        raw = _WHITESPACE_RE.sub(" ", seg.text or "").strip()
+        text = normalize_text(strip_rolling_overlap(previous_raw, raw))
+        if raw:
+            previous_raw = raw
+        if not text:
+            # 被判定为重复或纯语气词的分段只延长当前窗口的结束时间
+            if current is not None:
+                current.end = max(current.end, seg.end)
+            continue
+
+        if current is not None:
+            fits = (
+                seg.end - current.start <= max_seconds
+                and len(current.text) + len(text) <= max_chars
+            )
+            sentence_done = len(current.text) >= min_chars and current.text[-1] in SENTENCE_ENDINGS
+            if fits and not sentence_done:
+                current.text = _join(current.text, text)
+                current.end = max(current.end, seg.end)
+                continue
+            windows.append(current)
+
+        current = TranscriptSegment(start=seg.start, end=seg.end, text=text)
+
+    if current is not None:
+        windows.append(current)
+    return windows
@@ -1,5 +1,7 @@
 import re
 from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
 import requests
 
 
@@ -20,7 +22,14 @@ def extract_video_id(url: str, platform: str) -> Optional[str]:
 
         # 匹配 BV号（如 BV1vc411b7Wa）
         match = re.search(r"BV([0-9A-Za-z]+)", url)
-        return f"BV{match.group(1)}" if match else None
+        if not match:
+            return None
+        video_id = f"BV{match.group(1)}"
+        # 分P视频（?p=2）与 yt-dlp 的 id 保持一致：BV1vc411b7Wa_p2；第 1P 与单P视频无法区分，沿用 BV 号
+        part = parse_qs(urlparse(url).query).get("p", [""])[0]
+        if part.isdigit() and int(part) > 1:
+            video_id = f"{video_id}_p{int(part)}"
+        return video_id
 
     elif platform == "youtube":
         # 匹配 v=xxxxx 或 youtu.be/xxxxx，ID 长度通常为 11
@@ -12,9 +12,12 @@ BACKEND_PORT= os.getenv("BACKEND_PORT", 8483)
 BACKEND_BASE_URL = f"{api_path}:{BACKEND_PORT}"
 
 from typing import Optional
-def generate_screenshot(video_path: str, output_dir: str, timestamp: int, index: int) -> str:
+def generate_screenshot(video_path: str, output_dir: str, timestamp: int, index: int,
+                        headers: Optional[dict] = None) -> str:
     """
     使用 ffmpeg 生成截图，返回生成图片路径
+    video_path 也可以是远程视频流直链，ffmpeg 会用 HTTP Range 直接跳到时间点，只拉取附近的数据；
+    headers 为访问直链所需的请求头
     """
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -22,9 +25,14 @@ def generate_screenshot(video_path: str, output_dir: str, timestamp: int, index:
     filename = f"screenshot_{index:03}_{uuid.uuid4()}.jpg"
     output_path = output_dir / filename
 
+    header_args = []
+    if headers:
+        header_args = ["-headers", "".join(f"{key}: {value}\r\n" for key, value in headers.items())]
+
     command = [
         "ffmpeg",
         "-ss", str(timestamp),
+        *header_args,
         "-i", str(video_path),
         "-frames:v", "1",
         "-q:v", "2",
@@ -42,6 +50,36 @@ def generate_screenshot(video_path: str, output_dir: str, timestamp: int, index:
 
 
 
+def extract_audio_from_video(video_path: str, output_dir: Optional[str] = None, stream_copy: bool = True) -> str:
+    """
+    从本地视频中提取音轨：优先直接复制 AAC 流为 m4a（不重新编码），失败时转码为 mp3，
+    用于已下载视频时代替第二次网络下载音频
+    :param video_path: 本地视频路径
+    :param output_dir: 输出目录，默认与视频相同
+    :param stream_copy: 是否尝试直接复制音频流；转写服务只接受 mp3 时传 False
+    :return: 音频文件路径
+    """
+    video_path = Path(video_path)
+    output_dir = Path(output_dir) if output_dir else video_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    attempts = [(output_dir / f"{video_path.stem}.mp3", ["-c:a", "libmp3lame", "-b:a", "64k"])]
+    if stream_copy:
+        attempts.insert(0, (output_dir / f"{video_path.stem}.m4a", ["-c:a", "copy"]))
+    last_error = ""
+    for audio_path, codec_args in attempts:
+        if audio_path.exists() and audio_path.stat().st_size > 0:
+            return str(audio_path)
+        command = ["ffmpeg", "-i", str(video_path), "-vn", *codec_args, "-y", str(audio_path),
+                   "-hide_banner", "-loglevel", "error"]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode == 0 and audio_path.exists():
+            return str(audio_path)
+        last_error = result.stderr
+        audio_path.unlink(missing_ok=True)
+    raise RuntimeError(f"从视频提取音频失败: {last_error}")
+
+
 def save_cover_to_static(local_cover_path: str, subfolder: Optional[str] = "cover") -> str:
     """
     将封面图片保存到 static 目录下，并返回前端可访问的路径
@@ -6,6 +6,7 @@ import subprocess
 import ffmpeg
 from PIL import Image, ImageDraw, ImageFont
 
+from app.models.image_model import ImageRef
 from app.utils.logger import get_logger
 from app.utils.path_helper import get_app_dir
 
@@ -123,7 +124,7 @@ class VideoReader:
                 base64_images.append(f"data:image/jpeg;base64,{encoded_string}")
         return base64_images
 
-    def run(self)->list[str]:
+    def run(self)->list[ImageRef]:
         logger.info("开始提取视频帧...")
         try:
             # 确保目录存在
@@ -152,9 +153,8 @@ class VideoReader:
                 out_path = self.concat_images(group, f"grid_{idx}")
                 image_paths.append(out_path)
 
-            logger.info("📤 开始编码图像...")
-            urls = self.encode_images_to_base64(image_paths)
-            return urls
+            # 只返回图片引用（路径、大小、摘要），base64 留到构造请求体时再生成
+            return [ImageRef.from_file(path) for path in image_paths]
         except Exception as e:
             logger.error(f"发生错误：{str(e)}")
             raise ValueError("视频处理失败")
@@ -9,6 +9,12 @@ SUPPORTED_PLATFORMS = {
     "kuaishou": "kuaishou"
 }
 
+# 批量生成时额外支持的合集 / 播放列表链接
+SUPPORTED_PLAYLISTS = {
+    "bilibili": r"(https?://)?space\.bilibili\.com/\d+/(channel|lists)/",
+    "youtube": r"(https?://)?(www\.|m\.)?youtube\.com/playlist\?list=[\w\-]+",
+}
+
 
 def is_supported_video_url(url: str) -> bool:
     parsed = urlparse(url)
@@ -27,6 +33,12 @@ def is_supported_video_url(url: str) -> bool:
     return False
 
 
+def is_supported_playlist_url(url: str) -> bool:
+    if is_supported_video_url(url):
+        return True
+    return any(re.match(pattern, url) for pattern in SUPPORTED_PLAYLISTS.values())
+
+
 class VideoRequest(BaseModel):
     url: AnyUrl
     platform: str
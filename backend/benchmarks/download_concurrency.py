@@ -0,0 +1,137 @@
+"""
+下载并发基准：本地起一个按连接限速、支持 Range 的 HTTP 服务，模拟按连接限速的 CDN，
+用项目里真实的下载代码测量不同连接数下的吞吐。在 backend 目录下运行：
+
+    python -m benchmarks.download_concurrency --size-mb 32 --rate-kb 2048 --connections 1 2 4 8
+
+--mode ytdlp（默认）：yt-dlp + download_concurrency_opts()，即 B 站 / YouTube 下载器使用的参数。
+    测试文件是单个直链文件（与 B 站 DASH 音视频轨相同），只有 aria2c 在 PATH 中时才会多连接下载，
+    否则各连接数的吞吐相同；
+--mode http：app.utils.http_download.download_file 的分段下载，即抖音 / 快手下载器使用的路径。
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_handler(payload: bytes, rate_bytes: int):
+    class ThrottledHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args):
+            return None
+
+        def _range(self):
+            match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range", ""))
+            if not match:
+                return 0, len(payload) - 1, False
+            start = int(match.group(1) or 0)
+            end = int(match.group(2)) if match.group(2) else len(payload) - 1
+            return start, min(end, len(payload) - 1), True
+
+        def _send_headers(self, start: int, end: int, partial: bool):
+            self.send_response(206 if partial else 200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if partial:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._send_headers(*self._range())
+
+        def do_GET(self):
+            start, end, partial = self._range()
+            self._send_headers(start, end, partial)
+            # 每个连接独立限速
+            began = time.monotonic()
+            sent = 0
+            while start + sent <= end:
+                chunk = payload[start + sent:min(start + sent + CHUNK_SIZE, end + 1)]
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                sent += len(chunk)
+                delay = sent / rate_bytes - (time.monotonic() - began)
+                if delay > 0:
+                    time.sleep(delay)
+
+    return ThrottledHandler
+
+
+def download_ytdlp(url: str, connections: int, output_dir: str) -> str:
+    import yt_dlp
+
+    from app.downloaders.base import download_concurrency_opts
+
+    output_path = os.path.join(output_dir, f"ytdlp_{connections}.mp4")
+    ydl_opts = {
+        "outtmpl": output_path,
+        "quiet": True,
+        "noprogress": True,
+        **download_concurrency_opts(connections=connections),
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        ydl.download([url])
+    return output_path
+
+
+def download_http(url: str, connections: int, output_dir: str) -> str:
+    from app.utils import http_download
+
+    output_path = os.path.join(output_dir, f"http_{connections}.mp4")
+    http_download.SEGMENTS = connections
+    http_download.PARALLEL_MIN_BYTES = 0
+    return http_download.download_file(url, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量不同连接数下的下载吞吐")
+    parser.add_argument("--size-mb", type=float, default=16, help="测试文件大小（MB）")
+    parser.add_argument("--rate-kb", type=float, default=1024, help="服务端单连接限速（KB/s）")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8], help="要测试的连接数")
+    parser.add_argument("--mode", choices=["ytdlp", "http"], default="ytdlp",
+                        help="ytdlp：B 站 / YouTube 下载参数；http：抖音 / 快手分段下载")
+    args = parser.parse_args()
+
+    if args.mode == "ytdlp":
+        from app.downloaders.base import YTDLP_EXTERNAL_DOWNLOADER
+        if YTDLP_EXTERNAL_DOWNLOADER != "aria2c" or not shutil.which("aria2c"):
+            print("提示：aria2c 未启用，yt-dlp 下载单文件只用一个连接，各连接数的吞吐应基本相同")
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    expected = hashlib.sha256(payload).hexdigest()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(payload, int(args.rate_kb * 1024)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    download = download_ytdlp if args.mode == "ytdlp" else download_http
+
+    print(f"模式 {args.mode}，文件 {args.size_mb} MB，单连接限速 {args.rate_kb} KB/s")
+    print(f"{'连接数':>6} {'耗时(s)':>10} {'吞吐(MB/s)':>12}")
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            for connections in args.connections:
+                began = time.perf_counter()
+                output_path = download(url, connections, output_dir)
+                elapsed = time.perf_counter() - began
+                with open(output_path, "rb") as f:
+                    if hashlib.sha256(f.read()).hexdigest() != expected:
+                        raise RuntimeError(f"{connections} 个连接下载的内容校验失败")
+                print(f"{connections:>6} {elapsed:>10.2f} {len(payload) / elapsed / 1024 / 1024:>12.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
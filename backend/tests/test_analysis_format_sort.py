@@ -0,0 +1,79 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+
+try:
+    import yt_dlp
+except ImportError:  # pragma: no cover - 依赖未安装时跳过
+    yt_dlp = None
+
+
+def _load_module():
+    note_enums_mod = types.ModuleType("app.enmus.note_enums")
+    note_enums_mod.DownloadQuality = type("DownloadQuality", (), {})
+    audio_model_mod = types.ModuleType("app.models.audio_model")
+    audio_model_mod.PlaylistInfo = object
+    notes_model_mod = types.ModuleType("app.models.notes_model")
+    notes_model_mod.AudioDownloadResult = object
+    transcriber_model_mod = types.ModuleType("app.models.transcriber_model")
+    transcriber_model_mod.TranscriptResult = object
+
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.enmus.note_enums", note_enums_mod)
+    sys.modules.setdefault("app.models.audio_model", audio_model_mod)
+    sys.modules.setdefault("app.models.notes_model", notes_model_mod)
+    sys.modules.setdefault("app.models.transcriber_model", transcriber_model_mod)
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    spec = importlib.util.spec_from_file_location("downloader_base", root / "app" / "downloaders" / "base.py")
+    if spec is None or spec.loader is None:
+        raise ImportError("downloader base module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+base = _load_module()
+
+
+def _format(format_id, height=None, vbr=None, abr=None, filesize=None):
+    video = height is not None
+    return {
+        "format_id": format_id, "url": f"http://example.com/{format_id}", "ext": "mp4" if video else "m4a",
+        "vcodec": "avc1" if video else "none", "acodec": "none" if video else "mp4a",
+        "height": height, "width": height and height * 16 // 9,
+        "vbr": vbr, "abr": abr, "tbr": vbr or abr, "filesize": filesize,
+    }
+
+
+FORMATS = [
+    _format("v1080", height=1080, vbr=3000, filesize=30_000_000),
+    _format("v720", height=720, vbr=1500, filesize=15_000_000),
+    _format("v720-small", height=720, vbr=800, filesize=8_000_000),
+    _format("v360", height=360, vbr=300, filesize=3_000_000),
+    _format("a64", abr=64, filesize=600_000),
+    _format("a192", abr=192, filesize=1_800_000),
+]
+
+
+@unittest.skipIf(yt_dlp is None, "yt-dlp 未安装")
+class TestAnalysisFormatSort(unittest.TestCase):
+    def _select(self, fmt):
+        ydl = yt_dlp.YoutubeDL({"format": fmt, "format_sort": base.analysis_format_sort(),
+                                "quiet": True, "simulate": True})
+        info = {"id": "x", "title": "t", "extractor": "t", "extractor_key": "t",
+                "webpage_url": "http://example.com/x", "formats": [dict(f) for f in FORMATS]}
+        result = ydl.process_ie_result(info, download=False)
+        return [f["format_id"] for f in result.get("requested_formats") or [result]]
+
+    def test_video_prefers_capped_resolution_with_lowest_bitrate(self):
+        self.assertEqual(self._select("bv*[ext=mp4]+ba[ext=m4a]/bv*+ba/best")[0], "v720-small")
+
+    def test_audio_track_stays_best_for_transcription(self):
+        self.assertEqual(self._select("bv*[ext=mp4]+ba[ext=m4a]/bv*+ba/best")[1], "a192")
+
+
+if __name__ == "__main__":
+    unittest.main()
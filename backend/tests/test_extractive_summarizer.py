@@ -0,0 +1,81 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+from dataclasses import dataclass
+
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+MODULE_PATH = ROOT / "app" / "utils" / "extractive_summarizer.py"
+
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    end: float
+    text: str
+
+
+def _load_module():
+    transcriber_model = types.ModuleType("app.models.transcriber_model")
+    transcriber_model.TranscriptSegment = TranscriptSegment
+    sys.modules["app.models.transcriber_model"] = transcriber_model
+
+    spec = importlib.util.spec_from_file_location("extractive_summarizer", MODULE_PATH)
+    if spec is None or spec.loader is None:
+        raise ImportError("extractive_summarizer module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+extractive_summarizer = _load_module()
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+class TestExtractiveSummarizer(unittest.TestCase):
+    def test_returns_segments_unchanged_within_budget(self):
+        segments = [TranscriptSegment(0, 5, "short text"), TranscriptSegment(5, 10, "more text")]
+
+        result = extractive_summarizer.extract_key_segments(segments, 100, _word_count)
+
+        self.assertEqual(result, segments)
+
+    def test_tokenize_uses_cjk_bigrams_and_drops_stopwords(self):
+        terms = extractive_summarizer.tokenize("The Python 装饰器")
+
+        self.assertEqual(terms, ["python", "装饰", "饰器"])
+
+    def test_keeps_on_topic_segments_under_budget(self):
+        segments = [
+            TranscriptSegment(0, 10, "python decorators wrap functions"),
+            TranscriptSegment(10, 20, "decorators in python wrap other functions"),
+            TranscriptSegment(20, 30, "please subscribe and like"),
+            TranscriptSegment(30, 40, "python functions can be wrapped by decorators"),
+        ]
+
+        result = extractive_summarizer.extract_key_segments(segments, 16, _word_count, window_seconds=1000)
+
+        self.assertNotIn(segments[2], result)
+        self.assertLessEqual(sum(_word_count(s.text) + 1 for s in result), 16)
+        self.assertEqual(result, sorted(result, key=lambda s: s.start))
+
+    def test_every_time_window_gets_a_share_of_the_budget(self):
+        segments = []
+        for window in range(3):
+            for i in range(5):
+                start = window * 300 + i * 10
+                segments.append(TranscriptSegment(start, start + 10, f"topic{window} detail{i} topic{window} words here"))
+
+        result = extractive_summarizer.extract_key_segments(segments, 30, _word_count)
+
+        windows = {int(s.start // 300) for s in result}
+        self.assertEqual(windows, {0, 1, 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
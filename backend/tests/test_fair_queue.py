@@ -0,0 +1,57 @@
+import importlib.util
+import pathlib
+import threading
+import unittest
+
+
+def _load_module():
+    root = pathlib.Path(__file__).resolve().parents[1]
+    spec = importlib.util.spec_from_file_location("fair_queue", root / "app" / "services" / "fair_queue.py")
+    if spec is None or spec.loader is None:
+        raise ImportError("fair_queue module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+fair_queue = _load_module()
+
+
+class TestFairQueue(unittest.TestCase):
+    def test_users_take_turns_within_a_priority(self):
+        queue = fair_queue.FairQueue()
+        for i in range(3):
+            queue.put(f"a{i}", user="alice")
+        queue.put("b0", user="bob")
+        queue.put("c0", user="carol")
+
+        taken = [queue.get_nowait() for _ in range(len(queue))]
+
+        self.assertEqual(taken, ["a0", "b0", "c0", "a1", "a2"])
+
+    def test_higher_priority_goes_first(self):
+        queue = fair_queue.FairQueue()
+        queue.put("bulk", user="alice", priority=0)
+        queue.put("urgent", user="bob", priority=10)
+
+        self.assertEqual(queue.get_nowait(), "urgent")
+        self.assertEqual(queue.get_nowait(), "bulk")
+        self.assertEqual(len(queue), 0)
+
+    def test_get_blocks_until_put(self):
+        queue = fair_queue.FairQueue()
+        timer = threading.Timer(0.05, queue.put, args=("late",))
+        timer.start()
+
+        self.assertEqual(queue.get(timeout=2), "late")
+
+    def test_get_times_out_when_empty(self):
+        with self.assertRaises(TimeoutError):
+            fair_queue.FairQueue().get(timeout=0.01)
+
+        with self.assertRaises(IndexError):
+            fair_queue.FairQueue().get_nowait()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+import importlib.util
+import os
+import pathlib
+import re
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+try:
+    import requests  # noqa: F401
+except ImportError:  # pragma: no cover - 依赖未安装时跳过
+    requests = None
+
+
+def _load_module():
+    logger_mod = types.ModuleType("app.utils.logger")
+
+    class _Logger:
+        def info(self, *_args, **_kwargs):
+            return None
+
+        def warning(self, *_args, **_kwargs):
+            return None
+
+    logger_mod.get_logger = lambda _name: _Logger()
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.utils", types.ModuleType("app.utils"))
+    sys.modules["app.utils.logger"] = logger_mod
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    spec = importlib.util.spec_from_file_location("http_download", root / "app" / "utils" / "http_download.py")
+    if spec is None or spec.loader is None:
+        raise ImportError("http_download module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+http_download = _load_module() if requests else None
+
+PAYLOAD = os.urandom(256 * 1024 + 123)
+
+
+class _Server:
+    """
+    本地 Range 服务：
+    - ignore_range: 所有请求都返回 200 完整内容
+    - ignore_range_after_probe: 只对 1 字节探测请求返回 206
+    - drop_after: 第一次完整 GET 只发送这么多字节就断开
+    """
+
+    def __init__(self):
+        self.ignore_range = False
+        self.ignore_range_after_probe = False
+        self.drop_after = None
+        self.ranges = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                return None
+
+            def do_GET(self):
+                header = self.headers.get("Range")
+                with server.lock:
+                    server.ranges.append(header)
+                match = re.match(r"bytes=(\d+)-(\d*)", header or "")
+                honor = match and not server.ignore_range and (
+                    not server.ignore_range_after_probe or header == "bytes=0-0")
+                if honor:
+                    start = int(match.group(1))
+                    end = int(match.group(2)) if match.group(2) else len(PAYLOAD) - 1
+                    body = PAYLOAD[start:end + 1]
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+                else:
+                    body = PAYLOAD
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                with server.lock:
+                    drop, server.drop_after = (server.drop_after, None) if not honor else (None, server.drop_after)
+                if drop is not None:
+                    self.wfile.write(body[:drop])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/file.bin"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@unittest.skipIf(requests is None, "requests 未安装")
+class TestHttpDownload(unittest.TestCase):
+    def setUp(self):
+        self.server = _Server()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "file.bin")
+        patches = [
+            patch.object(http_download, "SEGMENTS", 4),
+            patch.object(http_download, "PARALLEL_MIN_BYTES", 1 << 40),
+            patch.object(http_download, "CHUNK_SIZE", 16 * 1024),
+            patch.object(http_download.time, "sleep", lambda _s: None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.server.close()
+        self.tmp.cleanup()
+
+    def _read_output(self):
+        with open(self.output, "rb") as f:
+            return f.read()
+
+    def test_resumes_from_existing_part_file(self):
+        with open(self.output + ".part", "wb") as f:
+            f.write(PAYLOAD[:100000])
+
+        http_download.download_file(self.server.url, self.output)
+
+        self.assertEqual(self._read_output(), PAYLOAD)
+        self.assertIn("bytes=100000-", self.server.ranges)
+        self.assertFalse(os.path.exists(self.output + ".part"))
+
+    def test_restarts_when_server_ignores_range(self):
+        self.server.ignore_range = True
+        with open(self.output + ".part", "wb") as f:
+            f.write(b"x" * 5000)
+
+        http_download.download_file(self.server.url, self.output)
+
+        self.assertEqual(self._read_output(), PAYLOAD)
+
+    def test_retry_resumes_after_dropped_connection(self):
+        self.server.drop_after = 50000
+
+        http_download.download_file(self.server.url, self.output)
+
+        self.assertEqual(self._read_output(), PAYLOAD)
+        # 从已写入的完整块处续传，而不是从头重新下载
+        resumed = [int(r[6:-1]) for r in self.server.ranges if r and r.endswith("-")]
+        self.assertEqual(len(resumed), 1)
+        self.assertTrue(0 < resumed[0] <= 50000)
+
+    def test_parallel_segments(self):
+        with patch.object(http_download, "PARALLEL_MIN_BYTES", 1024):
+            http_download.download_file(self.server.url, self.output)
+
+        self.assertEqual(self._read_output(), PAYLOAD)
+        segment_ranges = [r for r in self.server.ranges if r and r != "bytes=0-0"]
+        self.assertEqual(len(segment_ranges), 4)
+        self.assertTrue(all(re.match(r"bytes=\d+-\d+$", r) for r in segment_ranges))
+
+    def test_segments_fall_back_when_ranges_are_ignored(self):
+        self.server.ignore_range_after_probe = True
+
+        with patch.object(http_download, "PARALLEL_MIN_BYTES", 1024):
+            http_download.download_file(self.server.url, self.output)
+
+        self.assertEqual(self._read_output(), PAYLOAD)
+        # 每个分段只请求一次，Range 不被支持时不会白白重试
+        self.assertLessEqual(len([r for r in self.server.ranges if r and r != "bytes=0-0"]), 4)
+
+    def test_session_is_shared_across_threads(self):
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(http_download.get_session())) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len({id(s) for s in sessions}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
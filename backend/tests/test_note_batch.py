@@ -0,0 +1,220 @@
+import importlib.util
+import pathlib
+import sys
+import threading
+import time
+import types
+import unittest
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+@dataclass
+class TranscriptResult:
+    language: Optional[str]
+    full_text: str
+    segments: List
+
+
+@dataclass
+class NoteResult:
+    markdown: str
+    transcript: TranscriptResult
+    audio_meta: object
+
+
+class NoteError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _FakeDownloader:
+    def __init__(self, playlist=None):
+        self.playlist = playlist
+
+    def expand_playlist(self, _video_url):
+        return self.playlist
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"{name} module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_module():
+    logger_mod = types.ModuleType("app.utils.logger")
+
+    class _Logger:
+        def info(self, *_args, **_kwargs):
+            return None
+
+        def warning(self, *_args, **_kwargs):
+            return None
+
+        def error(self, *_args, **_kwargs):
+            return None
+
+    logger_mod.get_logger = lambda _name: _Logger()
+
+    exception_enum_mod = types.ModuleType("app.enmus.exception")
+    exception_enum_mod.NoteErrorEnum = types.SimpleNamespace(
+        PLATFORM_NOT_SUPPORTED=types.SimpleNamespace(code=300101, message="选择的平台不受支持")
+    )
+    note_exception_mod = types.ModuleType("app.exceptions.note")
+    note_exception_mod.NoteError = NoteError
+    notes_model_mod = types.ModuleType("app.models.notes_model")
+    notes_model_mod.NoteResult = NoteResult
+    transcriber_model_mod = types.ModuleType("app.models.transcriber_model")
+    transcriber_model_mod.TranscriptResult = TranscriptResult
+    constant_mod = types.ModuleType("app.services.constant")
+    constant_mod.SUPPORT_PLATFORM_MAP = {}
+
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules["app.utils.logger"] = logger_mod
+    sys.modules["app.enmus.exception"] = exception_enum_mod
+    sys.modules["app.exceptions.note"] = note_exception_mod
+    sys.modules["app.models.notes_model"] = notes_model_mod
+    sys.modules["app.models.transcriber_model"] = transcriber_model_mod
+    sys.modules["app.services.constant"] = constant_mod
+    sys.modules["app.models.audio_model"] = _load("app.models.audio_model", ROOT / "app" / "models" / "audio_model.py")
+    sys.modules["app.services.fair_queue"] = _load("app.services.fair_queue", ROOT / "app" / "services" / "fair_queue.py")
+
+    return _load("note_batch", ROOT / "app" / "services" / "note_batch.py")
+
+
+note_batch = _load_module()
+audio_model = sys.modules["app.models.audio_model"]
+PLATFORMS = note_batch.SUPPORT_PLATFORM_MAP
+
+
+def _child(index, task_id=None):
+    entry = audio_model.PlaylistEntry(url=f"https://www.bilibili.com/video/BV1xx?p={index}",
+                                      title=f"P{index}", index=index, duration=60 * index)
+    return note_batch.BatchChild(task_id=task_id or f"task-{index}", entry=entry)
+
+
+def _note(title, duration=90.0):
+    meta = audio_model.AudioDownloadResult(file_path="", title=title, duration=duration, cover_url="cover.jpg",
+                                           platform="bilibili", video_id="BV1xx", raw_info={})
+    return NoteResult(markdown="# note", transcript=TranscriptResult(None, "", []), audio_meta=meta)
+
+
+class TestNoteBatch(unittest.TestCase):
+    def setUp(self):
+        PLATFORMS.clear()
+
+    def test_single_video_expands_to_itself(self):
+        PLATFORMS["bilibili"] = _FakeDownloader(None)
+
+        playlist = note_batch.expand_playlist("https://www.bilibili.com/video/BV1xx", "bilibili")
+
+        self.assertEqual([e.url for e in playlist.entries], ["https://www.bilibili.com/video/BV1xx"])
+
+    def test_long_playlist_is_truncated(self):
+        entries = [_child(i).entry for i in range(1, note_batch.NOTE_BATCH_MAX_ITEMS + 5)]
+        PLATFORMS["youtube"] = _FakeDownloader(audio_model.PlaylistInfo(title="course", entries=entries))
+
+        playlist = note_batch.expand_playlist("https://www.youtube.com/playlist?list=PL1", "youtube")
+
+        self.assertEqual(len(playlist.entries), note_batch.NOTE_BATCH_MAX_ITEMS)
+
+    def test_unsupported_platform_raises(self):
+        with self.assertRaises(NoteError):
+            note_batch.expand_playlist("https://example.com/v", "unknown")
+
+    def test_children_run_with_bounded_parallelism(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+        progress = []
+
+        def run_child(child):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            if child.entry.index == 3:
+                raise RuntimeError("下载失败")
+            return _note(child.entry.title)
+
+        children = note_batch.run_children([_child(i) for i in range(1, 7)], run_child, max_workers=2,
+                                           on_progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(progress[-1], (6, 6))
+        self.assertIsNone(children[2].note)
+        self.assertEqual(children[2].error, "下载失败")
+        self.assertEqual(sum(1 for c in children if c.note), 5)
+
+    def test_index_note_links_children_in_order(self):
+        ok, failed = _child(1, "task-a"), _child(2, "task-b")
+        ok.note = _note("第一集 | 入门", duration=3725)
+        failed.error = "笔记生成失败"
+
+        index = note_batch.build_index_note("batch-1", "Python 课程", "bilibili", [ok, failed])
+
+        rows = [line for line in index.markdown.splitlines() if line.startswith("| 1") or line.startswith("| 2")]
+        self.assertIn("[第一集 \\| 入门](https://www.bilibili.com/video/BV1xx?p=1)", rows[0])
+        self.assertIn("1:02:05", rows[0])
+        self.assertIn("`task-a`", rows[0])
+        self.assertIn("失败：笔记生成失败", rows[1])
+        self.assertIn("共 2 个视频，成功 1 个，失败 1 个", index.markdown)
+        self.assertEqual(index.audio_meta.video_id, "batch-1")
+        self.assertEqual(index.audio_meta.duration, 3725 + 120)
+        self.assertEqual([c["task_id"] for c in index.audio_meta.raw_info["children"]], ["task-a", "task-b"])
+
+    def test_dedupe_maps_duplicates_to_first_occurrence(self):
+        unique, mapping = note_batch.dedupe_items(["a", "b", "a", "c", "b"], key=lambda item: item)
+
+        self.assertEqual(unique, ["a", "b", "c"])
+        self.assertEqual(mapping, [0, 1, 0, 2, 1])
+
+    def test_dispatcher_runs_jobs_fairly_and_reports_failures(self):
+        order = []
+        failed = []
+        gate = threading.Event()
+        started = threading.Event()
+        done = threading.Semaphore(0)
+
+        def job(user, i, fail=False):
+            def _run():
+                started.set()
+                gate.wait(1)
+                order.append((user, i))
+                done.release()
+                if fail:
+                    raise RuntimeError("boom")
+            return note_batch.BatchJob(batch_id="b", task_id=f"{user}-{i}", run=_run)
+
+        def on_error(failed_job, exc):
+            failed.append((failed_job.task_id, str(exc)))
+            done.release()
+
+        dispatcher = note_batch.BatchDispatcher(workers=1, on_error=on_error)
+        # 先占住唯一的工作线程，再按用户提交，保证后续顺序只由队列决定
+        dispatcher.submit([job("warmup", 0)], user="warmup")
+        self.assertTrue(started.wait(2))
+        dispatcher.submit([job("alice", i) for i in range(3)], user="alice")
+        dispatcher.submit([job("bob", 0, fail=True)], user="bob")
+        dispatcher.submit([job("vip", 0)], user="carol", priority=5)
+        gate.set()
+        for _ in range(7):
+            self.assertTrue(done.acquire(timeout=2))
+
+        self.assertEqual(order, [("warmup", 0), ("vip", 0), ("alice", 0), ("bob", 0), ("alice", 1), ("alice", 2)])
+        self.assertEqual(failed, [("bob-0", "boom")])
+
+
+if __name__ == "__main__":
+    unittest.main()
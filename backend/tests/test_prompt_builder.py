@@ -0,0 +1,56 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, ROOT / "app" / "gpt" / filename)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"{name} module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_prompt_builder():
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.gpt", types.ModuleType("app.gpt"))
+    prompt = _load("app.gpt.prompt", "prompt.py")
+    sys.modules["app.gpt.prompt"] = prompt
+    return prompt, _load("prompt_builder", "prompt_builder.py")
+
+
+prompt, prompt_builder = _load_prompt_builder()
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_prefix_cache_chunks_share_system_prompt(self):
+        kwargs = dict(title="标题", tags="tag", _format=["toc"], style="minimal", extras="额外")
+
+        system_a, user_a = prompt_builder.generate_prompt_parts(segment_text="00:00 - 第一段", **kwargs)
+        system_b, user_b = prompt_builder.generate_prompt_parts(segment_text="01:00 - 第二段", **kwargs)
+
+        self.assertEqual(system_a, system_b)
+        self.assertNotIn("第一段", system_a)
+        self.assertTrue(system_a.startswith(prompt.NOTE_INTRO_PROMPT))
+        self.assertIn("标题", system_a)
+        self.assertTrue(user_a.rstrip().endswith("00:00 - 第一段\n---"))
+        self.assertIn("第二段", user_b)
+
+    def test_both_layouts_share_the_same_rules(self):
+        legacy = prompt_builder.generate_base_prompt(title="标题", segment_text="00:00 - 内容", tags="tag")
+        system, user = prompt_builder.generate_prompt_parts(title="标题", segment_text="00:00 - 内容", tags="tag")
+
+        for part in (prompt.OUTPUT_RULES_PROMPT, prompt.NOTE_RULES_PROMPT):
+            self.assertIn(part, legacy)
+            self.assertIn(part, system)
+        self.assertIn("00:00 - 内容", legacy)
+        self.assertIn("00:00 - 内容", user)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+
+
+def _load_rate_limiter_module():
+    logger_mod = types.ModuleType("app.utils.logger")
+    logger_mod.get_logger = lambda name: __import__("logging").getLogger(name)
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.utils", types.ModuleType("app.utils"))
+    sys.modules["app.utils.logger"] = logger_mod
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    module_path = root / "app" / "gpt" / "rate_limiter.py"
+    spec = importlib.util.spec_from_file_location("rate_limiter", module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError("rate_limiter module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+rate_limiter = _load_rate_limiter_module()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response:
+    def __init__(self, headers, status_code=429):
+        self.headers = headers
+        self.status_code = status_code
+
+
+class _HTTPError(Exception):
+    def __init__(self, headers, status_code=429):
+        super().__init__("rate limited")
+        self.response = _Response(headers, status_code)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_token_bucket_returns_wait_once_quota_is_used(self):
+        clock = _Clock()
+        bucket = rate_limiter.TokenBucket(60, clock)
+
+        waits = [bucket.reserve() for _ in range(61)]
+
+        self.assertEqual(waits[:60], [0.0] * 60)
+        self.assertAlmostEqual(waits[60], 1.0)
+        clock.now += 2
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_rate_change_does_not_refill_bucket(self):
+        clock = _Clock()
+        bucket = rate_limiter.TokenBucket(60, clock)
+        for _ in range(60):
+            bucket.reserve()
+
+        bucket.set_rate(120)
+
+        self.assertGreater(bucket.reserve(), 0)
+
+    def test_limiter_keeps_rates_when_none_passed(self):
+        rate_limiter._limiters.clear()
+        limiter = rate_limiter.get_provider_limiter("provider-a", rpm=60, tpm=0)
+
+        rate_limiter.get_provider_limiter("provider-a")
+
+        self.assertEqual(limiter.requests.per_minute, 60)
+        self.assertEqual(rate_limiter.get_provider_limiter("provider-b").requests.per_minute, 0)
+
+    def test_zero_rate_means_unlimited(self):
+        bucket = rate_limiter.TokenBucket(0, _Clock())
+        self.assertEqual(bucket.reserve(10 ** 6), 0.0)
+
+    def test_retry_after_blocks_following_reservations(self):
+        clock = _Clock()
+        limiter = rate_limiter.ProviderLimiter("p", clock=clock)
+
+        limiter.record_failure(retry_after=5)
+
+        self.assertAlmostEqual(limiter.reserve(), 5.0)
+        clock.now += 5
+        self.assertEqual(limiter.reserve(), 0.0)
+
+    def test_circuit_opens_then_half_opens_for_one_probe(self):
+        clock = _Clock()
+        breaker = rate_limiter.CircuitBreaker(failure_threshold=2, recovery_seconds=10, clock=clock)
+        limiter = rate_limiter.ProviderLimiter("p", clock=clock)
+        limiter.breaker = breaker
+
+        limiter.record_failure()
+        limiter.record_failure()
+        with self.assertRaises(rate_limiter.CircuitOpenError):
+            limiter.reserve()
+
+        clock.now += 10
+        self.assertEqual(limiter.reserve(), 0.0)
+        with self.assertRaises(rate_limiter.CircuitOpenError):
+            limiter.reserve()
+
+        limiter.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_released_or_stale_probe_lets_next_request_probe(self):
+        clock = _Clock()
+        breaker = rate_limiter.CircuitBreaker(failure_threshold=1, recovery_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+
+        self.assertEqual(breaker.allow(), 0.0)
+        self.assertGreater(breaker.allow(), 0)
+        breaker.release_probe()
+        self.assertEqual(breaker.allow(), 0.0)
+
+        # 探测请求没有任何结果时，超过冷却时间也会放行新的探测
+        clock.now += 10
+        self.assertEqual(breaker.allow(), 0.0)
+
+    def test_parse_retry_after_headers(self):
+        self.assertEqual(rate_limiter.get_retry_after(_HTTPError({"retry-after": "3"})), 3.0)
+        self.assertEqual(rate_limiter.get_retry_after(_HTTPError({"retry-after-ms": "1500"})), 1.5)
+        self.assertIsNone(rate_limiter.get_retry_after(_HTTPError({})))
+        self.assertEqual(rate_limiter.get_status_code(_HTTPError({}, 503)), 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
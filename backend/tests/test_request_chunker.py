@@ -92,6 +92,49 @@ class TestRequestChunker(unittest.TestCase):
         groups = chunker.group_texts_by_budget(["aaaaa", "bbbbb", "ccccc"], build_text_messages)
         self.assertEqual(groups, [["aaaaa", "bbbbb"], ["ccccc"]])
 
+    def test_chunk_respects_token_budget(self):
+        segments = [DummySeg(i, i + 1, "w" * 8) for i in range(6)]
+        chunker = RequestChunker(
+            build_messages,
+            max_bytes=10_000,
+            size_estimator=size_estimator,
+            token_budget=5,
+            token_estimator=lambda text: len(text) // 4,
+        )
+        chunks = chunker.chunk(segments, [])
+        self.assertEqual([len(c.segments) for c in chunks], [2, 2, 2])
+
+    def test_chunk_planning_is_linear_in_segment_count(self):
+        calls = {"count": 0}
+
+        def counting_builder(segments, image_urls, **kwargs):
+            calls["count"] += 1
+            return build_messages(segments, image_urls, **kwargs)
+
+        segments = [DummySeg(i, i + 1, "abc") for i in range(200)]
+        chunker = RequestChunker(counting_builder, max_bytes=30, size_estimator=size_estimator)
+        chunks = chunker.chunk(segments, [])
+
+        self.assertEqual(len(chunks), 20)
+        self.assertLess(calls["count"], 3 * len(segments))
+
+    def test_segment_formatter_avoids_rebuilding_prompt_per_segment(self):
+        calls = {"count": 0}
+
+        def line_builder(segments, image_urls, **_):
+            calls["count"] += 1
+            text = "header\n" + "\n".join(s.text for s in segments)
+            return [{"role": "user", "content": [{"type": "text", "text": text}]}]
+
+        segments = [DummySeg(i, i + 1, f"第{i}句 \"quoted\"") for i in range(200)]
+        chunker = RequestChunker(line_builder, max_bytes=400, segment_formatter=lambda seg: seg.text)
+        chunks = chunker.chunk(segments, [])
+
+        self.assertEqual([seg.text for c in chunks for seg in c.segments], [seg.text for seg in segments])
+        self.assertTrue(all(chunker._fits(c.segments, []) for c in chunks))
+        # 只有固定开销和每个分片的复核会调用 message_builder
+        self.assertLessEqual(calls["count"], 2 * len(chunks) + 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,91 @@
+import importlib.util
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import types
+import unittest
+
+
+def _load_response_cache_module():
+    logger_mod = types.ModuleType("app.utils.logger")
+    logger_mod.get_logger = lambda name: __import__("logging").getLogger(name)
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.utils", types.ModuleType("app.utils"))
+    sys.modules["app.utils.logger"] = logger_mod
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    module_path = root / "app" / "gpt" / "response_cache.py"
+    spec = importlib.util.spec_from_file_location("response_cache", module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError("response_cache module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+ResponseCache = _load_response_cache_module().ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_key_depends_on_model_temperature_and_messages(self):
+        messages = [{"role": "user", "content": "hi"}]
+        key = ResponseCache.make_key("m", 0.7, messages)
+
+        self.assertEqual(key, ResponseCache.make_key("m", 0.7, [{"content": "hi", "role": "user"}]))
+        self.assertNotEqual(key, ResponseCache.make_key("m2", 0.7, messages))
+        self.assertNotEqual(key, ResponseCache.make_key("m", 0.2, messages))
+
+    def test_image_refs_are_keyed_by_digest(self):
+        def with_image(path, digest):
+            image = types.SimpleNamespace(path=path, digest=digest)
+            return [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": image}}]}]
+
+        key = ResponseCache.make_key("m", 0.7, with_image("a.jpg", "d1"))
+
+        self.assertEqual(key, ResponseCache.make_key("m", 0.7, with_image("b.jpg", "d1")))
+        self.assertNotEqual(key, ResponseCache.make_key("m", 0.7, with_image("a.jpg", "d2")))
+
+    def test_hit_and_miss_are_counted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResponseCache(tmp_dir, max_bytes=1 << 20, max_entries=10, ttl_seconds=60)
+
+            self.assertIsNone(cache.get("k1"))
+            cache.set("k1", "text")
+            self.assertEqual(cache.get("k1"), "text")
+
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_expired_entry_is_dropped(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResponseCache(tmp_dir, max_bytes=1 << 20, max_entries=10, ttl_seconds=60)
+            cache.set("k1", "text")
+            path = cache._path("k1")
+            path.write_text(json.dumps({"created_at": time.time() - 120, "text": "text"}), encoding="utf-8")
+
+            self.assertIsNone(cache.get("k1"))
+            self.assertFalse(path.exists())
+
+    def test_least_recently_used_entry_is_evicted(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResponseCache(tmp_dir, max_bytes=1 << 20, max_entries=2, ttl_seconds=0)
+            cache.set("k1", "one")
+            cache.set("k2", "two")
+            now = time.time()
+            os.utime(cache._path("k1"), (now - 20, now - 20))
+            os.utime(cache._path("k2"), (now - 10, now - 10))
+            # 读取 k1 会刷新它的访问时间，淘汰的应是 k2
+            cache.get("k1")
+
+            cache.set("k3", "three")
+
+            self.assertEqual(cache.get("k1"), "one")
+            self.assertIsNone(cache.get("k2"))
+            self.assertEqual(cache.get("k3"), "three")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import importlib.util
+import pathlib
+import sys
+import threading
+import time
+import unittest
+
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"{name} module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+sys.modules["app.services.fair_queue"] = _load("app.services.fair_queue", ROOT / "app" / "services" / "fair_queue.py")
+task_scheduler = _load("task_scheduler", ROOT / "app" / "services" / "task_scheduler.py")
+TaskScheduler = task_scheduler.TaskScheduler
+
+
+def _measure_peak(scheduler, count):
+    state_lock = threading.Lock()
+    state = {"active": 0, "peak_active": 0}
+
+    def critical_work():
+        with state_lock:
+            state["active"] += 1
+            state["peak_active"] = max(state["peak_active"], state["active"])
+        time.sleep(0.05)
+        with state_lock:
+            state["active"] -= 1
+
+    threads = [threading.Thread(target=lambda: scheduler.run(critical_work)) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return state["peak_active"]
+
+
+class TestTaskScheduler(unittest.TestCase):
+    def _run_blocked(self, scheduler, submissions):
+        """
+        先用一个任务占住唯一的执行位，再依次提交 submissions，放行后返回实际执行顺序
+        """
+        order = []
+        gate = threading.Event()
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            gate.wait(2)
+
+        threads = [threading.Thread(target=scheduler.run, args=(blocker,))]
+        threads[0].start()
+        self.assertTrue(started.wait(2))
+
+        for name, kwargs in submissions:
+            thread = threading.Thread(target=scheduler.run, args=(order.append, name), kwargs=kwargs)
+            thread.start()
+            threads.append(thread)
+            # 等到该任务进入队列，保证提交顺序确定
+            deadline = time.monotonic() + 2
+            while sum(scheduler.pending().values()) < len(threads) - 1 and time.monotonic() < deadline:
+                time.sleep(0.001)
+
+        gate.set()
+        for t in threads:
+            t.join(2)
+        return order
+
+    def test_runs_tasks_one_by_one_by_default(self):
+        self.assertEqual(_measure_peak(TaskScheduler(), 2), 1)
+
+    def test_allows_configured_concurrency(self):
+        self.assertEqual(_measure_peak(TaskScheduler(max_workers=2), 4), 2)
+
+    def test_short_interactive_tasks_use_fast_lane(self):
+        scheduler = TaskScheduler(fast_lane_max_seconds=600)
+
+        self.assertEqual(scheduler.lane_for("interactive", 120), "fast")
+        self.assertEqual(scheduler.lane_for("interactive", 3600), "interactive")
+        self.assertEqual(scheduler.lane_for("interactive", None), "interactive")
+        self.assertEqual(scheduler.lane_for("batch", 120), "batch")
+
+    def test_classify_falls_back_to_interactive_when_probe_is_slow_or_fails(self):
+        scheduler = TaskScheduler(fast_lane_max_seconds=600)
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def broken_probe():
+            raise RuntimeError("解析失败")
+
+        self.assertEqual(scheduler.classify("interactive", lambda: 120.0), ("fast", 120.0))
+        self.assertEqual(scheduler.classify("interactive", lambda: release.wait(2), timeout=0.05),
+                         ("interactive", None))
+        self.assertEqual(scheduler.classify("interactive", broken_probe), ("interactive", None))
+
+    def test_classify_skips_probe_for_batch_tasks(self):
+        scheduler = TaskScheduler(fast_lane_max_seconds=600)
+        calls = []
+
+        self.assertEqual(scheduler.classify("batch", lambda: calls.append(1) or 60.0), ("batch", None))
+        self.assertEqual(calls, [])
+
+    def test_interactive_request_is_not_starved_by_a_bulk_batch(self):
+        scheduler = TaskScheduler(weights={"fast": 4, "interactive": 2, "batch": 1})
+        submissions = [(f"bulk{i}", {"lane": "batch", "user": "shop"}) for i in range(5)]
+        submissions.append(("click", {"lane": "interactive", "user": "alice"}))
+        submissions.append(("short", {"lane": "interactive", "user": "bob", "duration": 60}))
+
+        order = self._run_blocked(scheduler, submissions)
+
+        # 批量任务先提交，但短视频和交互任务仍排在前面，最多让出一个位置给批量通道
+        self.assertEqual(order[0], "short")
+        self.assertLessEqual(order.index("click"), 2)
+        self.assertEqual([name for name in order if name.startswith("bulk")], [f"bulk{i}" for i in range(5)])
+
+    def test_users_share_the_batch_lane(self):
+        scheduler = TaskScheduler()
+        submissions = [(f"a{i}", {"lane": "batch", "user": "alice"}) for i in range(3)]
+        submissions.append(("b0", {"lane": "batch", "user": "bob"}))
+
+        order = self._run_blocked(scheduler, submissions)
+
+        self.assertEqual(order, ["a0", "b0", "a1", "a2"])
+
+    def test_lane_weights_share_capacity_when_all_lanes_are_busy(self):
+        scheduler = TaskScheduler(weights={"fast": 1, "interactive": 1, "batch": 2})
+        submissions = [(f"i{i}", {"lane": "interactive", "user": "alice"}) for i in range(3)]
+        submissions += [(f"b{i}", {"lane": "batch", "user": "shop"}) for i in range(6)]
+
+        order = self._run_blocked(scheduler, submissions)
+
+        first_round = order[:6]
+        self.assertEqual(sum(name.startswith("b") for name in first_round), 4)
+        self.assertEqual(sum(name.startswith("i") for name in first_round), 2)
+
+    def test_parse_lane_weights_falls_back_to_one(self):
+        weights = task_scheduler.parse_lane_weights("fast:5, batch:0, interactive:x, unknown:3")
+
+        self.assertEqual(weights, {"fast": 5, "interactive": 1, "batch": 1})
+
+    def test_weighted_cycle_is_interleaved(self):
+        cycle = task_scheduler._build_cycle({"fast": 4, "interactive": 2, "batch": 1})
+
+        self.assertEqual(cycle, ["fast", "interactive", "fast", "batch", "fast", "interactive", "fast"])
+
+
+if __name__ == "__main__":
+    unittest.main()
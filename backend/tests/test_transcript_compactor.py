@@ -0,0 +1,128 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+MODULE_PATH = ROOT / "app" / "utils" / "transcript_compactor.py"
+
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    end: float
+    text: str
+
+
+@dataclass
+class TranscriptResult:
+    language: Optional[str]
+    full_text: str
+    segments: List[TranscriptSegment]
+    raw: Optional[dict] = None
+
+
+def _load_module():
+    transcriber_model = types.ModuleType("app.models.transcriber_model")
+    transcriber_model.TranscriptSegment = TranscriptSegment
+    transcriber_model.TranscriptResult = TranscriptResult
+    sys.modules["app.models.transcriber_model"] = transcriber_model
+
+    spec = importlib.util.spec_from_file_location("transcript_compactor", MODULE_PATH)
+    if spec is None or spec.loader is None:
+        raise ImportError("transcript_compactor module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+transcript_compactor = _load_module()
+
+
+class TestTranscriptCompactor(unittest.TestCase):
+    def test_merges_short_segments_into_one_window(self):
+        segments = [
+            TranscriptSegment(0.0, 1.5, "今天我们来讲"),
+            TranscriptSegment(1.5, 3.0, "Python 的   装饰器"),
+            TranscriptSegment(3.0, 4.0, "它的原理很简单"),
+        ]
+
+        result = transcript_compactor.compact_segments(segments)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].start, 0.0)
+        self.assertEqual(result[0].end, 4.0)
+        self.assertEqual(result[0].text, "今天我们来讲 Python 的 装饰器 它的原理很简单")
+
+    def test_splits_windows_by_duration_and_chars(self):
+        segments = [TranscriptSegment(i * 10.0, i * 10.0 + 10, f"第{i}段内容") for i in range(6)]
+
+        by_duration = transcript_compactor.compact_segments(segments, max_seconds=30, max_chars=1000)
+        by_chars = transcript_compactor.compact_segments(segments, max_seconds=1000, max_chars=10)
+
+        self.assertEqual([w.start for w in by_duration], [0.0, 30.0])
+        self.assertEqual(len(by_chars), 3)
+
+    def test_closes_window_at_sentence_end_after_min_chars(self):
+        segments = [
+            TranscriptSegment(0.0, 2.0, "这是一句已经足够长的完整句子。"),
+            TranscriptSegment(2.0, 4.0, "下一句"),
+        ]
+
+        result = transcript_compactor.compact_segments(segments, min_chars=5)
+
+        self.assertEqual([w.text for w in result], ["这是一句已经足够长的完整句子。", "下一句"])
+
+    def test_removes_rolling_caption_duplicates(self):
+        segments = [
+            TranscriptSegment(0.0, 2.0, "hello everyone"),
+            TranscriptSegment(1.0, 3.0, "hello everyone welcome back"),
+            TranscriptSegment(2.0, 4.0, "welcome back to the channel"),
+            TranscriptSegment(3.0, 5.0, "to the channel"),
+        ]
+
+        result = transcript_compactor.compact_segments(segments)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].text, "hello everyone welcome back to the channel")
+        self.assertEqual(result[0].end, 5.0)
+
+    def test_collapses_fillers_and_repeats(self):
+        self.assertEqual(transcript_compactor.normalize_text("嗯，那个那个 我们开始"), "那个 我们开始")
+        self.assertEqual(transcript_compactor.normalize_text("um so so we start"), "so we start")
+        self.assertEqual(transcript_compactor.normalize_text("嗯嗯"), "")
+
+    def test_filler_only_segment_extends_window(self):
+        segments = [
+            TranscriptSegment(0.0, 1.0, "开始"),
+            TranscriptSegment(1.0, 2.0, "呃"),
+        ]
+
+        result = transcript_compactor.compact_segments(segments)
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].text, "开始")
+        self.assertEqual(result[0].end, 2.0)
+
+    def test_only_platform_subtitles_are_compacted(self):
+        segments = [TranscriptSegment(0.0, 2.0, "hello everyone")]
+        subtitle = TranscriptResult("en", "", segments, raw={"source": "youtube_subtitle", "file": "a.json3"})
+        cached_subtitle = TranscriptResult("zh", "", segments, raw={"source": "bilibili_subtitle", "format": "srt"})
+        # 语音识别结果：raw 是转写器的原始响应（faster-whisper 为 TranscriptionInfo 元组），没有 source 字段，
+        # 或旧缓存里根本没有 raw
+        whisper = TranscriptResult("en", "", segments, raw=("en", 0.98, 2.0))
+        groq = TranscriptResult("en", "", segments, raw={"text": "hello everyone", "segments": []})
+        legacy_cache = TranscriptResult("en", "", segments)
+
+        self.assertTrue(transcript_compactor.is_platform_subtitle(subtitle))
+        self.assertTrue(transcript_compactor.is_platform_subtitle(cached_subtitle))
+        for transcript in (whisper, groq, legacy_cache):
+            self.assertFalse(transcript_compactor.is_platform_subtitle(transcript))
+
+
+if __name__ == "__main__":
+    unittest.main()
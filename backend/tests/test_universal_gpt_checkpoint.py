@@ -1,9 +1,14 @@
+import asyncio
+import base64
+import concurrent.futures
 import importlib.util
 import json
 import os
 import pathlib
 import sys
 import tempfile
+import threading
+import time
 import types
 import unittest
 from pathlib import Path
@@ -26,7 +31,11 @@ def _install_stubs():
     def _generate_base_prompt(**_kwargs):
         return "prompt"
 
+    def _generate_prompt_parts(**_kwargs):
+        return "system", "prompt"
+
     prompt_builder_mod.generate_base_prompt = _generate_base_prompt
+    prompt_builder_mod.generate_prompt_parts = _generate_prompt_parts
 
     prompt_mod = types.ModuleType("app.gpt.prompt")
     prompt_mod.BASE_PROMPT = ""
@@ -34,6 +43,7 @@ def _install_stubs():
     prompt_mod.SCREENSHOT = ""
     prompt_mod.LINK = ""
     prompt_mod.MERGE_PROMPT = "merge"
+    prompt_mod.CONTINUE_PROMPT = "continue"
 
     utils_mod = types.ModuleType("app.gpt.utils")
 
@@ -53,6 +63,28 @@ def _install_stubs():
 
     request_chunker_mod.RequestChunker = _RequestChunker
 
+    token_counter_mod = types.ModuleType("app.gpt.token_counter")
+    token_counter_mod.estimate_tokens = len
+    token_counter_mod.get_prompt_token_budget = lambda _model: 128000
+
+    logger_mod = types.ModuleType("app.utils.logger")
+    logger_mod.get_logger = lambda name: __import__("logging").getLogger(name)
+
+    response_cache_mod = types.ModuleType("app.gpt.response_cache")
+    response_cache_mod.get_response_cache = lambda: None
+
+    utils_pkg = types.ModuleType("app.utils")
+    async_runner_mod = types.ModuleType("app.utils.async_runner")
+
+    def _run_coroutine(coro, timeout=None):
+        return asyncio.run(coro)
+
+    def _submit_coroutine(coro):
+        return concurrent.futures.ThreadPoolExecutor(max_workers=1).submit(asyncio.run, coro)
+
+    async_runner_mod.run_coroutine = _run_coroutine
+    async_runner_mod.submit_coroutine = _submit_coroutine
+
     gpt_model_mod = types.ModuleType("app.models.gpt_model")
 
     class _GPTSource:
@@ -73,28 +105,42 @@ def _install_stubs():
     sys.modules.setdefault("app", app_mod)
     sys.modules.setdefault("app.gpt", gpt_pkg)
     sys.modules.setdefault("app.models", models_pkg)
+    sys.modules.setdefault("app.utils", utils_pkg)
+    sys.modules["app.utils.async_runner"] = async_runner_mod
     sys.modules["app.gpt.base"] = base_mod
     sys.modules["app.gpt.prompt_builder"] = prompt_builder_mod
     sys.modules["app.gpt.prompt"] = prompt_mod
     sys.modules["app.gpt.utils"] = utils_mod
     sys.modules["app.gpt.request_chunker"] = request_chunker_mod
+    sys.modules["app.gpt.token_counter"] = token_counter_mod
+    sys.modules["app.gpt.response_cache"] = response_cache_mod
+    sys.modules["app.utils.logger"] = logger_mod
+    sys.modules["app.gpt.rate_limiter"] = _load_module("app.gpt.rate_limiter", "rate_limiter.py")
+    sys.modules["app.gpt.latency_histogram"] = _load_module("app.gpt.latency_histogram", "latency_histogram.py")
     sys.modules["app.models.gpt_model"] = gpt_model_mod
     sys.modules["app.models.transcriber_model"] = transcriber_model_mod
+    sys.modules["app.models.image_model"] = _load_module("app.models.image_model", "image_model.py", "models")
 
 
-def _load_universal_gpt_class():
-    _install_stubs()
+def _load_module(name, filename, package="gpt"):
     root = pathlib.Path(__file__).resolve().parents[1]
-    module_path = root / "app" / "gpt" / "universal_gpt.py"
-    spec = importlib.util.spec_from_file_location("universal_gpt", module_path)
+    module_path = root / "app" / package / filename
+    spec = importlib.util.spec_from_file_location(name, module_path)
     if spec is None or spec.loader is None:
-        raise ImportError("universal_gpt module spec not found")
+        raise ImportError(f"{name} module spec not found")
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
-    return module.UniversalGPT
+    return module
+
+
+def _load_universal_gpt_class():
+    _install_stubs()
+    return _load_module("universal_gpt", "universal_gpt.py").UniversalGPT
 
 
 UniversalGPT = _load_universal_gpt_class()
+# 其他测试模块可能替换 sys.modules 中的同名模块，这里保留 universal_gpt 实际使用的 ImageRef
+ImageRef = sys.modules["app.models.image_model"].ImageRef
 
 
 class _FailingCompletions:
@@ -119,7 +165,191 @@ class _DummyClient:
         self.models = _DummyModels()
 
 
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content):
+        self.message = _Message(content)
+
+
+class _Response:
+    def __init__(self, content):
+        self.choices = [_Choice(content)]
+
+
+class _ImageEchoCompletions:
+    """按请求中的图片 url 返回结果，url 为 fail_url 时抛出不可重试异常"""
+
+    def __init__(self, fail_url=None):
+        self.fail_url = fail_url
+
+    def create(self, messages, **_kwargs):
+        urls = [part["image_url"]["url"] for part in messages[0]["content"] if part["type"] == "image_url"]
+        if self.fail_url in urls:
+            raise ValueError("invalid request")
+        return _Response("summary-" + ",".join(urls))
+
+
+class _EchoClient(_DummyClient):
+    def __init__(self, fail_url=None):
+        super().__init__()
+        self.chat.completions = _ImageEchoCompletions(fail_url)
+
+
+class _AsyncImageEchoCompletions(_ImageEchoCompletions):
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(0)
+        return super().create(messages, **kwargs)
+
+
+class _AsyncEchoClient:
+    def __init__(self, fail_url=None):
+        self.chat = _DummyChat()
+        self.chat.completions = _AsyncImageEchoCompletions(fail_url)
+
+
+class _Delta:
+    def __init__(self, content):
+        self.content = content
+
+
+class _StreamChoice:
+    def __init__(self, content):
+        self.delta = _Delta(content)
+
+
+class _StreamChunk:
+    def __init__(self, content):
+        self.choices = [_StreamChoice(content)]
+
+
+class _InterruptedStreamCompletions:
+    """首次请求输出一半后断开，之后的请求记录 messages 并输出剩余内容"""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, messages, stream=False, **_kwargs):
+        self.calls.append(messages)
+        if len(self.calls) == 1:
+            def _broken():
+                yield _StreamChunk("## A")
+                raise ValueError("stream dropped")
+
+            return _broken()
+        return iter([_StreamChunk(" B")])
+
+
+class _AsyncStreamCompletions:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.threads = []
+
+    async def create(self, **_kwargs):
+        async def _stream():
+            for piece in self.pieces:
+                self.threads.append(threading.get_ident())
+                yield _StreamChunk(piece)
+
+        return _stream()
+
+
+class _MergeCompletions:
+    """把合并请求里的各段拼成 (a+b) 返回，包含 fail_part 时抛出不可重试异常"""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.calls = 0
+
+    def create(self, messages, **_kwargs):
+        self.calls += 1
+        text = messages[-1]["content"][0]["text"].split("\n\n", 1)[1]
+        parts = text.split("\n\n---\n\n")
+        if self.fail_part in parts:
+            raise ValueError("merge failed")
+        return _Response("(" + "+".join(parts) + ")")
+
+
+class _MergeClient(_DummyClient):
+    def __init__(self, fail_part=None):
+        super().__init__()
+        self.chat.completions = _MergeCompletions(fail_part)
+
+
+class _DictCache:
+    def __init__(self):
+        self.data = {}
+
+    @staticmethod
+    def make_key(model, temperature, messages):
+        return json.dumps([model, temperature, messages], sort_keys=True)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, text):
+        self.data[key] = text
+
+
+class _Chunk:
+    def __init__(self, image_urls):
+        self.segments = []
+        self.image_urls = image_urls
+
+
+class _Source:
+    title = "title"
+    tags = ""
+    _format = []
+    style = None
+    extras = None
+
+
+class _StatusError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _StatusCompletions:
+    def __init__(self, exc):
+        self.exc = exc
+        self.calls = 0
+
+    def create(self, **_kwargs):
+        self.calls += 1
+        raise self.exc
+
+
+class _SlowAsyncCompletions:
+    def __init__(self, delay, content):
+        self.delay = delay
+        self.content = content
+        self.cancelled = False
+
+    async def create(self, **_kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return _Response(self.content)
+
+
+class _SlowAsyncClient:
+    def __init__(self, delay, content):
+        self.chat = types.SimpleNamespace(completions=_SlowAsyncCompletions(delay, content))
+
+
 class TestUniversalGPTCheckpoint(unittest.TestCase):
+    def setUp(self):
+        # 限流器和延迟直方图按 provider 全局共享，避免前一个用例的记录影响后续用例
+        sys.modules["app.gpt.rate_limiter"]._limiters.clear()
+        sys.modules["app.gpt.latency_histogram"]._histograms.clear()
+
     def test_merge_524_error_persists_checkpoint(self):
         original_attempts = os.environ.get("OPENAI_RETRY_ATTEMPTS")
         os.environ["OPENAI_RETRY_ATTEMPTS"] = "1"
@@ -142,6 +372,272 @@ class TestUniversalGPTCheckpoint(unittest.TestCase):
             else:
                 os.environ["OPENAI_RETRY_ATTEMPTS"] = original_attempts
 
+    def test_prefix_cache_layout_puts_static_prompt_first(self):
+        gpt = UniversalGPT(_DummyClient(), model="mock-model")
+        gpt.prompt_layout = "prefix_cache"
+
+        messages = gpt.create_messages([], title="t", video_img_urls=["img-0"])
+
+        self.assertEqual(messages[0], {"role": "system", "content": "system"})
+        self.assertEqual(messages[-1]["role"], "user")
+        self.assertEqual(messages[-1]["content"][0], {"type": "text", "text": "prompt"})
+        self.assertEqual(messages[-1]["content"][1]["image_url"]["url"], "img-0")
+
+    def test_parallel_map_keeps_chunk_order(self):
+        gpt = UniversalGPT(_EchoClient(), model="mock-model")
+        gpt.map_concurrency = 3
+        chunks = [_Chunk([f"img-{idx}"]) for idx in range(5)]
+        done = {}
+
+        gpt._map_chunks(chunks, done, _Source(), None, None)
+
+        self.assertEqual([done[idx] for idx in range(5)], [f"summary-img-{idx}" for idx in range(5)])
+
+    def test_async_map_uses_async_client(self):
+        gpt = UniversalGPT(_DummyClient(), model="mock-model", async_client=_AsyncEchoClient())
+        chunks = [_Chunk([f"img-{idx}"]) for idx in range(4)]
+        done = {0: "summary-img-0"}
+
+        gpt._map_chunks(chunks, done, _Source(), None, None)
+
+        self.assertEqual([done[idx] for idx in range(4)], [f"summary-img-{idx}" for idx in range(4)])
+
+    def test_stream_resumes_from_checkpointed_text(self):
+        client = _DummyClient()
+        client.chat.completions = _InterruptedStreamCompletions()
+        gpt = UniversalGPT(client, model="mock-model")
+        received = []
+        messages = [{"role": "user", "content": "prompt"}]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            gpt.checkpoint_dir = Path(tmp_dir)
+
+            with self.assertRaises(ValueError):
+                gpt._stream_with_checkpoint(messages, "map:0", received.append, None,
+                                            "task-3", "sig-3", [], "summarize")
+
+            payload = json.loads(gpt._checkpoint_path("task-3").read_text(encoding="utf-8"))
+            self.assertEqual(payload["streaming"], {"key": "map:0", "text": "## A"})
+
+            result = gpt._stream_with_checkpoint(messages, "map:0", received.append, payload["streaming"],
+                                                 "task-3", "sig-3", [], "summarize")
+
+        self.assertEqual(result, "## A B")
+        self.assertEqual(received, ["## A", "## A B"])
+        resumed_messages = client.chat.completions.calls[1]
+        self.assertEqual(resumed_messages[1], {"role": "assistant", "content": "## A"})
+
+    def test_parallel_map_failure_checkpoints_prefix_and_pending(self):
+        original_attempts = os.environ.get("OPENAI_RETRY_ATTEMPTS")
+        os.environ["OPENAI_RETRY_ATTEMPTS"] = "1"
+        gpt = UniversalGPT(_EchoClient(fail_url="img-1"), model="mock-model")
+        gpt.map_concurrency = 1
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                gpt.checkpoint_dir = Path(tmp_dir)
+                chunks = [_Chunk([f"img-{idx}"]) for idx in range(3)]
+
+                with self.assertRaises(ValueError):
+                    gpt._map_chunks(chunks, {}, _Source(), "task-2", "sig-2")
+
+                payload = json.loads(gpt._checkpoint_path("task-2").read_text(encoding="utf-8"))
+                self.assertEqual(payload["phase"], "summarize")
+                self.assertEqual(payload["partials"], ["summary-img-0"])
+                self.assertNotIn("1", payload.get("pending", {}))
+        finally:
+            if original_attempts is None:
+                os.environ.pop("OPENAI_RETRY_ATTEMPTS", None)
+            else:
+                os.environ["OPENAI_RETRY_ATTEMPTS"] = original_attempts
+
+    def test_tree_merge_resumes_from_journal(self):
+        original_attempts = os.environ.get("OPENAI_RETRY_ATTEMPTS")
+        original_fan_in = os.environ.get("OPENAI_MERGE_FAN_IN")
+        os.environ["OPENAI_RETRY_ATTEMPTS"] = "1"
+        os.environ["OPENAI_MERGE_FAN_IN"] = "2"
+        partials = [f"p{idx}" for idx in range(5)]
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                failing = UniversalGPT(_MergeClient(fail_part="p3"), model="mock-model")
+                failing.checkpoint_dir = Path(tmp_dir)
+                failing.map_concurrency = 1
+                with self.assertRaises(ValueError):
+                    failing._merge_partials(partials, "task-4", "sig-4")
+
+                payload = json.loads(failing._checkpoint_path("task-4").read_text(encoding="utf-8"))
+                self.assertEqual(payload["phase"], "merge")
+                self.assertEqual(payload["partials"], partials)
+
+                client = _MergeClient()
+                gpt = UniversalGPT(client, model="mock-model")
+                gpt.checkpoint_dir = Path(tmp_dir)
+                result = gpt._merge_partials(payload["partials"], "task-4", "sig-4")
+
+                self.assertEqual(result, "(((p0+p1)+(p2+p3))+p4)")
+                # 第一层只补跑失败的那一组，单独成组的 p4 直接进入下一层
+                self.assertEqual(client.chat.completions.calls, 3)
+
+                gpt._clear_checkpoint("task-4")
+                self.assertFalse(gpt._merge_journal_path("task-4").exists())
+        finally:
+            for name, value in (("OPENAI_RETRY_ATTEMPTS", original_attempts),
+                                ("OPENAI_MERGE_FAN_IN", original_fan_in)):
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+    def test_response_cache_skips_repeated_calls(self):
+        client = _MergeClient()
+        gpt = UniversalGPT(client, model="mock-model")
+        gpt.response_cache = _DictCache()
+        messages = gpt._build_merge_messages(["a", "b"])
+
+        first = gpt._complete_text(messages)
+        second = gpt._complete_text(messages)
+
+        self.assertEqual(first, "(a+b)")
+        self.assertEqual(second, "(a+b)")
+        self.assertEqual(client.chat.completions.calls, 1)
+
+    def test_status_code_decides_retry_before_message_text(self):
+        original_backoff = os.environ.get("OPENAI_RETRY_BACKOFF_SECONDS")
+        os.environ["OPENAI_RETRY_BACKOFF_SECONDS"] = "0"
+        try:
+            client = _DummyClient()
+            client.chat.completions = _StatusCompletions(_StatusError("bad request: timeout too large", 400))
+            gpt = UniversalGPT(client, model="mock-model")
+
+            with self.assertRaises(_StatusError):
+                gpt._complete_text([{"role": "user", "content": "hi"}])
+
+            self.assertEqual(client.chat.completions.calls, 1)
+            self.assertEqual(gpt.rate_limiter.breaker.failures, 0)
+        finally:
+            if original_backoff is None:
+                os.environ.pop("OPENAI_RETRY_BACKOFF_SECONDS", None)
+            else:
+                os.environ["OPENAI_RETRY_BACKOFF_SECONDS"] = original_backoff
+
+    def test_checkpoint_dir_is_created_on_first_save(self):
+        original_dir = os.environ.get("NOTE_OUTPUT_DIR")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["NOTE_OUTPUT_DIR"] = str(Path(tmp_dir) / "notes")
+            try:
+                gpt = UniversalGPT(_DummyClient(), model="mock-model")
+                self.assertFalse(gpt.checkpoint_dir.exists())
+
+                gpt._save_checkpoint("task-5", "sig-5", ["a"], "summarize")
+
+                self.assertTrue(gpt._checkpoint_path("task-5").exists())
+            finally:
+                if original_dir is None:
+                    os.environ.pop("NOTE_OUTPUT_DIR", None)
+                else:
+                    os.environ["NOTE_OUTPUT_DIR"] = original_dir
+
+    def test_hedged_request_prefers_faster_secondary_and_cancels_primary(self):
+        original_delay = os.environ.get("LLM_HEDGE_DELAY_SECONDS")
+        os.environ["LLM_HEDGE_DELAY_SECONDS"] = "0.01"
+        try:
+            primary_client = _SlowAsyncClient(5, "primary")
+            hedge = UniversalGPT(_DummyClient(), model="backup-model", provider_key="backup",
+                                 async_client=_SlowAsyncClient(0, "backup"))
+            gpt = UniversalGPT(_DummyClient(), model="mock-model", async_client=primary_client, hedge=hedge)
+
+            text = gpt._complete_text([{"role": "user", "content": "hi"}])
+
+            self.assertEqual(text, "backup")
+            self.assertTrue(primary_client.chat.completions.cancelled)
+        finally:
+            if original_delay is None:
+                os.environ.pop("LLM_HEDGE_DELAY_SECONDS", None)
+            else:
+                os.environ["LLM_HEDGE_DELAY_SECONDS"] = original_delay
+
+    def test_hedge_is_not_sent_when_primary_is_fast(self):
+        hedge_client = _SlowAsyncClient(0, "backup")
+        hedge = UniversalGPT(_DummyClient(), model="backup-model", provider_key="backup", async_client=hedge_client)
+        gpt = UniversalGPT(_DummyClient(), model="mock-model", async_client=_SlowAsyncClient(0, "primary"),
+                           hedge=hedge)
+
+        self.assertEqual(gpt._complete_text([{"role": "user", "content": "hi"}]), "primary")
+        self.assertEqual(gpt.latency.total, 1)
+        self.assertEqual(hedge.latency.total, 0)
+
+    def test_cancelled_probe_releases_half_open_breaker(self):
+        client = _SlowAsyncClient(5, "slow")
+        gpt = UniversalGPT(_DummyClient(), model="mock-model", async_client=client)
+        breaker = gpt.rate_limiter.breaker
+        breaker.failures = breaker.failure_threshold
+        breaker.recovery_seconds = 60
+        breaker.opened_at = time.monotonic() - 60
+
+        async def cancel_probe():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(gpt._arequest_text([{"role": "user", "content": "hi"}]), 0.01)
+
+        asyncio.run(cancel_probe())
+
+        self.assertTrue(client.chat.completions.cancelled)
+        self.assertFalse(breaker.probing)
+        self.assertEqual(breaker.allow(), 0.0)
+
+    def test_async_stream_progress_runs_on_caller_thread(self):
+        completions = _AsyncStreamCompletions(["## A", " B"])
+        gpt = UniversalGPT(_DummyClient(), model="mock-model",
+                           async_client=types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+        progress_threads = []
+        received = []
+
+        def on_progress(text):
+            progress_threads.append(threading.get_ident())
+            received.append(text)
+
+        result = gpt._stream_with_checkpoint([{"role": "user", "content": "hi"}], "map:0", on_progress, None,
+                                             None, None, [], "summarize")
+
+        self.assertEqual(result, "## A B")
+        self.assertEqual(received[-1], "## A B")
+        self.assertEqual(set(progress_threads), {threading.get_ident()})
+        self.assertNotIn(threading.get_ident(), completions.threads)
+
+    def test_signature_uses_image_ref_digests_and_tracks_segments(self):
+        gpt = UniversalGPT(_DummyClient(), model="mock-model")
+        seg = sys.modules["app.models.transcriber_model"].TranscriptSegment
+
+        def make_source(images, text="hello"):
+            source = _Source()
+            source.video_img_urls = images
+            source.segment = [seg(start=0, end=1, text=text)]
+            return source
+
+        with_refs = gpt._build_source_signature(make_source([ImageRef("missing-a.jpg", 10, "d1")]))
+        # 签名只依赖摘要，不读取图片文件
+        self.assertEqual(with_refs, gpt._build_source_signature(make_source([ImageRef("missing-b.jpg", 10, "d1")])))
+        self.assertNotEqual(with_refs, gpt._build_source_signature(make_source([ImageRef("missing-a.jpg", 10, "d2")])))
+
+        plain = gpt._build_source_signature(make_source(["data:a"]))
+        self.assertNotEqual(plain, gpt._build_source_signature(make_source(["data:b"])))
+        self.assertNotEqual(plain, gpt._build_source_signature(make_source(["data:a"], "changed")))
+
+    def test_image_refs_are_sized_without_encoding_and_materialized_on_send(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "grid_1.jpg"
+            path.write_bytes(b"\xff\xd8jpeg-bytes" * 50)
+            ref = ImageRef.from_file(str(path))
+            gpt = UniversalGPT(_DummyClient(), model="mock-model")
+            messages = [{"role": "user", "content": [
+                {"type": "text", "text": "hi"},
+                {"type": "image_url", "image_url": {"url": ref, "detail": "auto"}},
+            ]}]
+
+            materialized = gpt._materialize_images(messages)
+
+            url = materialized[0]["content"][1]["image_url"]["url"]
+            self.assertEqual(url, "data:image/jpeg;base64," + base64.b64encode(path.read_bytes()).decode("ascii"))
+            self.assertIs(messages[0]["content"][1]["image_url"]["url"], ref)
+            self.assertEqual(gpt._estimate_messages_bytes(messages),
+                             len(json.dumps(materialized, ensure_ascii=False).encode("utf-8")))
 
 if __name__ == "__main__":
     unittest.main()
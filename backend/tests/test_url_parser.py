@@ -0,0 +1,43 @@
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+
+
+def _load_module():
+    requests_mod = types.ModuleType("requests")
+    requests_mod.RequestException = Exception
+    sys.modules.setdefault("requests", requests_mod)
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    spec = importlib.util.spec_from_file_location("url_parser", root / "app" / "utils" / "url_parser.py")
+    if spec is None or spec.loader is None:
+        raise ImportError("url_parser module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+url_parser = _load_module()
+
+
+class TestExtractVideoId(unittest.TestCase):
+    def test_bilibili_part_is_part_of_the_id(self):
+        video_id = url_parser.extract_video_id("https://www.bilibili.com/video/BV1vc411b7Wa?p=3", "bilibili")
+
+        self.assertEqual(video_id, "BV1vc411b7Wa_p3")
+
+    def test_bilibili_first_part_keeps_plain_id(self):
+        for url in ("https://www.bilibili.com/video/BV1vc411b7Wa",
+                    "https://www.bilibili.com/video/BV1vc411b7Wa/?p=1&spm_id_from=333"):
+            self.assertEqual(url_parser.extract_video_id(url, "bilibili"), "BV1vc411b7Wa")
+
+    def test_youtube_id_ignores_playlist_params(self):
+        video_id = url_parser.extract_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&index=2", "youtube")
+
+        self.assertEqual(video_id, "dQw4w9WgXcQ")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -77,6 +77,14 @@ def _install_stubs():
     sys.modules["app.utils.logger"] = logger_mod
     sys.modules["app.utils.path_helper"] = path_helper_mod
 
+    root = pathlib.Path(__file__).resolve().parents[1]
+    image_model_spec = importlib.util.spec_from_file_location(
+        "app.models.image_model", root / "app" / "models" / "image_model.py"
+    )
+    image_model_mod = importlib.util.module_from_spec(image_model_spec)
+    image_model_spec.loader.exec_module(image_model_mod)
+    sys.modules["app.models.image_model"] = image_model_mod
+
 
 def _load_video_reader_module():
     _install_stubs()
@@ -0,0 +1,140 @@
+import importlib.util
+import pathlib
+import sys
+import threading
+import time
+import types
+import unittest
+
+
+def _load_module():
+    logger_mod = types.ModuleType("app.utils.logger")
+
+    class _Logger:
+        def info(self, *_args, **_kwargs):
+            return None
+
+    logger_mod.get_logger = lambda _name: _Logger()
+    sys.modules.setdefault("app", types.ModuleType("app"))
+    sys.modules.setdefault("app.utils", types.ModuleType("app.utils"))
+    sys.modules["app.utils.logger"] = logger_mod
+
+    root = pathlib.Path(__file__).resolve().parents[1]
+    module_path = root / "app" / "downloaders" / "ytdlp_info_cache.py"
+    spec = importlib.util.spec_from_file_location("ytdlp_info_cache", module_path)
+    if spec is None or spec.loader is None:
+        raise ImportError("ytdlp_info_cache module spec not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+ytdlp_info_cache = _load_module()
+
+
+class _FakeYDL:
+    def __init__(self, params=None, delay=0.0):
+        self.params = params or {}
+        self.delay = delay
+        self.extract_calls = []
+        self.processed = []
+
+    def extract_info(self, url, download=True, process=True):
+        self.extract_calls.append((url, download, process))
+        time.sleep(self.delay)
+        return {"id": "abc", "formats": [{"format_id": "1"}]}
+
+    def process_ie_result(self, info, download=True):
+        info["formats"].append({"format_id": "processed"})
+        self.processed.append((info, download))
+        return info
+
+
+class TestYtdlpInfoCache(unittest.TestCase):
+    def setUp(self):
+        ytdlp_info_cache.ytdlp_info_cache.clear()
+
+    def test_steps_share_one_extraction(self):
+        metadata_ydl = _FakeYDL()
+        download_ydl = _FakeYDL()
+
+        first = ytdlp_info_cache.extract_info(metadata_ydl, "https://v/1", download=False)
+        second = ytdlp_info_cache.extract_info(download_ydl, "https://v/1", download=True)
+
+        self.assertEqual(metadata_ydl.extract_calls, [("https://v/1", False, False)])
+        self.assertEqual(download_ydl.extract_calls, [])
+        self.assertEqual(download_ydl.processed[0][1], True)
+        # 每次拿到的是独立副本，前一步的处理结果不会污染后一步
+        self.assertEqual(len(first["formats"]), 2)
+        self.assertEqual(len(second["formats"]), 2)
+
+    def test_cookiefile_is_part_of_the_key(self):
+        ytdlp_info_cache.extract_info(_FakeYDL(), "https://v/1", download=False)
+        with_cookies = _FakeYDL({"cookiefile": "cookies.txt"})
+
+        ytdlp_info_cache.extract_info(with_cookies, "https://v/1", download=False)
+
+        self.assertEqual(len(with_cookies.extract_calls), 1)
+
+    def test_noplaylist_is_part_of_the_key(self):
+        single = _FakeYDL({"noplaylist": True})
+        playlist = _FakeYDL({"noplaylist": False})
+
+        ytdlp_info_cache.extract_info(playlist, "https://v/multi", download=False)
+        ytdlp_info_cache.extract_info(single, "https://v/multi", download=False)
+
+        self.assertEqual(len(playlist.extract_calls), 1)
+        self.assertEqual(len(single.extract_calls), 1)
+
+    def test_expired_entry_is_extracted_again(self):
+        now = [0.0]
+        cache = ytdlp_info_cache.YtdlpInfoCache(ttl_seconds=10, max_entries=4, clock=lambda: now[0])
+        calls = []
+
+        cache.get(("u", None), lambda: calls.append(1) or {"id": "a"})
+        now[0] = 5
+        cache.get(("u", None), lambda: calls.append(1) or {"id": "a"})
+        now[0] = 20
+        cache.get(("u", None), lambda: calls.append(1) or {"id": "a"})
+
+        self.assertEqual(len(calls), 2)
+
+    def test_oldest_entry_is_evicted(self):
+        cache = ytdlp_info_cache.YtdlpInfoCache(ttl_seconds=100, max_entries=1)
+        calls = []
+
+        cache.get(("a", None), lambda: calls.append("a") or {})
+        cache.get(("b", None), lambda: calls.append("b") or {})
+        cache.get(("a", None), lambda: calls.append("a") or {})
+
+        self.assertEqual(calls, ["a", "b", "a"])
+
+    def test_concurrent_requests_extract_once(self):
+        ydls = [_FakeYDL(delay=0.05) for _ in range(3)]
+        threads = [
+            threading.Thread(target=ytdlp_info_cache.extract_info, args=(ydl, "https://v/2"), kwargs={"download": False})
+            for ydl in ydls
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sum(len(ydl.extract_calls) for ydl in ydls), 1)
+
+    def test_resolve_stream_picks_video_track_with_headers(self):
+        class _StreamYDL(_FakeYDL):
+            def process_ie_result(self, info, download=True):
+                info["requested_formats"] = [
+                    {"vcodec": "avc1", "url": "https://cdn/video.m4s", "http_headers": {"Referer": "https://b"}},
+                    {"vcodec": "none", "url": "https://cdn/audio.m4s"},
+                ]
+                return info
+
+        stream = ytdlp_info_cache.resolve_stream(_StreamYDL(), "https://v/3")
+
+        self.assertEqual(stream, {"url": "https://cdn/video.m4s", "headers": {"Referer": "https://b"}})
+
+
+if __name__ == "__main__":
+    unittest.main()